@@ -0,0 +1,480 @@
+# ajustamento.py
+# Ajustamento de rede (direções Hz + distâncias DH) por mínimos quadrados
+
+import math
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.linalg import solve_triangular
+from scipy.sparse.linalg import splu
+
+from diagnostico import cronometrado
+from processing import (
+    IndicePares,
+    indice_pares,
+    tabela_distancias_medias_simetricas,
+)
+
+SEG_POR_RAD = 180.0 / math.pi * 3600.0
+
+# Precisões a priori padrão (estação total de 2" / 2 mm + 2 ppm)
+SIGMA_DIRECAO_SEG = 2.0
+SIGMA_DISTANCIA_MM = 2.0
+SIGMA_DISTANCIA_PPM = 2.0
+
+MAX_ITERACOES = 10
+TOLERANCIA_M = 1e-6  # maior correção de coordenada para encerrar (m)
+BLOCO_COVARIANCIA = 64  # colunas de N⁻¹ resolvidas por vez
+
+
+@dataclass
+class AjustamentoRede:
+    """
+    Resultado do ajustamento em sistema local (X para leste, Y para norte,
+    azimutes a partir de Y, no sentido horário):
+
+    - coordenadas: X/Y ajustados e desvios padrão (mm) por ponto;
+    - orientacoes: orientação ajustada de cada (EST, SEQ);
+    - residuos: uma linha por observação (direções em segundos,
+      distâncias em mm), com o resíduo normalizado v/σ;
+    - sigma0: desvio padrão a posteriori da observação de peso unitário;
+    - graus_liberdade: observações menos incógnitas livres;
+    - convergiu: False se MAX_ITERACOES se esgotaram com correções ainda
+      acima de TOLERANCIA_M (coordenadas e resíduos não confiáveis).
+    """
+
+    coordenadas: pd.DataFrame
+    orientacoes: pd.DataFrame
+    residuos: pd.DataFrame
+    sigma0: float
+    graus_liberdade: int
+    iteracoes: int
+    convergiu: bool
+    origem: str
+    eixo: str
+
+
+def _azimute(dx, dy):
+    return np.mod(np.arctan2(dx, dy), 2 * np.pi)
+
+
+def _observacoes_direcoes(res: pd.DataFrame) -> pd.DataFrame:
+    """Uma direção por linha de 'res' com EST, PV e Hz médio válidos (PV != EST)."""
+    d = pd.DataFrame(
+        {
+            "EST": res["EST"].astype(str).to_numpy(),
+            "PV": res["PV"].astype(str).to_numpy(),
+            "SEQ": res["SEQ"].to_numpy(),
+            "hz_rad": np.radians(res["Hz_med_deg"].to_numpy(dtype=np.float64)),
+        }
+    )
+    ok = res["EST"].notna().to_numpy() & res["PV"].notna().to_numpy()
+    ok &= ~np.isnan(d["hz_rad"].to_numpy()) & (d["EST"] != d["PV"]).to_numpy()
+    return d[ok].reset_index(drop=True)
+
+
+def _observacoes_distancias(
+    res: pd.DataFrame, indice: IndicePares
+) -> pd.DataFrame:
+    """DH média simétrica por par, com o número de medições que a compõem."""
+    dist = tabela_distancias_medias_simetricas(res, indice=indice)
+    if dist.empty:
+        return pd.DataFrame(columns=["PontoA", "PontoB", "DH_media", "n"])
+    dist = dist[dist["DH_media"].notna() & (dist["DH_media"] > 0)].copy()
+    dist["n"] = [
+        int(np.count_nonzero(~np.isnan(indice.dh[(a, b)])))
+        for a, b in zip(dist["PontoA"], dist["PontoB"])
+    ]
+    return dist.reset_index(drop=True)
+
+
+def _coordenadas_aproximadas(
+    pontos: List[str],
+    direcoes: pd.DataFrame,
+    cod_setup: np.ndarray,
+    distancias: pd.DataFrame,
+    origem: str,
+    eixo: str,
+) -> Dict[str, Tuple[float, float]]:
+    """
+    Coordenadas iniciais por propagação: origem em (0, 0) e eixo sobre +X.
+    Cada série (EST, SEQ) de uma estação já posicionada é orientada por um
+    ponto conhecido e irradia os demais (direção + DH); estações nunca
+    visadas são posicionadas pelas distâncias a dois pontos conhecidos.
+    """
+    dh = {}
+    for a, b, d in zip(distancias["PontoA"], distancias["PontoB"], distancias["DH_media"]):
+        dh[(a, b)] = dh[(b, a)] = float(d)
+    if (origem, eixo) not in dh:
+        raise ValueError(f"Sem distância medida entre {origem} e {eixo} para fixar a escala.")
+
+    # Visadas de cada série: [(PV, direção em rad)], na ordem da planilha
+    series: Dict[int, List[Tuple[str, float]]] = {}
+    estacao_serie: Dict[int, str] = {}
+    for k, e, p, hz in zip(cod_setup, direcoes["EST"], direcoes["PV"], direcoes["hz_rad"]):
+        series.setdefault(int(k), []).append((p, float(hz)))
+        estacao_serie[int(k)] = e
+
+    xy = {origem: (0.0, 0.0), eixo: (dh[(origem, eixo)], 0.0)}
+    orient: Dict[int, float] = {}
+    progresso = True
+    while progresso and len(xy) < len(pontos):
+        progresso = False
+        for k, visadas in series.items():
+            e = estacao_serie[k]
+            if e not in xy:
+                # Estação não visada por ninguém: distâncias a dois pontos conhecidos
+                conhecidos = [(p, hz) for p, hz in visadas if p in xy and (e, p) in dh]
+                if len(conhecidos) < 2:
+                    continue
+                (p1, hz1), (p2, hz2) = conhecidos[:2]
+                pos = _intersecao_distancias(
+                    xy[p1], xy[p2], dh[(e, p1)], dh[(e, p2)], hz2 - hz1
+                )
+                if pos is None:
+                    continue
+                xy[e] = pos
+                progresso = True
+            if k not in orient:
+                ref = next(((p, hz) for p, hz in visadas if p in xy), None)
+                if ref is None:
+                    continue
+                p, hz = ref
+                az = _azimute(xy[p][0] - xy[e][0], xy[p][1] - xy[e][1])
+                orient[k] = float(az) - hz
+            for p, hz in visadas:
+                if p not in xy and (e, p) in dh:
+                    az = orient[k] + hz
+                    xy[p] = (
+                        xy[e][0] + dh[(e, p)] * math.sin(az),
+                        xy[e][1] + dh[(e, p)] * math.cos(az),
+                    )
+                    progresso = True
+
+    faltando = [p for p in pontos if p not in xy]
+    if faltando:
+        raise ValueError(
+            "Pontos sem ligação suficiente (direção + distância) com a origem: "
+            + ", ".join(faltando)
+        )
+    return xy
+
+
+def _intersecao_distancias(p1, p2, d1, d2, angulo_12) -> Optional[Tuple[float, float]]:
+    """
+    Ponto a d1 de p1 e d2 de p2; das duas soluções, a que vê p2 à direita de
+    p1 quando o ângulo horizontal medido (p1 -> p2) está entre 0 e 180°.
+    """
+    bx, by = p2[0] - p1[0], p2[1] - p1[1]
+    b = math.hypot(bx, by)
+    if b == 0 or b > d1 + d2 or b < abs(d1 - d2):
+        return None
+    a = (d1**2 - d2**2 + b**2) / (2 * b)
+    h = math.sqrt(max(d1**2 - a**2, 0.0))
+    mx, my = p1[0] + a * bx / b, p1[1] + a * by / b
+    candidatos = [(mx + h * by / b, my - h * bx / b), (mx - h * by / b, my + h * bx / b)]
+    horario = math.sin(angulo_12) > 0
+    for c in candidatos:
+        az1 = _azimute(p1[0] - c[0], p1[1] - c[1])
+        az2 = _azimute(p2[0] - c[0], p2[1] - c[1])
+        if (math.sin(az2 - az1) > 0) == horario:
+            return c
+    return candidatos[0]
+
+
+def _media_circular_por_grupo(codigo: np.ndarray, ang: np.ndarray, k: int) -> np.ndarray:
+    x = np.bincount(codigo, np.cos(ang), minlength=k)
+    y = np.bincount(codigo, np.sin(ang), minlength=k)
+    return np.arctan2(y, x)
+
+
+def _linearizar(
+    x: np.ndarray,
+    n_pontos: int,
+    i_dir: np.ndarray,
+    j_dir: np.ndarray,
+    cod_setup: np.ndarray,
+    hz_obs: np.ndarray,
+    i_dist: np.ndarray,
+    j_dist: np.ndarray,
+    s_obs: np.ndarray,
+) -> Tuple[sparse.coo_matrix, np.ndarray]:
+    """
+    Matriz A (esparsa, no máximo 5 termos por direção e 4 por distância) e
+    vetor l = observado − calculado no ponto 'x'.
+    """
+    n_dir, n_dist = len(hz_obs), len(s_obs)
+
+    # Direções: r = azimute(i -> j) − orientação(EST, SEQ)
+    dx = x[2 * j_dir] - x[2 * i_dir]
+    dy = x[2 * j_dir + 1] - x[2 * i_dir + 1]
+    s2 = dx**2 + dy**2
+    calc = _azimute(dx, dy) - x[2 * n_pontos + cod_setup]
+    l_dir = np.angle(np.exp(1j * (hz_obs - calc)))  # reduzido a (−π, π]
+    a_xj, a_yj = dy / s2, -dx / s2
+    linhas = np.arange(n_dir)
+    r_dir = np.tile(linhas, 5)
+    c_dir = np.concatenate(
+        [2 * i_dir, 2 * i_dir + 1, 2 * j_dir, 2 * j_dir + 1, 2 * n_pontos + cod_setup]
+    )
+    v_dir = np.concatenate([-a_xj, -a_yj, a_xj, a_yj, -np.ones(n_dir)])
+
+    # Distâncias: s = |j − i|
+    dx = x[2 * j_dist] - x[2 * i_dist]
+    dy = x[2 * j_dist + 1] - x[2 * i_dist + 1]
+    s = np.hypot(dx, dy)
+    l_dist = s_obs - s
+    linhas = n_dir + np.arange(n_dist)
+    r_dist = np.tile(linhas, 4)
+    c_dist = np.concatenate([2 * i_dist, 2 * i_dist + 1, 2 * j_dist, 2 * j_dist + 1])
+    v_dist = np.concatenate([-dx / s, -dy / s, dx / s, dy / s])
+
+    A = sparse.coo_matrix(
+        (
+            np.concatenate([v_dir, v_dist]),
+            (np.concatenate([r_dir, r_dist]), np.concatenate([c_dir, c_dist])),
+        ),
+        shape=(n_dir + n_dist, len(x)),
+    )
+    return A, np.concatenate([l_dir, l_dist])
+
+
+def _fatorar(N: sparse.spmatrix):
+    """
+    Fatoração N = L·D·Lᵀ (via SuperLU em modo simétrico, sem pivoteamento:
+    N é simétrica definida positiva), na ordem de grau mínimo de N.
+    """
+    return splu(
+        N.tocsc(),
+        permc_spec="MMD_AT_PLUS_A",
+        diag_pivot_thresh=0.0,
+        options={"SymmetricMode": True},
+    )
+
+
+def _diagonal_inversa(fator, colunas: np.ndarray) -> np.ndarray:
+    """
+    diag(N⁻¹) nas 'colunas' sem formar N⁻¹: com N = L·D·Lᵀ, a coluna i de
+    N⁻¹ tem diagonal Σ yₖ²/dₖ, y = L⁻¹·eᵢ. Os não nulos de y ficam no
+    caminho de i até a raiz da árvore de eliminação, então cada bloco de
+    colunas é resolvido só na submatriz densa desses caminhos.
+    """
+    L = fator.L.tocsc()
+    d = fator.U.diagonal()
+    n = L.shape[0]
+
+    # Árvore de eliminação: pai de j = primeira linha abaixo da diagonal em L[:, j]
+    col = np.repeat(np.arange(n), np.diff(L.indptr))
+    abaixo = L.indices > col
+    pai = np.full(n, n)
+    np.minimum.at(pai, col[abaixo], L.indices[abaixo])
+    pai[pai == n] = -1
+    L = L.tocsr()
+
+    pos = fator.perm_c[colunas]
+    ordem = np.argsort(pos)
+    diag = np.empty(len(colunas))
+    marcado = np.zeros(n, dtype=bool)
+    for ini in range(0, len(ordem), BLOCO_COVARIANCIA):
+        bloco = ordem[ini : ini + BLOCO_COVARIANCIA]
+        marcado[:] = False
+        for k in pos[bloco]:
+            while k != -1 and not marcado[k]:
+                marcado[k] = True
+                k = pai[k]
+        caminho = np.flatnonzero(marcado)
+        E = np.zeros((len(caminho), len(bloco)))
+        E[np.searchsorted(caminho, pos[bloco]), np.arange(len(bloco))] = 1.0
+        Y = solve_triangular(
+            L[caminho][:, caminho].toarray(),
+            E,
+            lower=True,
+            unit_diagonal=True,
+            check_finite=False,
+        )
+        diag[bloco] = (Y**2 / d[caminho, None]).sum(axis=0)
+    return diag
+
+
+@cronometrado
+def ajustar_rede(
+    res: pd.DataFrame,
+    indice: Optional[IndicePares] = None,
+    sigma_direcao_seg: float = SIGMA_DIRECAO_SEG,
+    sigma_distancia_mm: float = SIGMA_DISTANCIA_MM,
+    sigma_distancia_ppm: float = SIGMA_DISTANCIA_PPM,
+    origem: Optional[str] = None,
+    eixo: Optional[str] = None,
+) -> AjustamentoRede:
+    """
+    Ajustamento paramétrico (Gauss-Newton) da rede formada por todas as
+    direções Hz de 'res' (uma incógnita de orientação por estação e série)
+    e pelas DH médias simétricas (peso proporcional ao nº de medições).
+
+    Datum mínimo: 'origem' fixo em (0, 0) e 'eixo' sobre o eixo +X (padrão:
+    a primeira estação e o primeiro ponto que ela visa). As equações normais
+    são montadas e fatoradas em forma esparsa.
+    """
+    if indice is None:
+        indice = indice_pares(res)
+    direcoes = _observacoes_direcoes(res)
+    distancias = _observacoes_distancias(res, indice)
+    if direcoes.empty or distancias.empty:
+        raise ValueError("São necessárias direções e distâncias para ajustar a rede.")
+
+    if origem is None:
+        origem = direcoes["EST"].iloc[0]
+    if eixo is None:
+        com_dist = set(distancias["PontoA"][distancias["PontoB"] == origem]) | set(
+            distancias["PontoB"][distancias["PontoA"] == origem]
+        )
+        candidatos = [p for p in direcoes["PV"][direcoes["EST"] == origem] if p in com_dist]
+        if not candidatos:
+            raise ValueError(f"A estação {origem} não tem distância medida a nenhum ponto.")
+        eixo = candidatos[0]
+
+    pontos = list(
+        dict.fromkeys(
+            list(direcoes["EST"]) + list(direcoes["PV"])
+            + list(distancias["PontoA"]) + list(distancias["PontoB"])
+        )
+    )
+    n_pontos = len(pontos)
+    pos_ponto = {p: i for i, p in enumerate(pontos)}
+
+    # Incógnitas: [x0, y0, x1, y1, ..., orientações (EST, SEQ)]
+    setups, cod_setup = np.unique(
+        direcoes["EST"].astype(str) + "\x1f" + direcoes["SEQ"].astype(str),
+        return_inverse=True,
+    )
+    n_inc = 2 * n_pontos + len(setups)
+    fixas = np.array([2 * pos_ponto[origem], 2 * pos_ponto[origem] + 1, 2 * pos_ponto[eixo] + 1])
+    livres = np.setdiff1d(np.arange(n_inc), fixas)
+    mapa_livres = np.full(n_inc, -1, dtype=np.int64)
+    mapa_livres[livres] = np.arange(len(livres))
+
+    i_dir = direcoes["EST"].map(pos_ponto).to_numpy()
+    j_dir = direcoes["PV"].map(pos_ponto).to_numpy()
+    hz_obs = direcoes["hz_rad"].to_numpy()
+    i_dist = distancias["PontoA"].map(pos_ponto).to_numpy()
+    j_dist = distancias["PontoB"].map(pos_ponto).to_numpy()
+    s_obs = distancias["DH_media"].to_numpy(dtype=np.float64)
+    n_dist = np.maximum(distancias["n"].to_numpy(dtype=np.float64), 1.0)
+
+    # Pesos (σ0 a priori = 1)
+    sig_dir = sigma_direcao_seg / SEG_POR_RAD
+    sig_dist = (sigma_distancia_mm / 1000.0 + sigma_distancia_ppm * 1e-6 * s_obs) / np.sqrt(n_dist)
+    sigma = np.concatenate([np.full(len(hz_obs), sig_dir), sig_dist])
+    peso = 1.0 / sigma**2
+
+    # Aproximações
+    xy0 = _coordenadas_aproximadas(pontos, direcoes, cod_setup, distancias, origem, eixo)
+    x = np.zeros(n_inc)
+    for p, (px, py) in xy0.items():
+        x[2 * pos_ponto[p]] = px
+        x[2 * pos_ponto[p] + 1] = py
+    az0 = _azimute(x[2 * j_dir] - x[2 * i_dir], x[2 * j_dir + 1] - x[2 * i_dir + 1])
+    x[2 * n_pontos:] = _media_circular_por_grupo(cod_setup, az0 - hz_obs, len(setups))
+
+    n_obs = len(hz_obs) + len(s_obs)
+    W = sparse.diags(peso)
+    obs = (i_dir, j_dir, cod_setup, hz_obs, i_dist, j_dist, s_obs)
+    cols_coord = mapa_livres[: 2 * n_pontos]
+    cols_coord = cols_coord[cols_coord >= 0]
+
+    # Gauss-Newton: N·dx = Aᵀ·P·l, com N = Aᵀ·P·A esparsa
+    convergiu = False
+    for iteracao in range(1, MAX_ITERACOES + 1):
+        A, l = _linearizar(x, n_pontos, *obs)
+        A = A.tocsc()[:, livres]
+        fator = _fatorar(A.T @ W @ A)
+        dx = fator.solve(A.T @ (peso * l))
+        x[livres] += dx
+        if np.max(np.abs(dx[cols_coord])) < TOLERANCIA_M:
+            convergiu = True
+            break
+
+    # Resíduos no ponto final (v = ajustado − observado = −l)
+    _, l = _linearizar(x, n_pontos, *obs)
+    v = -l
+    gl = n_obs - len(livres)
+    sigma0 = math.sqrt(float(np.sum(peso * v**2)) / gl) if gl > 0 else 1.0
+
+    # Desvios padrão das coordenadas: σ0² · diag(N⁻¹), com a última fatoração
+    diag = _diagonal_inversa(fator, cols_coord)
+    var = np.zeros(n_inc)
+    var[livres[cols_coord]] = diag * sigma0**2
+
+    X = x[0 : 2 * n_pontos : 2]
+    Y = x[1 : 2 * n_pontos : 2]
+    sx = np.sqrt(var[0 : 2 * n_pontos : 2]) * 1000.0
+    sy = np.sqrt(var[1 : 2 * n_pontos : 2]) * 1000.0
+    coordenadas = pd.DataFrame(
+        {
+            "Ponto": pontos,
+            "X_m": X,
+            "Y_m": Y,
+            "sigma_X_mm": sx,
+            "sigma_Y_mm": sy,
+            "sigma_pos_mm": np.hypot(sx, sy),
+            "fixo": [
+                "X, Y" if p == origem else ("Y" if p == eixo else "") for p in pontos
+            ],
+        }
+    )
+
+    est_seq = [s.split("\x1f") for s in setups]
+    orientacoes = pd.DataFrame(
+        {
+            "EST": [e for e, _ in est_seq],
+            "SEQ": [s for _, s in est_seq],
+            "orientacao_deg": np.degrees(np.mod(x[2 * n_pontos:], 2 * np.pi)),
+        }
+    )
+
+    v_dir = v[: len(hz_obs)] * SEG_POR_RAD
+    v_dist = v[len(hz_obs):] * 1000.0
+    residuos = pd.concat(
+        [
+            pd.DataFrame(
+                {
+                    "Tipo": "Direção",
+                    "De": direcoes["EST"],
+                    "Para": direcoes["PV"],
+                    "SEQ": direcoes["SEQ"],
+                    "Observado": np.degrees(hz_obs),
+                    "Resíduo": v_dir,
+                    "Unidade": "\"",
+                    "v/σ": v[: len(hz_obs)] / sigma[: len(hz_obs)],
+                }
+            ),
+            pd.DataFrame(
+                {
+                    "Tipo": "Distância",
+                    "De": distancias["PontoA"],
+                    "Para": distancias["PontoB"],
+                    "SEQ": np.nan,
+                    "Observado": s_obs,
+                    "Resíduo": v_dist,
+                    "Unidade": "mm",
+                    "v/σ": v[len(hz_obs):] / sigma[len(hz_obs):],
+                }
+            ),
+        ],
+        ignore_index=True,
+    )
+
+    return AjustamentoRede(
+        coordenadas=coordenadas,
+        orientacoes=orientacoes,
+        residuos=residuos,
+        sigma0=sigma0,
+        graus_liberdade=gl,
+        iteracoes=iteracao,
+        convergiu=convergiu,
+        origem=origem,
+        eixo=eixo,
+    )
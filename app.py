@@ -2,28 +2,40 @@
 # Interface principal Streamlit – duas "páginas":
 # 1) Carregar dados; 2) Processamento com cabeçalho UFPE.
 
+import hashlib
+import os
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from datetime import datetime
+
 import streamlit as st
-import pandas as pd
 
 from processing import (
     REQUIRED_COLS_ALL,
-    validar_dataframe,
-    calcular_linha_a_linha,
-    tabela_hz_por_serie,
-    tabela_z_por_serie,
-    tabela_resumo_final,
-    selecionar_linhas_por_estacao_e_conjunto,
-    calcular_triangulo_duas_linhas,
+    validar_observacoes,
+    compactar_resultado,
+    ResultadoProcessamento,
+    ESTACOES_LETRAS,
+    COLUNAS_EDITAVEIS,
+    iniciar_edicao,
+    aplicar_edicoes,
     gerar_modelo_excel_bytes,
     decimal_to_dms,
+    decimal_to_dms_array,
+    parse_angle_to_decimal,
 )
-from plotting import plotar_triangulo_info, gerar_xlsx_com_figura
-from utils import ler_identificacao_from_df
-
-st.set_page_config(
-    page_title="Calculadora de Ângulos e Distâncias | UFPE",
-    layout="wide",
-    page_icon="📐",
+from campanha import ingerir_planilhas, mesclar_planilhas
+from projeto import salvar_projeto, abrir_projeto, EXTENSAO_PROJETO
+from cache import CacheLRU
+from tarefas import iniciar_tarefa, CONCLUIDA, CANCELADA, FALHOU
+from diagnostico import (
+    cronometrado,
+    iniciar_coleta,
+    encerrar_coleta,
+    registros_atuais,
+    tabela_registros,
+    registros_json,
 )
 
 # ========================================================================
@@ -124,12 +136,205 @@ body, .stApp {
 :root{color-scheme:light;}
 </style>
 """
-st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
+
+
+# =================================================================
+# Cache das etapas de processamento
+# =================================================================
+# Cada etapa é indexada pela assinatura (hash do conteúdo) das observações
+# e pelos seus parâmetros; os objetos com "_" não entram no hash.
+CACHE_MAX_ENTRIES = 32
+CACHE_TTL_S = 60 * 60
+
+# Resultado compacto por sessão (EST/PV categóricos, DMS só na exibição; as
+# strings originais são compartilhadas com as observações). float32 reduz
+# ainda mais a memória, com resolução angular de ~0,1".
+RESULTADO_FLOAT32 = False
+
+
+# Planilhas enviadas: indexadas pelo SHA-256 dos bytes e compartilhadas entre
+# sessões (o mesmo arquivo de campo costuma ser enviado por vários alunos).
+UPLOAD_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+
+@st.cache_resource
+def _cache_uploads() -> CacheLRU:
+    return CacheLRU(max_bytes=UPLOAD_CACHE_MAX_BYTES)
+
+
+# Arquivos para download: gerados só quando o download é pedido e guardados
+# pela identidade do resultado (assinatura + parâmetros do artefato).
+DOWNLOAD_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+
+@st.cache_resource
+def _cache_downloads() -> CacheLRU:
+    return CacheLRU(max_bytes=DOWNLOAD_CACHE_MAX_BYTES)
+
+
+def _download_preguicoso(chave_artefato, gerar):
+    """Callable para st.download_button: gera os bytes na primeira vez e reusa depois."""
+    cache = _cache_downloads()
+
+    def _dados() -> bytes:
+        dados = cache.get(chave_artefato)
+        if dados is None:
+            dados = gerar()
+            cache.put(chave_artefato, dados, tamanho=len(dados))
+        return dados
+
+    return _dados
+
+
+# Tarefas em segundo plano (leitura e validação → junção → cálculo →
+# tabelas), num pool de threads por processo; as planilhas são lidas e
+# validadas em processos à parte.
+TAREFAS_SIMULTANEAS = 2
+INTERVALO_PROGRESSO_S = 0.5
+ETAPAS_ENVIO = ("Leitura e validação", "Junção", "Cálculo", "Tabelas")
+ETAPAS_CALCULO = ("res", "stats", "indice", "selecao")
+TABELAS_PRE_CALCULADAS = (
+    "tabela_linha",
+    "tabela_hz",
+    "tabela_z",
+    "resumo",
+    "qualidade",
+    "triangulos",
+    "discrepancias",
+)
+
+
+@st.cache_resource
+def _pool_tarefas() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=TAREFAS_SIMULTANEAS, thread_name_prefix="tarefa")
+
+
+# Modelo Excel: gerado uma única vez por processo
+@st.cache_resource
+def _modelo_excel_bytes() -> bytes:
+    return gerar_modelo_excel_bytes()
+
+
+# Um resultado por conjunto de observações, compartilhado entre sessões e
+# reruns (sem cópia); cada tabela é calculada no primeiro acesso. É um
+# CacheLRU (e não uma função st.cache_resource) porque as tarefas em segundo
+# plano, fora da thread do script, também o preenchem. O tamanho de cada
+# entrada cresce depois da inserção (etapas preguiçosas): a tarefa o mede de
+# novo depois de montar as tabelas, e a validade (TTL) limita o restante.
+RESULTADOS_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+
+@st.cache_resource
+def _cache_resultados() -> CacheLRU:
+    return CacheLRU(
+        max_bytes=RESULTADOS_CACHE_MAX_BYTES,
+        max_entradas=CACHE_MAX_ENTRIES,
+        ttl_s=CACHE_TTL_S,
+    )
+
+
+def _resultado_de(obs, cache=None) -> ResultadoProcessamento:
+    cache = cache if cache is not None else _cache_resultados()
+    chave = obs.assinatura()
+    resultado = cache.get(chave)
+    if resultado is None:
+        resultado = ResultadoProcessamento(obs, float32=RESULTADO_FLOAT32)
+        cache.put(chave, resultado, tamanho=0)
+    return resultado
+
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_S, show_spinner=False)
+def _grade_edicao_cache(chave, _obs):
+    """Observações como texto, para a grade editável (EST/PV/SEQ só leitura)."""
+    fixas = [c for c in ["ARQUIVO", "LINHA", "EST", "PV", "SEQ"] if c in _obs.df.columns]
+    grade = _obs.df[fixas].copy()
+    for c in COLUNAS_EDITAVEIS:
+        grade[c] = _obs.df[c].astype(object).fillna("").astype(str)
+    return grade
+
+
+# =================================================================
+# Edição das observações (recálculo incremental)
+# =================================================================
+def _editor_observacoes(resultado):
+    """
+    Grade editável das leituras. As células alteradas desde a última
+    execução são aplicadas ao EstadoEdicao da sessão, que recalcula só as
+    linhas, séries (EST, PV) e pares afetados. Retorna o resultado editado,
+    ou None enquanto não houver edições.
+    """
+    chave = resultado.assinatura()
+    grade = _grade_edicao_cache(chave, resultado.obs)
+    with st.expander("✏️ Corrigir leituras (edição direta)"):
+        st.caption(
+            "Altere Hz, Z ou DI de qualquer linha: apenas as linhas e séries "
+            "afetadas são recalculadas. Apague a alteração para voltar ao valor "
+            "da planilha."
+        )
+        st.data_editor(
+            grade,
+            key=f"editor_{chave}",
+            disabled=[c for c in grade.columns if c not in COLUNAS_EDITAVEIS],
+            hide_index=True,
+            use_container_width=True,
+        )
+
+    edicao = st.session_state.get("edicao")
+    if edicao is None or edicao["chave"] != chave:
+        edicao = {"chave": chave, "estado": None, "resultado": None, "aplicadas": {}}
+        st.session_state["edicao"] = edicao
+
+    editadas = st.session_state.get(f"editor_{chave}", {}).get("edited_rows", {})
+    desejadas = {
+        (int(i), c): ("" if v is None else str(v))
+        for i, celulas in editadas.items()
+        for c, v in celulas.items()
+        if c in COLUNAS_EDITAVEIS
+    }
+    aplicadas = edicao["aplicadas"]
+    delta = {}
+    for (i, c), v in desejadas.items():
+        if aplicadas.get((i, c), grade[c].iat[i]) != v:
+            delta.setdefault(i, {})[c] = v
+    for i, c in aplicadas:
+        if (i, c) not in desejadas:
+            delta.setdefault(i, {})[c] = grade[c].iat[i]  # volta ao original
+
+    if delta:
+        estado = edicao["estado"]
+        if estado is None:
+            estado = iniciar_edicao(resultado)
+        estado, recalculo = aplicar_edicoes(estado, delta)
+        edicao["estado"] = estado
+        # EST/PV/SEQ não são editáveis: a seleção de pares continua valendo
+        edicao["resultado"] = estado.resultado(selecao=resultado.selecao)
+        edicao["recalculo"] = recalculo
+        edicao["aplicadas"] = {
+            k: v for k, v in desejadas.items() if v != grade[k[1]].iat[k[0]]
+        }
+
+    if not edicao["aplicadas"]:
+        edicao["estado"] = None  # sem alterações: volta ao resultado original
+        edicao["resultado"] = None
+        return None
+
+    editado = edicao["resultado"]
+    recalculo = edicao.get("recalculo", {})
+    st.info(
+        f"{len(edicao['aplicadas'])} célula(s) corrigida(s). Última alteração: "
+        f"{recalculo.get('linhas', 0)} linha(s) editada(s), "
+        f"{recalculo.get('grupos', 0)} série(s) (EST, PV) recalculada(s)."
+    )
+    erros = validar_observacoes(editado.obs)
+    if erros:
+        st.warning("Leituras corrigidas com problemas:\n\n- " + "\n- ".join(erros))
+    return editado
 
 
 # =================================================================
 # Cabeçalho UFPE (usado apenas na página de processamento)
 # =================================================================
+@cronometrado(nome="app.cabecalho_ufpe")
 def cabecalho_ufpe(info_id):
     prof = info_id.get("Professor(a)", "")
     equip = info_id.get("Equipamento", "")
@@ -197,6 +402,7 @@ def cabecalho_ufpe(info_id):
 # ================================================================
 # Página 1 – Modelo + Upload
 # ================================================================
+@cronometrado(nome="app.pagina_carregar_dados")
 def pagina_carregar_dados():
     st.markdown('<div class="main-card">', unsafe_allow_html=True)
 
@@ -210,12 +416,12 @@ def pagina_carregar_dados():
         """,
         unsafe_allow_html=True,
     )
-    modelo_bytes = gerar_modelo_excel_bytes()
     st.download_button(
         "📥 Baixar modelo Excel (.xlsx)",
-        data=modelo_bytes,
+        data=_modelo_excel_bytes,  # gerado só no primeiro download do processo
         file_name="modelo_medicao_direcoes_ufpe.xlsx",
         mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        on_click="ignore",
     )
     st.markdown(
         """
@@ -237,58 +443,106 @@ def pagina_carregar_dados():
         """,
         unsafe_allow_html=True,
     )
-    uploaded = st.file_uploader(
-        "Envie o arquivo Excel (com abas Identificação e Dados)",
-        type=["xlsx", "xls"],
-    )
+    col_xlsx, col_proj = st.columns([3, 2])
+    with col_xlsx:
+        enviados = st.file_uploader(
+            "Envie o arquivo Excel (com abas Identificação e Dados)",
+            type=["xlsx", "xls"],
+            accept_multiple_files=True,
+            help=(
+                "Campanhas divididas em várias planilhas (por dia, por operador) "
+                "podem ser enviadas juntas: as leituras são reunidas numa só tabela."
+            ),
+        )
+    with col_proj:
+        projeto_enviado = st.file_uploader(
+            "Ou abra um projeto salvo",
+            type=["parquet"],
+            help=(
+                "Projeto gerado pelo botão 'Salvar projeto': "
+                "reabre sem reprocessar a planilha."
+            ),
+        )
 
-    if uploaded is None:
+    if not enviados and projeto_enviado is not None:
+        _carregar_projeto(projeto_enviado)
         st.markdown("</div>", unsafe_allow_html=True)
         return
 
-    try:
-        xls = pd.ExcelFile(uploaded)
-
-        # Identificação
-        sheet_id = None
-        for s in xls.sheet_names:
-            if s.strip().lower() in ["identificação", "identificacao"]:
-                sheet_id = s
-                break
-        info_id = {
-            "Professor(a)": "",
-            "Equipamento": "",
-            "Dados": "",
-            "Local": "",
-            "Patrimônio": "",
-        }
-        if sheet_id is not None:
-            df_id = pd.read_excel(xls, sheet_name=sheet_id)
-            info_id = ler_identificacao_from_df(df_id)
-
-        # Dados
-        sheet_dados = None
-        for s in xls.sheet_names:
-            if s.strip().lower() in ["dados", "medicoes", "medições"]:
-                sheet_dados = s
-                break
-        if sheet_dados is None:
-            sheet_dados = xls.sheet_names[0]
-
-        raw_df = pd.read_excel(xls, sheet_name=sheet_dados)
-    except Exception as e:
-        st.error(f"Erro ao ler o arquivo: {e}")
+    if not enviados:
+        _cancelar_tarefa_envio()
         st.markdown("</div>", unsafe_allow_html=True)
         return
 
-    st.success(
-        f"Arquivo '{uploaded.name}' carregado. Aba de dados utilizada: '{sheet_dados}'."
-    )
+    conteudos = [(arq.name, arq.getvalue()) for arq in enviados]
+    remover = True
+    if len(conteudos) > 1:
+        remover = st.checkbox("Descartar leituras duplicadas entre planilhas", value=True)
 
-    df_valid, erros = validar_dataframe(raw_df)
+    # Leitura, validação, cálculo e tabelas rodam em segundo plano; a página
+    # mostra cada parte assim que fica pronta
+    tarefa = _tarefa_envio(conteudos, remover)
+    visto = (tarefa.situacao, tuple(tarefa.parciais))
+    parciais = tarefa.parciais
+    if not tarefa.finalizada:
+        _painel_tarefa(tarefa, visto)
+    elif tarefa.situacao == CANCELADA:
+        st.warning("Processamento cancelado.")
+        if st.button("Processar novamente"):
+            st.session_state.pop("tarefa_envio", None)
+            st.rerun()
+    elif tarefa.situacao == FALHOU:
+        st.error(f"Erro no processamento: {tarefa.erro}")
+
+    if "planilhas" not in parciais:
+        st.markdown("</div>", unsafe_allow_html=True)
+        return
+
+    planilhas = parciais["planilhas"]
+    erros_planilhas = False
+    for p in planilhas:
+        if p.obs is None:
+            st.error(f"'{p.nome}': {p.erros[0]}")
+            erros_planilhas = True
+        elif len(planilhas) > 1 and p.erros:
+            st.error(f"'{p.nome}' não será incluída na campanha:")
+            for e in p.erros:
+                st.markdown(f"- {e}")
+            erros_planilhas = True
+        else:
+            st.success(
+                f"Arquivo '{p.nome}' carregado. Aba de dados utilizada: '{p.sheet_dados}'."
+            )
+
+    obs = parciais["obs"]
+    if obs is None:
+        st.markdown("</div>", unsafe_allow_html=True)
+        return
+    info_id, erros = parciais["info_id"], parciais["erros"]
+    campanha = parciais["campanha"]
+    if campanha is None:
+        nome_base = os.path.splitext(planilhas[0].nome)[0]
+    else:
+        nome_base = "campanha"
+        st.info(
+            f"Campanha com {len(campanha.arquivos)} planilha(s) e {len(obs)} "
+            "observações. A coluna ARQUIVO indica a origem de cada linha."
+        )
+        if erros_planilhas:
+            st.warning("Planilhas com problemas ficaram fora da campanha.")
+        if len(campanha.duplicadas):
+            acao = "descartadas" if remover else "mantidas"
+            with st.expander(
+                f"{len(campanha.duplicadas)} leitura(s) duplicada(s) ({acao})"
+            ):
+                st.dataframe(campanha.duplicadas, use_container_width=True)
+
+    df_valid = obs.df
 
     st.subheader("Pré-visualização dos dados importados")
-    cols_to_show = [c for c in REQUIRED_COLS_ALL if c in df_valid.columns]
+    cols_to_show = [
+        c for c in REQUIRED_COLS_ALL + ["ARQUIVO", "LINHA"] if c in df_valid.columns
+    ]
     st.dataframe(df_valid[cols_to_show], use_container_width=True)
 
     if erros:
@@ -298,31 +552,193 @@ def pagina_carregar_dados():
         st.markdown("</div>", unsafe_allow_html=True)
         return
 
-    cols_use = [c for c in REQUIRED_COLS_ALL if c in df_valid.columns]
-    df_uso = df_valid[cols_use].copy()
+    if tarefa.situacao != CONCLUIDA:
+        st.markdown("</div>", unsafe_allow_html=True)
+        return
 
-    st.session_state["df_uso"] = df_uso
+    st.session_state["obs"] = obs
     st.session_state["info_id"] = info_id
+    st.session_state.pop("resultado_projeto", None)
+
+    col_ir, col_salvar = st.columns(2)
+    with col_ir:
+        if st.button("Ir para processamento"):
+            st.session_state["pagina"] = "processamento"
+            st.rerun()
+    with col_salvar:
+        st.download_button(
+            "💾 Salvar projeto (.parquet)",
+            data=_download_preguicoso(
+                (obs.assinatura(), "projeto"),
+                lambda: salvar_projeto(info_id, obs),
+            ),
+            file_name=nome_base + EXTENSAO_PROJETO,
+            mime="application/octet-stream",
+            on_click="ignore",
+        )
+
+    st.markdown("</div>", unsafe_allow_html=True)
+
+
+def _processar_envio(tarefa, conteudos, chaves, remover_duplicadas, uploads, resultados):
+    """
+    Tarefa em segundo plano (sem chamadas st.*). Lê as planilhas que não
+    estão no cache de uploads (pelo SHA-256), valida, junta e calcula o
+    resultado e as tabelas, publicando cada parte assim que fica pronta.
+    """
+    tarefa.etapa("Leitura e validação")
+    planilhas = [uploads.get(ch) for ch in chaves]
+    faltando = [i for i, p in enumerate(planilhas) if p is None]
+    with closing(ingerir_planilhas([conteudos[i] for i in faltando])) as ingestao:
+        for n, (j, planilha) in enumerate(ingestao, 1):
+            i = faltando[j]
+            planilhas[i] = planilha
+            uploads.put(chaves[i], planilha)
+            tarefa.progresso(n, len(faltando))
+    # O nome vem do upload atual (o mesmo arquivo pode ter outro nome)
+    planilhas = [replace(p, nome=nome) for p, (nome, _) in zip(planilhas, conteudos)]
+
+    tarefa.etapa("Junção")
+    campanha = None
+    if len(planilhas) == 1:
+        obs, info_id, erros = planilhas[0].obs, planilhas[0].info_id, planilhas[0].erros
+    elif all(p.obs is None or p.erros for p in planilhas):
+        obs, info_id, erros = None, {}, []
+    else:
+        campanha = _mesclar_planilhas(planilhas, remover_duplicadas, uploads)
+        obs, info_id, erros = campanha.obs, campanha.info_id, []
+    tarefa.publicar(
+        planilhas=planilhas, campanha=campanha, obs=obs, info_id=info_id, erros=erros
+    )
+    if obs is None or erros:
+        return None
+
+    tarefa.etapa("Cálculo")
+    resultado = _resultado_de(obs, resultados)
+    for n, nome in enumerate(ETAPAS_CALCULO, 1):
+        getattr(resultado, nome)
+        tarefa.progresso(n, len(ETAPAS_CALCULO))
+    tarefa.publicar(resultado=resultado)
+
+    tarefa.etapa("Tabelas")
+    for n, nome in enumerate(TABELAS_PRE_CALCULADAS, 1):
+        getattr(resultado, nome)
+        tarefa.progresso(n, len(TABELAS_PRE_CALCULADAS))
+    resultados.put(obs.assinatura(), resultado, tamanho=resultado.tamanho_estimado())
+    return resultado
+
+
+def _tarefa_envio(conteudos, remover_duplicadas):
+    """Tarefa desta sessão para o envio atual; um envio diferente cancela a anterior."""
+    chaves = [hashlib.sha256(c).hexdigest() for _, c in conteudos]
+    chave = (tuple(zip([n for n, _ in conteudos], chaves)), remover_duplicadas)
+    atual = st.session_state.get("tarefa_envio")
+    if atual is not None and atual[0] == chave:
+        return atual[1]
+    _cancelar_tarefa_envio()
+    tarefa = iniciar_tarefa(
+        _pool_tarefas(),
+        _processar_envio,
+        ETAPAS_ENVIO,
+        conteudos,
+        chaves,
+        remover_duplicadas,
+        _cache_uploads(),
+        _cache_resultados(),
+    )
+    # Os tempos da tarefa vão para a coleta desta execução; guardada para
+    # o painel das execuções seguintes
+    st.session_state["tarefa_envio"] = (chave, tarefa, registros_atuais())
+    return tarefa
+
+
+def _registros_tarefa_envio(registros):
+    """Registros do diagnóstico com os da tarefa de envio (coletados noutra execução)."""
+    atual = st.session_state.get("tarefa_envio")
+    if atual is None or atual[2] is None or atual[2] is registros:
+        return list(registros)
+    return list(atual[2]) + list(registros)
+
+
+def _cancelar_tarefa_envio():
+    atual = st.session_state.pop("tarefa_envio", None)
+    if atual is not None:
+        atual[1].cancelar()
+
+
+@st.fragment(run_every=INTERVALO_PROGRESSO_S)
+def _painel_tarefa(tarefa, visto):
+    """
+    Progresso da tarefa, atualizado sozinho. Quando surge um resultado
+    parcial ou a tarefa termina, a página inteira é redesenhada.
+    """
+    if (tarefa.situacao, tuple(tarefa.parciais)) != visto:
+        st.rerun()
+    etapa = tarefa.nome_etapa or "Na fila"
+    st.progress(tarefa.andamento, text=f"{etapa}… {tarefa.andamento:.0%}")
+    st.button("Cancelar", on_click=tarefa.cancelar, key="cancelar_envio")
+
+
+def _mesclar_planilhas(planilhas, remover_duplicadas, cache):
+    chave = (
+        "campanha",
+        tuple((p.nome, p.obs.assinatura()) for p in planilhas if p.obs is not None),
+        remover_duplicadas,
+    )
+    campanha = cache.get(chave)
+    if campanha is None:
+        campanha = mesclar_planilhas(planilhas, remover_duplicadas=remover_duplicadas)
+        cache.put(chave, campanha)
+    return campanha
+
+
+def _carregar_projeto(arquivo):
+    """Abre um projeto salvo (observações + resultado já calculados)."""
+    conteudo = arquivo.getvalue()
+    chave_arquivo = ("projeto", hashlib.sha256(conteudo).hexdigest())
+    cache = _cache_uploads()
+    projeto = cache.get(chave_arquivo)
+    if projeto is None:
+        try:
+            projeto = abrir_projeto(conteudo)
+        except Exception as e:
+            st.error(f"Erro ao abrir o projeto: {e}")
+            return
+        cache.put(chave_arquivo, projeto)
+
+    obs = projeto.obs
+    st.success(f"Projeto '{arquivo.name}' aberto: {len(obs)} observações.")
+    st.subheader("Pré-visualização dos dados do projeto")
+    st.dataframe(obs.df_uso(), use_container_width=True)
+
+    st.session_state["obs"] = obs
+    st.session_state["info_id"] = projeto.info_id
+    res = compactar_resultado(
+        projeto.res, float32=RESULTADO_FLOAT32, manter_originais=True
+    )
+    st.session_state["resultado_projeto"] = (
+        obs.assinatura(),
+        ResultadoProcessamento(obs, res=res, float32=RESULTADO_FLOAT32),
+    )
 
     if st.button("Ir para processamento"):
         st.session_state["pagina"] = "processamento"
         st.rerun()
 
-    st.markdown("</div>", unsafe_allow_html=True)
-
 
 # =======================================================================
 # Página 2 – Processamento (3 a 7)
 # =======================================================================
+@cronometrado(nome="app.pagina_processamento")
 def pagina_processamento():
-    if "df_uso" not in st.session_state or "info_id" not in st.session_state:
+    if "obs" not in st.session_state or "info_id" not in st.session_state:
         st.warning("Nenhum dado carregado. Volte à página 'Carregar dados' primeiro.")
         if st.button("Voltar para carregar dados"):
             st.session_state["pagina"] = "carregar"
             st.rerun()
         return
 
-    df_uso = st.session_state["df_uso"]
+    obs = st.session_state["obs"]
     info_id = st.session_state["info_id"]
 
     cabecalho_ufpe(info_id)
@@ -340,28 +756,18 @@ def pagina_processamento():
         unsafe_allow_html=True,
     )
 
-    res = calcular_linha_a_linha(df_uso)
-
-    cols_linha = [
-        "EST",
-        "PV",
-        "SEQ",
-        "Hz_PD",
-        "Hz_PI",
-        "Hz_med_DMS",
-        "Z_PD",
-        "Z_PI",
-        "Z_corr_DMS",
-        "DH_PD_m",
-        "DH_PI_m",
-        "DH_med_m",
-    ]
-    df_linha = res[cols_linha].copy()
-    for c in ["DH_PD_m", "DH_PI_m", "DH_med_m"]:
-        df_linha[c] = df_linha[c].apply(
-            lambda x: f"{x:.3f}" if pd.notna(x) else ""
-        )
-    st_local.dataframe(df_linha, use_container_width=True)
+    chave = obs.assinatura()
+    chave_proj, resultado_proj = st.session_state.get("resultado_projeto", (None, None))
+    if chave_proj == chave:
+        resultado = resultado_proj
+    else:
+        resultado = _resultado_de(obs)
+
+    editado = _editor_observacoes(resultado)
+    if editado is not None:
+        resultado = editado
+    chave = resultado.assinatura()
+    st_local.dataframe(resultado.tabela_linha, use_container_width=True)
 
     # 4. Medição Angular Horizontal
     st_local.markdown(
@@ -373,8 +779,7 @@ def pagina_processamento():
         """,
         unsafe_allow_html=True,
     )
-    tab_hz = tabela_hz_por_serie(res)
-    st_local.dataframe(tab_hz, use_container_width=True)
+    st_local.dataframe(resultado.tabela_hz, use_container_width=True)
 
     # 5. Medição Angular Vertical / Zenital
     st_local.markdown(
@@ -386,8 +791,7 @@ def pagina_processamento():
         """,
         unsafe_allow_html=True,
     )
-    tab_z = tabela_z_por_serie(res)
-    st_local.dataframe(tab_z, use_container_width=True)
+    st_local.dataframe(resultado.tabela_z, use_container_width=True)
 
     # 6. Tabela resumo
     st_local.markdown(
@@ -399,8 +803,10 @@ def pagina_processamento():
         """,
         unsafe_allow_html=True,
     )
-    resumo = tabela_resumo_final(res, renomear_para_letras=True)
-    st_local.dataframe(resumo, use_container_width=True)
+    st_local.dataframe(resultado.resumo, use_container_width=True)
+
+    with st_local.expander("Qualidade das séries (dispersão em segundos de arco)"):
+        st_local.dataframe(resultado.qualidade, use_container_width=True)
 
     # 7. TRIÂNGULO SELECIONADO
     st_local.markdown(
@@ -413,82 +819,227 @@ def pagina_processamento():
         unsafe_allow_html=True,
     )
 
+    selecao = resultado.selecao
+    estacoes = selecao.estacoes_validas()
+    if not estacoes:
+        st_local.warning(
+            "Nenhuma combinação de estação e conjunto possui duas leituras "
+            "compatíveis. Verifique se a ordem das linhas (EST, PV) segue o modelo."
+        )
+        estacoes = ESTACOES_LETRAS
+
     col_a, col_b = st_local.columns(2)
     with col_a:
-        estacao_op = st_local.selectbox("Estação (A, B, C)", ["A", "B", "C"])
+        estacao_op = st_local.selectbox("Estação (A, B, C)", estacoes)
     with col_b:
         conjunto_op = st_local.selectbox(
             "Conjunto de leituras",
-            ["1ª leitura", "2ª leitura", "3ª leitura"],
+            selecao.conjuntos_validos(estacao_op),
         )
 
     st_local.markdown(
         "<p>O programa seleciona automaticamente o par de leituras adequadas "
-        "para formar o triângulo, conforme as regras definidas para cada estação.</p>",
+        "para formar o triângulo, conforme as regras definidas para cada estação. "
+        "Só são listadas as combinações disponíveis nos dados enviados.</p>",
         unsafe_allow_html=True,
     )
 
-    if st_local.button("Gerar triângulo"):
-        pares = selecionar_linhas_por_estacao_e_conjunto(res, estacao_op, conjunto_op)
-        if pares is None:
+    pares = selecao.par(estacao_op, conjunto_op)
+    if st_local.button("Gerar triângulo", disabled=pares is None):
+        # matplotlib/xlsxwriter só são importados quando o triângulo é gerado
+        from plotting import (
+            imagem_triangulo,
+            gerar_xlsx_com_figura,
+            FORMATO_PREVIA,
+            DPI_PREVIA,
+            FORMATO_EXPORTACAO,
+            DPI_EXPORTACAO,
+        )
+
+        info = resultado.triangulo(estacao_op, conjunto_op)
+        if info is None:
             st_local.error(
-                "Não foi possível encontrar duas leituras compatíveis para "
-                f"Estação {estacao_op} e {conjunto_op}. "
-                "Verifique se a ordem das linhas (EST, PV) segue o modelo."
+                "Falha ao calcular o triângulo a partir das leituras selecionadas."
             )
         else:
-            idx1, idx2 = pares
-            info = calcular_triangulo_duas_linhas(res, idx1, idx2, estacao_op, conjunto_op)
-            if info is None:
-                st_local.error(
-                    "Falha ao calcular o triângulo a partir das leituras selecionadas."
-                )
-            else:
-                est = info["EST"]
-                pv1 = info["PV1"]
-                pv2 = info["PV2"]
+            est = info["EST"]
+            pv1 = info["PV1"]
+            pv2 = info["PV2"]
+
+            st_local.markdown(
+                f"<p><b>Triângulo formado automaticamente pelos pontos {est}, {pv1} e {pv2} "
+                f"(conjunto: {conjunto_op}, estação selecionada: {estacao_op}).</b></p>",
+                unsafe_allow_html=True,
+            )
+
+            lados_ord = info.get("lados_ordenados", [])
+            ang_ord = info.get("angulos_ordenados", [])
+
+            col1, col2 = st_local.columns(2)
+            with col1:
+                st_local.markdown("**Lados (m) – do maior para o menor:**")
+                linhas_lados = []
+                for rot, p_ini, p_fim, val in lados_ord:
+                    linhas_lados.append(
+                        f"- {p_ini}–{p_fim} ({rot}): ` {val:.3f} ` m"
+                    )
+                st_local.markdown("\n".join(linhas_lados))
+
+                st_local.markdown("**Ângulos internos – do maior para o menor:**")
+                linhas_ang = []
+                for letra, p_nome, val in ang_ord:
+                    linhas_ang.append(
+                        f"- Em {p_nome} ({letra}): ` {decimal_to_dms(val)} `"
+                    )
+                st_local.markdown("\n".join(linhas_ang))
 
                 st_local.markdown(
-                    f"<p><b>Triângulo formado automaticamente pelos pontos {est}, {pv1} e {pv2} "
-                    f"(conjunto: {conjunto_op}, estação selecionada: {estacao_op}).</b></p>",
-                    unsafe_allow_html=True,
+                    f"**Área do triângulo:** ` {info['area_m2']:.3f} ` m²"
                 )
 
-                lados_ord = info.get("lados_ordenados", [])
-                ang_ord = info.get("angulos_ordenados", [])
-
-                col1, col2 = st_local.columns(2)
-                with col1:
-                    st_local.markdown("**Lados (m) – do maior para o menor:**")
-                    linhas_lados = []
-                    for rot, p_ini, p_fim, val in lados_ord:
-                        linhas_lados.append(
-                            f"- {p_ini}–{p_fim} ({rot}): ` {val:.3f} ` m"
-                        )
-                    st_local.markdown("\n".join(linhas_lados))
-
-                    st_local.markdown("**Ângulos internos – do maior para o menor:**")
-                    linhas_ang = []
-                    for letra, p_nome, val in ang_ord:
-                        linhas_ang.append(
-                            f"- Em {p_nome} ({letra}): ` {decimal_to_dms(val)} `"
-                        )
-                    st_local.markdown("\n".join(linhas_ang))
-
-                    st_local.markdown(
-                        f"**Área do triângulo:** ` {info['area_m2']:.3f} ` m²"
-                    )
+            with col2:
+                st_local.image(
+                    imagem_triangulo(info, formato=FORMATO_PREVIA, dpi=DPI_PREVIA)
+                )
 
-                with col2:
-                    img_buf, fig = plotar_triangulo_info(info, estacao_op, conjunto_op)
-                    st_local.pyplot(fig)
+            def _gerar_xlsx_triangulo() -> bytes:
+                img_export = imagem_triangulo(
+                    info, formato=FORMATO_EXPORTACAO, dpi=DPI_EXPORTACAO
+                )
+                return gerar_xlsx_com_figura(
+                    info, img_export, formato=FORMATO_EXPORTACAO
+                )
 
-                xlsx_bytes = gerar_xlsx_com_figura(info, img_buf)
+            st_local.download_button(
+                "📊 Baixar XLSX com resumo e figura do triângulo",
+                data=_download_preguicoso(
+                    (
+                        chave,
+                        "triangulo",
+                        estacao_op,
+                        conjunto_op,
+                        FORMATO_EXPORTACAO,
+                        DPI_EXPORTACAO,
+                    ),
+                    _gerar_xlsx_triangulo,
+                ),
+                file_name="triangulo_ufpe_resumo_figura.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                on_click="ignore",
+            )
+
+    with st_local.expander("Todos os triângulos da campanha (fechamento e discrepâncias)"):
+        tri = resultado.triangulos
+        tri_fmt = tri[["Estação", "Conjunto", "EST", "PV1", "PV2"]].copy()
+        for col, rot in [("AB", "EST–PV1 (m)"), ("AC", "EST–PV2 (m)"), ("BC", "PV1–PV2 (m)")]:
+            tri_fmt[rot] = tri[col].round(3)
+        for col, rot in [
+            ("ang_A_deg", "Ângulo EST"),
+            ("ang_B_deg", "Ângulo PV1"),
+            ("ang_C_deg", "Ângulo PV2"),
+        ]:
+            tri_fmt[rot] = decimal_to_dms_array(tri[col])
+        tri_fmt["Área (m²)"] = tri["area_m2"].round(3)
+        tri_fmt["Fechamento do conjunto (\")"] = tri["fechamento_seg"].round(1)
+        st_local.dataframe(tri_fmt, use_container_width=True)
+
+        st_local.markdown("**Discrepâncias entre estações para o mesmo lado (m):**")
+        st_local.dataframe(resultado.discrepancias.round(3), use_container_width=True)
+
+    with st_local.expander("Coordenadas por irradiação (todos os pontos visados)"):
+        st_local.markdown(
+            "<p>Irradia todos os pontos a partir de uma estação com coordenadas "
+            "e orientação conhecidas; as estações irradiadas são orientadas pelas "
+            "visadas a pontos já calculados e irradiam os demais. Pontos visados "
+            "de mais de uma estação mostram a discrepância entre as determinações.</p>",
+            unsafe_allow_html=True,
+        )
+        estacoes_irr = sorted(resultado.res["EST"].dropna().astype(str).unique())
+        c1, c2, c3 = st_local.columns(3)
+        est_irr = c1.selectbox("Estação de partida", estacoes_irr, key=f"irr_est_{chave}")
+        x0 = c2.number_input("X da estação (m)", value=0.0, format="%.3f")
+        y0 = c3.number_input("Y da estação (m)", value=0.0, format="%.3f")
+        visados = sorted(
+            resultado.res.loc[resultado.res["EST"].astype(str) == est_irr, "PV"]
+            .dropna()
+            .astype(str)
+            .unique()
+        )
+        c4, c5 = st_local.columns(2)
+        re_irr = c4.selectbox(
+            "Ponto de ré (orientação)",
+            ["(direção de referência da estação)"] + visados,
+            key=f"irr_re_{chave}",
+        )
+        az_txt = c5.text_input("Azimute da orientação (DMS)", value="0°00'00\"")
+        az_irr = parse_angle_to_decimal(az_txt)
+        if az_irr != az_irr:
+            st_local.error("Azimute inválido. Use, por exemplo, 123°45'10\".")
+        elif st_local.toggle("Calcular coordenadas", key=f"irradiar_{chave}"):
+            try:
+                irr = resultado.irradiacao(
+                    est_irr,
+                    xy=(x0, y0),
+                    orientacao_deg=az_irr,
+                    ponto_re=None if re_irr not in visados else re_irr,
+                )
+            except ValueError as e:
+                st_local.error(f"Não foi possível irradiar: {e}")
+            else:
+                st_local.markdown("**Coordenadas:**")
+                st_local.dataframe(irr.coordenadas.round(4), use_container_width=True)
+                st_local.markdown("**Determinações por visada (discrepâncias em mm):**")
+                st_local.dataframe(irr.visadas.round(4), use_container_width=True)
                 st_local.download_button(
-                    "📊 Baixar XLSX com resumo e figura do triângulo",
-                    data=xlsx_bytes,
-                    file_name="triangulo_ufpe_resumo_figura.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                    "⬇️ Baixar coordenadas irradiadas (CSV)",
+                    data=irr.coordenadas.to_csv(index=False).encode("utf-8"),
+                    file_name="coordenadas_irradiadas.csv",
+                    mime="text/csv",
+                    on_click="ignore",
+                )
+
+    with st_local.expander("Ajustamento da rede (mínimos quadrados)"):
+        st_local.markdown(
+            "<p>Ajusta simultaneamente todas as direções Hz e distâncias DH "
+            "da campanha, em sistema local com a primeira estação na origem.</p>",
+            unsafe_allow_html=True,
+        )
+        c1, c2, c3 = st_local.columns(3)
+        sig_dir = c1.number_input("σ direção (\")", min_value=0.1, value=2.0, step=0.5)
+        sig_mm = c2.number_input("σ distância (mm)", min_value=0.1, value=2.0, step=0.5)
+        sig_ppm = c3.number_input("σ distância (ppm)", min_value=0.0, value=2.0, step=0.5)
+        if st_local.toggle("Calcular ajustamento", key=f"ajustar_{chave}"):
+            try:
+                aj = resultado.ajustamento(
+                    sigma_direcao_seg=sig_dir,
+                    sigma_distancia_mm=sig_mm,
+                    sigma_distancia_ppm=sig_ppm,
+                )
+            except ValueError as e:
+                st_local.error(f"Não foi possível ajustar a rede: {e}")
+            else:
+                st_local.markdown(
+                    f"**σ₀ a posteriori:** ` {aj.sigma0:.3f} ` — "
+                    f"**graus de liberdade:** ` {aj.graus_liberdade} ` — "
+                    f"**iterações:** ` {aj.iteracoes} ` — "
+                    f"**datum:** {aj.origem} em (0, 0), {aj.eixo} sobre o eixo X"
+                )
+                if not aj.convergiu:
+                    st_local.warning(
+                        f"O ajustamento não convergiu em {aj.iteracoes} iterações: "
+                        "verifique observações grosseiras ou pontos mal determinados. "
+                        "Os valores abaixo são os da última iteração."
+                    )
+                st_local.markdown("**Coordenadas ajustadas:**")
+                st_local.dataframe(aj.coordenadas.round(4), use_container_width=True)
+                st_local.markdown("**Resíduos das observações:**")
+                st_local.dataframe(aj.residuos.round(3), use_container_width=True)
+                st_local.download_button(
+                    "⬇️ Baixar coordenadas ajustadas (CSV)",
+                    data=aj.coordenadas.to_csv(index=False).encode("utf-8"),
+                    file_name="coordenadas_ajustadas.csv",
+                    mime="text/csv",
+                    on_click="ignore",
                 )
 
     st_local.markdown(
@@ -504,12 +1055,62 @@ def pagina_processamento():
 
 
 # ==================================================================
-# Controle simples de "páginas" via session_state
+# Diagnóstico de desempenho (barra lateral, opcional)
 # ==================================================================
-if "pagina" not in st.session_state:
-    st.session_state["pagina"] = "carregar"
+def painel_diagnostico(registros):
+    with st.sidebar.expander("Tempos desta execução", expanded=True):
+        tab = tabela_registros(registros)
+        topo = tab[~tab["etapa"].str.startswith(" ")]
+        st.markdown(f"**Total:** `{topo['tempo_ms'].sum():.1f} ms`")
+        st.dataframe(tab, use_container_width=True, hide_index=True)
+        st.download_button(
+            "⬇️ Exportar tempos (JSON)",
+            data=registros_json(
+                registros,
+                pagina=st.session_state.get("pagina"),
+                data=datetime.now().isoformat(timespec="seconds"),
+            ),
+            file_name="diagnostico_tempos.json",
+            mime="application/json",
+            on_click="ignore",
+        )
+
+
+def main():
+    st.set_page_config(
+        page_title="Calculadora de Ângulos e Distâncias | UFPE",
+        layout="wide",
+        page_icon="📐",
+    )
+    st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
+
+    diagnostico_ativo = st.sidebar.toggle(
+        "Diagnóstico de desempenho",
+        key="diagnostico_ativo",
+        help="Mede o tempo de cada etapa (leitura, validação, cálculos, tabelas, figura, exportação).",
+    )
+    registros_diag = iniciar_coleta() if diagnostico_ativo else None
+    if not diagnostico_ativo:
+        encerrar_coleta()
+
+    # ==================================================================
+    # Controle simples de "páginas" via session_state
+    # ==================================================================
+    if "pagina" not in st.session_state:
+        st.session_state["pagina"] = "carregar"
+
+    if st.session_state["pagina"] == "carregar":
+        pagina_carregar_dados()
+    else:
+        pagina_processamento()
+
+    if diagnostico_ativo:
+        if st.session_state["pagina"] == "carregar":
+            registros_diag = _registros_tarefa_envio(registros_diag)
+        painel_diagnostico(registros_diag)
+
 
-if st.session_state["pagina"] == "carregar":
-    pagina_carregar_dados()
-else:
-    pagina_processamento()
+# Os processos de leitura das planilhas (campanha.py, via forkserver) importam
+# de novo este script, como __mp_main__; ali só as definições interessam
+if __name__ != "__mp_main__":
+    main()
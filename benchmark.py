@@ -0,0 +1,308 @@
+# benchmark.py
+# Benchmarks de tempo e memória das funções públicas, com dados sintéticos
+
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+import processing as proc
+
+# 12 linhas = aula (3 estações × 2 PVs × 2 séries); 1M = campanha extrema
+TAMANHOS_PADRAO = [12, 1_000, 10_000, 100_000]
+TAMANHOS_TODOS = TAMANHOS_PADRAO + [1_000_000]
+
+
+# ---------------------------------------------------------------------
+# Gerador de dados sintéticos
+# ---------------------------------------------------------------------
+def _formatar_angulos(ang: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """Mistura os formatos aceitos: DMS (° ou º, com/sem espaço) e decimal (ponto ou vírgula)."""
+    dms = proc.decimal_to_dms_array(ang)
+    formato = rng.integers(0, 4, size=len(ang))
+    out = dms.copy()
+    sel = formato == 1
+    out[sel] = np.char.replace(
+        np.char.replace(dms[sel].astype(str), "°", "º "), "'", "' "
+    ).astype(object)
+    sel = formato == 2
+    out[sel] = np.char.mod("%.6f", ang[sel]).astype(object)
+    sel = formato == 3
+    out[sel] = np.char.replace(np.char.mod("%.6f", ang[sel]), ".", ",").astype(object)
+    return out
+
+
+def gerar_observacoes_sinteticas(
+    n_linhas: int, n_pontos: int = 3, seed: int = 0
+) -> pd.DataFrame:
+    """
+    Gera uma aba Dados realista com ~n_linhas leituras: cada estação P1..Pn
+    visa todos os outros pontos em várias séries (SEQ), com Hz/Z conjugados
+    (PI ≈ PD + 180° e 360° − Z) e pequenas discrepâncias de segundos e
+    milímetros. Ângulos em formatos mistos (DMS e decimal); distâncias como
+    números ou texto com vírgula.
+    """
+    rng = np.random.default_rng(seed)
+    pontos = [f"P{i + 1}" for i in range(n_pontos)]
+    visadas = [(e, v) for e in pontos for v in pontos if v != e]
+    n_series = max(1, -(-n_linhas // len(visadas)))
+
+    # Geometria fixa por visada: direção de referência, zenital e distância
+    hz_ref = rng.uniform(0.0, 360.0, size=len(visadas))
+    z_ref = rng.uniform(85.0, 95.0, size=len(visadas))
+    di_ref = rng.uniform(20.0, 300.0, size=len(visadas))
+
+    # Ordem do modelo: para cada estação, série a série, todas as visadas
+    i_est = np.repeat(np.arange(n_pontos), n_series * (n_pontos - 1))
+    seq = np.tile(np.repeat(np.arange(1, n_series + 1), n_pontos - 1), n_pontos)
+    i_vis = i_est * (n_pontos - 1) + np.tile(np.arange(n_pontos - 1), n_pontos * n_series)
+    i_vis, i_est, seq = i_vis[:n_linhas], i_est[:n_linhas], seq[:n_linhas]
+    n = len(i_vis)
+
+    ruido_seg = rng.normal(0.0, 3.0, size=(4, n)) / 3600.0
+    hz_pd = np.mod(hz_ref[i_vis] + ruido_seg[0], 360.0)
+    hz_pi = np.mod(hz_pd + 180.0 + ruido_seg[1], 360.0)
+    z_pd = z_ref[i_vis] + ruido_seg[2]
+    z_pi = 360.0 - z_pd + ruido_seg[3]
+    di_pd = np.round(di_ref[i_vis] + rng.normal(0.0, 0.002, size=n), 3)
+    di_pi = np.round(di_pd + rng.normal(0.0, 0.001, size=n), 3)
+
+    di_pi_txt = np.char.replace(np.char.mod("%.3f", di_pi), ".", ",").astype(object)
+    usa_txt = rng.random(n) < 0.3
+    di_pi_col = np.where(usa_txt, di_pi_txt, di_pi.astype(object))
+
+    return pd.DataFrame(
+        {
+            "EST": np.array(pontos, dtype=object)[i_est],
+            "PV": np.array([v for _, v in visadas], dtype=object)[i_vis],
+            "SEQ": seq,
+            "Hz_PD": _formatar_angulos(hz_pd, rng),
+            "Hz_PI": _formatar_angulos(hz_pi, rng),
+            "Z_PD": _formatar_angulos(z_pd, rng),
+            "Z_PI": _formatar_angulos(z_pi, rng),
+            "DI_PD": di_pd,
+            "DI_PI": di_pi_col,
+        }
+    )
+
+
+# ---------------------------------------------------------------------
+# Casos medidos
+# ---------------------------------------------------------------------
+def _casos(df: pd.DataFrame) -> List[Tuple[str, Callable[[], None]]]:
+    """
+    Lista (nome, função sem argumentos) para um conjunto de dados. As entradas
+    de cada etapa são calculadas aqui, fora da medição.
+    """
+    from plotting import _cache_figuras, gerar_xlsx_com_figura, imagem_triangulo
+
+    df_val, erros = proc.validar_dataframe(df)
+    if erros:
+        raise ValueError(f"Dados sintéticos inválidos: {erros}")
+    res = proc.calcular_linha_a_linha(df_val)
+    stats = proc.estatisticas_series(res)
+    indice = proc.indice_pares(res)
+    selecao = proc.indice_selecao(res)
+    i1, i2 = selecao.par("B", "1ª leitura")
+    info = proc.calcular_triangulo_duas_linhas(
+        res, i1, i2, "B", "1ª leitura", indice=indice
+    )
+    img = imagem_triangulo(info)
+
+    def plotar():
+        _cache_figuras.limpar()  # mede a renderização, não o cache
+        imagem_triangulo(info)
+
+    return [
+        ("validar_dataframe", lambda: proc.validar_dataframe(df)),
+        ("calcular_linha_a_linha", lambda: proc.calcular_linha_a_linha(df_val)),
+        ("estatisticas_series", lambda: proc.estatisticas_series(res)),
+        ("tabela_hz_por_serie", lambda: proc.tabela_hz_por_serie(res)),
+        ("tabela_z_por_serie", lambda: proc.tabela_z_por_serie(res)),
+        (
+            "tabela_distancias_medias_simetricas",
+            lambda: proc.tabela_distancias_medias_simetricas(res),
+        ),
+        ("tabela_resumo_final", lambda: proc.tabela_resumo_final(res, stats=stats)),
+        (
+            "calcular_triangulo_duas_linhas",
+            lambda: proc.calcular_triangulo_duas_linhas(res, i1, i2, "A", "1ª leitura"),
+        ),
+        ("tabela_triangulos_campanha", lambda: proc.tabela_triangulos_campanha(res)),
+        ("imagem_triangulo", plotar),
+        ("gerar_xlsx_com_figura", lambda: gerar_xlsx_com_figura(info, img)),
+        ("gerar_modelo_excel_bytes", proc.gerar_modelo_excel_bytes),
+    ]
+
+
+def _medir(func: Callable[[], None], repeticoes: int) -> Dict:
+    """Tempo (min e mediana de 'repeticoes') e pico de memória (tracemalloc, à parte)."""
+    if repeticoes > 1:
+        func()  # aquecimento (imports tardios, caches de primeira chamada)
+    tempos = []
+    for _ in range(repeticoes):
+        gc.collect()
+        t0 = time.perf_counter()
+        func()
+        tempos.append(time.perf_counter() - t0)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "tempo_min_s": min(tempos),
+        "tempo_mediana_s": statistics.median(tempos),
+        "memoria_pico_bytes": pico,
+        "repeticoes": repeticoes,
+    }
+
+
+def executar(
+    tamanhos: List[int],
+    repeticoes: int = 3,
+    filtro: Optional[str] = None,
+    seed: int = 0,
+) -> Dict:
+    """Executa todos os casos (ou os que contêm 'filtro') para cada tamanho."""
+    resultados = []
+    for n in tamanhos:
+        df = gerar_observacoes_sinteticas(n, seed=seed)
+        # Tamanhos grandes: menos repetições para não estourar o tempo total
+        rep = repeticoes if n <= 100_000 else 1
+        for nome, func in _casos(df):
+            if filtro and filtro not in nome:
+                continue
+            medida = _medir(func, rep)
+            medida.update({"funcao": nome, "n_linhas": len(df)})
+            resultados.append(medida)
+            print(
+                f"{nome:<38} {len(df):>9} linhas  "
+                f"{medida['tempo_min_s'] * 1000:>10.2f} ms  "
+                f"{medida['memoria_pico_bytes'] / 2**20:>9.2f} MiB",
+                flush=True,
+            )
+    return {
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "plataforma": platform.platform(),
+        "versoes": {"numpy": np.__version__, "pandas": pd.__version__},
+        "seed": seed,
+        "resultados": resultados,
+    }
+
+
+# ---------------------------------------------------------------------
+# Comparação com uma linha de base
+# ---------------------------------------------------------------------
+def comparar(
+    atual: Dict,
+    base: Dict,
+    tolerancia: float = 0.20,
+    min_delta_ms: float = 1.0,
+) -> List[Dict]:
+    """
+    Compara 'atual' com 'base' por (funcao, n_linhas). É regressão quando o
+    tempo mínimo (ou o pico de memória) cresce mais que 'tolerancia'; no
+    tempo, diferenças abaixo de 'min_delta_ms' são tratadas como ruído.
+    """
+    ref = {(r["funcao"], r["n_linhas"]): r for r in base["resultados"]}
+    linhas = []
+    for r in atual["resultados"]:
+        b = ref.get((r["funcao"], r["n_linhas"]))
+        if b is None:
+            continue
+        razao_t = r["tempo_min_s"] / b["tempo_min_s"] if b["tempo_min_s"] > 0 else 1.0
+        razao_m = (
+            r["memoria_pico_bytes"] / b["memoria_pico_bytes"]
+            if b["memoria_pico_bytes"] > 0
+            else 1.0
+        )
+        delta_ms = (r["tempo_min_s"] - b["tempo_min_s"]) * 1000.0
+        linhas.append(
+            {
+                "funcao": r["funcao"],
+                "n_linhas": r["n_linhas"],
+                "razao_tempo": razao_t,
+                "razao_memoria": razao_m,
+                "regressao_tempo": razao_t > 1 + tolerancia and delta_ms > min_delta_ms,
+                "regressao_memoria": razao_m > 1 + tolerancia,
+            }
+        )
+    return linhas
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Benchmarks de tempo e memória com dados de campo sintéticos."
+    )
+    parser.add_argument(
+        "-n",
+        "--tamanhos",
+        type=int,
+        nargs="+",
+        default=TAMANHOS_PADRAO,
+        help=f"Número de linhas (padrão: {TAMANHOS_PADRAO}).",
+    )
+    parser.add_argument(
+        "--todos", action="store_true", help=f"Usa {TAMANHOS_TODOS} (inclui 1M linhas)."
+    )
+    parser.add_argument("-r", "--repeticoes", type=int, default=3)
+    parser.add_argument("-k", "--filtro", default=None, help="Só funções com este trecho no nome.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "-o", "--saida", default="benchmark_resultados.json", help="Arquivo JSON de saída."
+    )
+    parser.add_argument(
+        "--comparar", default=None, help="JSON de linha de base para detectar regressões."
+    )
+    parser.add_argument("--tolerancia", type=float, default=0.20)
+    parser.add_argument("--min-delta-ms", type=float, default=1.0)
+    args = parser.parse_args(argv)
+
+    tamanhos = TAMANHOS_TODOS if args.todos else args.tamanhos
+    atual = executar(tamanhos, args.repeticoes, args.filtro, args.seed)
+    with open(args.saida, "w", encoding="utf-8") as f:
+        json.dump(atual, f, ensure_ascii=False, indent=2)
+    print(f"Resultados gravados em {os.path.abspath(args.saida)}")
+
+    if not args.comparar:
+        return 0
+
+    with open(args.comparar, encoding="utf-8") as f:
+        base = json.load(f)
+    linhas = comparar(atual, base, args.tolerancia, args.min_delta_ms)
+    n_reg = 0
+    print(f"\nComparação com {args.comparar} (tolerância {args.tolerancia:.0%}):")
+    for c in linhas:
+        marcas = []
+        if c["regressao_tempo"]:
+            marcas.append("REGRESSÃO tempo")
+        if c["regressao_memoria"]:
+            marcas.append("REGRESSÃO memória")
+        n_reg += bool(marcas)
+        print(
+            f"{c['funcao']:<38} {c['n_linhas']:>9}  "
+            f"tempo ×{c['razao_tempo']:.2f}  memória ×{c['razao_memoria']:.2f}  "
+            f"{' / '.join(marcas)}"
+        )
+    print(f"{n_reg} regressão(ões).")
+    return 1 if n_reg else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
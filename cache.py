@@ -0,0 +1,122 @@
+# cache.py
+# Cache LRU em memória com limite de tamanho (bytes)
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import fields, is_dataclass
+from typing import Any, Hashable, Optional
+
+import numpy as np
+import pandas as pd
+
+
+def estimar_tamanho(obj: Any) -> int:
+    """
+    Estimativa (em bytes) da memória ocupada por 'obj'.
+    Conta DataFrames/arrays pelo conteúdo e percorre dicts, listas e dataclasses.
+    """
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(index=True, deep=True).sum())
+    if isinstance(obj, pd.Series):
+        return int(obj.memory_usage(index=True, deep=True))
+    if isinstance(obj, np.ndarray):
+        return int(obj.nbytes)
+    if isinstance(obj, (bytes, bytearray, str)):
+        return sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(
+            estimar_tamanho(k) + estimar_tamanho(v) for k, v in obj.items()
+        )
+    if isinstance(obj, (list, tuple, set)):
+        return sys.getsizeof(obj) + sum(estimar_tamanho(v) for v in obj)
+    if is_dataclass(obj) and not isinstance(obj, type):
+        return sum(estimar_tamanho(getattr(obj, f.name)) for f in fields(obj))
+    return sys.getsizeof(obj)
+
+
+class CacheLRU:
+    """
+    Cache LRU thread-safe limitado pelo tamanho total estimado das entradas.
+
+    Ao inserir, as entradas usadas há mais tempo são descartadas até o total
+    caber em 'max_bytes'. Uma entrada maior que o limite não é armazenada.
+    Com 'ttl_s', uma entrada expira esse tempo depois de inserida.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        max_entradas: Optional[int] = None,
+        ttl_s: Optional[float] = None,
+    ):
+        self.max_bytes = max_bytes
+        self.max_entradas = max_entradas
+        self.ttl_s = ttl_s
+        self._dados: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._tamanhos: dict = {}
+        self._inseridas: dict = {}
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._dados)
+
+    def __contains__(self, chave: Hashable) -> bool:
+        return chave in self._dados
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total
+
+    def get(self, chave: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if chave not in self._dados:
+                return default
+            if self._expirada(chave, time.monotonic()):
+                self._remover(chave)
+                return default
+            self._dados.move_to_end(chave)
+            return self._dados[chave]
+
+    def put(self, chave: Hashable, valor: Any, tamanho: Optional[int] = None) -> None:
+        if tamanho is None:
+            tamanho = estimar_tamanho(valor)
+        with self._lock:
+            self._remover(chave)
+            agora = time.monotonic()
+            for antiga in [c for c in self._dados if self._expirada(c, agora)]:
+                self._remover(antiga)
+            if tamanho > self.max_bytes:
+                return
+            self._dados[chave] = valor
+            self._tamanhos[chave] = tamanho
+            self._inseridas[chave] = agora
+            self._total += tamanho
+            while self._total > self.max_bytes or (
+                self.max_entradas is not None and len(self._dados) > self.max_entradas
+            ):
+                antiga, _ = self._dados.popitem(last=False)
+                self._total -= self._tamanhos.pop(antiga)
+                self._inseridas.pop(antiga)
+
+    def remover(self, chave: Hashable) -> None:
+        with self._lock:
+            self._remover(chave)
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._dados.clear()
+            self._tamanhos.clear()
+            self._inseridas.clear()
+            self._total = 0
+
+    def _expirada(self, chave: Hashable, agora: float) -> bool:
+        return self.ttl_s is not None and agora - self._inseridas[chave] > self.ttl_s
+
+    def _remover(self, chave: Hashable) -> None:
+        if chave in self._dados:
+            del self._dados[chave]
+            self._total -= self._tamanhos.pop(chave)
+            self._inseridas.pop(chave)
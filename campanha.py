@@ -0,0 +1,236 @@
+# campanha.py
+# Campanha em várias planilhas: leitura concorrente, junção e leituras duplicadas
+
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from diagnostico import cronometrado
+from processing import (
+    REQUIRED_COLS_ALL,
+    TabelaObservacoes,
+    construir_observacoes,
+    validar_observacoes,
+    concatenar_observacoes,
+    filtrar_observacoes,
+)
+from utils import ler_planilha_bytes
+
+# Colunas que identificam uma leitura: (EST, PV, SEQ) + leituras brutas
+COLUNAS_CHAVE_LEITURA = REQUIRED_COLS_ALL
+
+COLUNAS_DUPLICADAS = [
+    "ARQUIVO",
+    "LINHA",
+    "EST",
+    "PV",
+    "SEQ",
+    "ARQUIVO_ORIGINAL",
+    "LINHA_ORIGINAL",
+]
+
+
+@dataclass
+class PlanilhaCampo:
+    """Uma planilha lida e validada (obs é None se a leitura falhou)."""
+
+    nome: str
+    info_id: Dict[str, str]
+    sheet_dados: str
+    obs: Optional[TabelaObservacoes]
+    erros: List[str] = field(default_factory=list)
+
+
+@dataclass
+class Campanha:
+    """
+    Observações de várias planilhas numa só tabela:
+
+    - obs: observações juntadas (df com ARQUIVO e LINHA de origem);
+    - info_id: identificação combinada (valores distintos unidos por " / ");
+    - duplicadas: leituras que repetem as de outra planilha e a ocorrência mantida;
+    - arquivos: planilhas incluídas, na ordem da junção.
+    """
+
+    obs: TabelaObservacoes
+    info_id: Dict[str, str]
+    duplicadas: pd.DataFrame
+    arquivos: List[str]
+
+
+def ler_planilha_campo(nome: str, conteudo: bytes) -> PlanilhaCampo:
+    """
+    Lê, converte e valida uma planilha. Nunca levanta exceção: problemas
+    vão para 'erros' (executada nos processos do pool).
+    """
+    try:
+        info_id, raw_df, sheet_dados = ler_planilha_bytes(conteudo)
+    except Exception as e:
+        return PlanilhaCampo(nome, {}, "", None, [f"Erro ao ler o arquivo: {e}"])
+    obs = construir_observacoes(raw_df)
+    return PlanilhaCampo(nome, info_id, sheet_dados, obs, validar_observacoes(obs))
+
+
+def _ler_planilha_campo(arquivo: Tuple[str, bytes]) -> PlanilhaCampo:
+    return ler_planilha_campo(*arquivo)
+
+
+# Pools da leitura, por número de processos; criados na primeira campanha e
+# reaproveitados (cada processo novo paga a importação de pandas/openpyxl)
+_pools: Dict[Optional[int], ProcessPoolExecutor] = {}
+_pools_lock = threading.Lock()
+
+
+def _pool_leitura(workers: Optional[int]) -> ProcessPoolExecutor:
+    """
+    Pool de processos da leitura. Usa forkserver (ou spawn): o servidor do
+    Streamlit tem várias threads, e um fork dele pode herdar locks presos.
+    """
+    with _pools_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            metodos = multiprocessing.get_all_start_methods()
+            contexto = multiprocessing.get_context(
+                "forkserver" if "forkserver" in metodos else "spawn"
+            )
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=contexto)
+            _pools[workers] = pool
+        return pool
+
+
+def _descartar_pool(workers: Optional[int], pool: ProcessPoolExecutor) -> None:
+    """Remove um pool quebrado (processo morto); a próxima leitura cria outro."""
+    with _pools_lock:
+        if _pools.get(workers) is pool:
+            del _pools[workers]
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def ingerir_planilhas(
+    arquivos: List[Tuple[str, bytes]], workers: Optional[int] = None
+) -> Iterator[Tuple[int, PlanilhaCampo]]:
+    """
+    Lê e valida as planilhas (nome, bytes) no pool de processos da leitura e
+    produz (posição em 'arquivos', planilha) à medida que cada uma termina.
+    Uma planilha só (ou workers=1) é lida no próprio processo. Se o
+    consumidor parar antes do fim (cancelamento), as planilhas ainda na
+    fila são descartadas.
+    """
+    if len(arquivos) <= 1 or workers == 1:
+        for i, a in enumerate(arquivos):
+            yield i, _ler_planilha_campo(a)
+        return
+    pool = _pool_leitura(workers)
+    futuros = {}
+    try:
+        for i, a in enumerate(arquivos):
+            futuros[pool.submit(_ler_planilha_campo, a)] = i
+        for futuro in as_completed(futuros):
+            yield futuros[futuro], futuro.result()
+    except BrokenProcessPool:
+        _descartar_pool(workers, pool)
+        raise
+    finally:
+        for futuro in futuros:
+            futuro.cancel()
+
+
+def _chave_leitura(df: pd.DataFrame) -> pd.DataFrame:
+    """Colunas da chave como texto normalizado (25.365 e "25.365" coincidem)."""
+    chave = df[COLUNAS_CHAVE_LEITURA].astype(object)
+    return chave.where(chave.notna(), "").astype(str).apply(lambda s: s.str.strip())
+
+
+@cronometrado
+def detectar_duplicadas(obs: TabelaObservacoes) -> Tuple[np.ndarray, pd.DataFrame]:
+    """
+    Junção por hash de (EST, PV, SEQ, leituras brutas): cada linha é
+    comparada, pelo hash de 64 bits, com a primeira ocorrência da mesma
+    chave. Só conta como duplicada a leitura que repete uma de outra
+    planilha (coluna ARQUIVO); repetições dentro da mesma planilha são
+    mantidas, como no envio de uma planilha só. Retorna a máscara das
+    linhas a manter e o relatório das repetidas (com ARQUIVO/LINHA da
+    ocorrência mantida).
+    """
+    chave = _chave_leitura(obs.df)
+    h = pd.util.hash_pandas_object(chave, index=False).to_numpy()
+
+    # Tabela de hash (factorize): hash -> posição da primeira ocorrência
+    codigo, unicos = pd.factorize(h)
+    pos = np.arange(len(h))
+    primeira = np.empty(len(unicos), dtype=np.int64)
+    primeira[codigo[::-1]] = pos[::-1]
+    original = primeira[codigo]
+    if "ARQUIVO" in obs.df:
+        arquivo = obs.df["ARQUIVO"].to_numpy()
+        repetida = arquivo[original] != arquivo
+    else:
+        repetida = np.zeros(len(pos), dtype=bool)
+    if repetida.any():
+        # Confirma a igualdade do conteúdo (descarta colisões de hash)
+        iguais = (
+            chave.iloc[pos[repetida]].to_numpy()
+            == chave.iloc[original[repetida]].to_numpy()
+        ).all(axis=1)
+        repetida[pos[repetida][~iguais]] = False
+
+    dup = pos[repetida]
+    orig = original[repetida]
+    df = obs.df
+    relatorio = pd.DataFrame(
+        {
+            "ARQUIVO": df["ARQUIVO"].to_numpy()[dup] if "ARQUIVO" in df else "",
+            "LINHA": df["LINHA"].to_numpy()[dup] if "LINHA" in df else dup + 1,
+            "EST": df["EST"].to_numpy()[dup],
+            "PV": df["PV"].to_numpy()[dup],
+            "SEQ": df["SEQ"].to_numpy()[dup],
+            "ARQUIVO_ORIGINAL": df["ARQUIVO"].to_numpy()[orig] if "ARQUIVO" in df else "",
+            "LINHA_ORIGINAL": df["LINHA"].to_numpy()[orig] if "LINHA" in df else orig + 1,
+        },
+        columns=COLUNAS_DUPLICADAS,
+    )
+    return ~repetida, relatorio
+
+
+def combinar_identificacao(infos: List[Dict[str, str]]) -> Dict[str, str]:
+    """Campo a campo, os valores distintos e não vazios, na ordem, unidos por ' / '."""
+    campos: Dict[str, List[str]] = {}
+    for info in infos:
+        for campo, valor in info.items():
+            lista = campos.setdefault(campo, [])
+            if valor and valor not in lista:
+                lista.append(valor)
+    return {campo: " / ".join(valores) for campo, valores in campos.items()}
+
+
+@cronometrado
+def mesclar_planilhas(
+    planilhas: List[PlanilhaCampo], remover_duplicadas: bool = True
+) -> Campanha:
+    """
+    Junta as planilhas válidas (sem erros) numa única tabela de observações,
+    na ordem recebida, com a origem de cada linha. Com remover_duplicadas,
+    só a primeira ocorrência de cada leitura repetida é mantida.
+    """
+    validas = [p for p in planilhas if p.obs is not None and not p.erros]
+    if not validas:
+        raise ValueError("Nenhuma planilha válida para juntar.")
+
+    obs = concatenar_observacoes(
+        [p.obs for p in validas], origens=[p.nome for p in validas]
+    )
+    manter, duplicadas = detectar_duplicadas(obs)
+    if remover_duplicadas and not manter.all():
+        obs = filtrar_observacoes(obs, manter)
+    return Campanha(
+        obs=obs,
+        info_id=combinar_identificacao([p.info_id for p in validas]),
+        duplicadas=duplicadas,
+        arquivos=[p.nome for p in validas],
+    )
@@ -0,0 +1,153 @@
+# diagnostico.py
+# Instrumentação leve: tempo, linhas e tamanho de saída de cada etapa
+
+import functools
+import json
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Lista de registros da execução atual; None = coleta desligada. Por ser uma
+# ContextVar, cada sessão/thread do Streamlit coleta separadamente.
+_registros: ContextVar[Optional[List[Dict]]] = ContextVar(
+    "diagnostico_registros", default=None
+)
+_nivel: ContextVar[int] = ContextVar("diagnostico_nivel", default=0)
+
+
+def iniciar_coleta() -> List[Dict]:
+    """Liga a coleta no contexto atual e retorna a lista (vazia) de registros."""
+    registros: List[Dict] = []
+    _registros.set(registros)
+    _nivel.set(0)
+    return registros
+
+
+def encerrar_coleta() -> None:
+    _registros.set(None)
+
+
+def coleta_ativa() -> bool:
+    return _registros.get() is not None
+
+
+def registros_atuais() -> Optional[List[Dict]]:
+    """Lista da coleta do contexto atual (None com a coleta desligada)."""
+    return _registros.get()
+
+
+def _linhas(obj) -> Optional[int]:
+    if isinstance(obj, (str, bytes, bytearray, dict)):
+        return None
+    if isinstance(obj, tuple) and obj:
+        return _linhas(obj[0])  # ex.: (df, erros)
+    try:
+        return len(obj)
+    except TypeError:
+        return None
+
+
+def _tamanho_saida(obj) -> Optional[int]:
+    """Tamanho aproximado em bytes, sem varrer o conteúdo (custo O(colunas))."""
+    if isinstance(obj, (bytes, bytearray)):
+        return len(obj)
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(index=False, deep=False).sum())
+    if isinstance(obj, (pd.Series, np.ndarray)):
+        return int(obj.nbytes)
+    if isinstance(obj, tuple) and obj:
+        return _tamanho_saida(obj[0])
+    return None
+
+
+@contextmanager
+def etapa(nome: str, linhas: Optional[int] = None):
+    """
+    Mede um bloco. O dicionário produzido pode receber 'linhas' e 'saida'
+    (objeto de saída, para o tamanho) dentro do bloco. Com a coleta
+    desligada, nada é registrado.
+    """
+    registros = _registros.get()
+    info: Dict = {"linhas": linhas}
+    if registros is None:
+        yield info
+        return
+
+    nivel = _nivel.get()
+    _nivel.set(nivel + 1)
+    t0 = time.perf_counter()
+    try:
+        yield info
+    finally:
+        tempo_ms = (time.perf_counter() - t0) * 1000.0
+        _nivel.set(nivel)
+        saida = info.pop("saida", None)
+        registro = {
+            "etapa": nome,
+            "nivel": nivel,
+            "inicio_s": t0,
+            "tempo_ms": tempo_ms,
+            "linhas_saida": _linhas(saida) if saida is not None else None,
+            "bytes_saida": _tamanho_saida(saida) if saida is not None else None,
+        }
+        registro.update(info)
+        registros.append(registro)
+
+
+def cronometrado(func: Optional[Callable] = None, *, nome: Optional[str] = None):
+    """
+    Decorador de etapa. Desligado, o custo é uma consulta à ContextVar.
+    As linhas de entrada vêm do primeiro argumento com len() (ou do
+    tamanho em bytes, se for bytes).
+    """
+
+    def decorar(f: Callable) -> Callable:
+        rotulo = nome or f"{f.__module__}.{f.__name__}"
+
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            if _registros.get() is None:
+                return f(*args, **kwargs)
+            entrada = args[0] if args else None
+            with etapa(rotulo, linhas=_linhas(entrada)) as info:
+                if isinstance(entrada, (bytes, bytearray)):
+                    info["bytes_entrada"] = len(entrada)
+                resultado = f(*args, **kwargs)
+                info["saida"] = resultado
+            return resultado
+
+        return wrapper
+
+    return decorar(func) if func is not None else decorar
+
+
+def tabela_registros(registros: List[Dict]) -> pd.DataFrame:
+    """Registros em ordem de início, com a etapa recuada conforme o aninhamento."""
+    colunas = ["etapa", "tempo_ms", "linhas", "bytes_entrada", "linhas_saida", "bytes_saida"]
+    if not registros:
+        return pd.DataFrame(columns=colunas)
+    df = pd.DataFrame(registros).sort_values("inicio_s", kind="stable")
+    for c in colunas:
+        if c not in df.columns:
+            df[c] = None
+    df["etapa"] = ["  " * n + e for n, e in zip(df["nivel"], df["etapa"])]
+    df["tempo_ms"] = df["tempo_ms"].round(2)
+    for c in colunas[2:]:
+        df[c] = pd.to_numeric(df[c]).astype("Int64")
+    return df[colunas].reset_index(drop=True)
+
+
+def registros_json(registros: List[Dict], **extra) -> str:
+    """JSON exportável: registros em ordem de início + metadados em 'extra'."""
+    ordenados = sorted(registros, key=lambda r: r["inicio_s"])
+    t_ref = ordenados[0]["inicio_s"] if ordenados else 0.0
+    saida = []
+    for r in ordenados:
+        item = {k: v for k, v in r.items() if k != "inicio_s"}
+        item["inicio_ms"] = (r["inicio_s"] - t_ref) * 1000.0
+        saida.append(item)
+    return json.dumps({**extra, "etapas": saida}, ensure_ascii=False, indent=2)
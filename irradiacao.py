@@ -0,0 +1,195 @@
+# irradiacao.py
+# Coordenadas por irradiação (direção reduzida + DH) de todos os pontos visados
+
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from diagnostico import cronometrado
+from processing import EstatisticasSeries, estatisticas_series
+
+
+@dataclass
+class Irradiacao:
+    """
+    Coordenadas locais (X para leste, Y para norte, azimutes a partir de Y):
+
+    - coordenadas: uma linha por ponto, com a coordenada adotada (média das
+      determinações do primeiro nível em que o ponto aparece), o nível
+      (0 = estação de partida) e a maior discrepância entre as visadas;
+    - visadas: uma linha por série (EST, PV) irradiada, com a coordenada
+      obtida e a diferença para a adotada (mm);
+    - orientacoes: azimute da direção de referência (Hz reduzido = 0) de
+      cada estação orientada.
+    """
+
+    coordenadas: pd.DataFrame
+    visadas: pd.DataFrame
+    orientacoes: pd.DataFrame
+
+
+def _dh_por_grupo(res: pd.DataFrame, stats: EstatisticasSeries) -> np.ndarray:
+    """DH médio de cada série (EST, PV) de stats.grupos."""
+    k = len(stats.grupos)
+    dh = res["DH_med_m"].to_numpy(dtype=np.float64)
+    ok = (stats.codigo >= 0) & ~np.isnan(dh)
+    n = np.bincount(stats.codigo[ok], minlength=k)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.bincount(stats.codigo[ok], dh[ok], minlength=k) / n
+
+
+def _media_circular(codigo: np.ndarray, ang: np.ndarray, k: int) -> np.ndarray:
+    x = np.bincount(codigo, np.cos(ang), minlength=k)
+    y = np.bincount(codigo, np.sin(ang), minlength=k)
+    return np.arctan2(y, x)
+
+
+@cronometrado
+def irradiar(
+    res: pd.DataFrame,
+    estacao: str,
+    xy: Tuple[float, float] = (0.0, 0.0),
+    orientacao_deg: float = 0.0,
+    ponto_re: Optional[str] = None,
+    stats: Optional[EstatisticasSeries] = None,
+) -> Irradiacao:
+    """
+    Irradia todos os pontos visados a partir de 'estacao' (em 'xy'). A
+    orientação é o azimute da direção de referência da estação (Hz reduzido
+    = 0) ou, com 'ponto_re', o azimute da visada para esse ponto.
+
+    Cada nível é uma única passagem vetorizada sobre as séries (EST, PV)
+    das estações já orientadas; uma estação irradiada é orientada pela
+    média circular das visadas a pontos já conhecidos e irradia no nível
+    seguinte. Pontos visados de mais de uma estação acumulam determinações,
+    comparadas com a adotada.
+    """
+    if stats is None:
+        stats = estatisticas_series(res)
+    grupos = stats.grupos
+    est_nome = grupos["EST"].astype(str).to_numpy()
+    pv_nome = grupos["PV"].astype(str).to_numpy()
+    codigos, pontos = pd.factorize(np.concatenate([[str(estacao)], est_nome, pv_nome]))
+    pontos = np.asarray(pontos, dtype=object)
+    k = len(grupos)
+    inicio = codigos[0]
+    est_i = codigos[1 : k + 1]
+    pv_i = codigos[k + 1 :]
+
+    hz = np.radians(grupos["Hz_med_series_deg"].to_numpy(dtype=np.float64))
+    dh = _dh_por_grupo(res, stats)
+    valida = ~np.isnan(hz) & ~np.isnan(dh) & (est_i != pv_i)
+    if not (valida & (est_i == inicio)).any():
+        raise ValueError(f"A estação {estacao} não tem visadas com Hz e DH válidos.")
+
+    n = len(pontos)
+    X = np.full(n, np.nan)
+    Y = np.full(n, np.nan)
+    nivel = np.full(n, -1, dtype=np.int64)
+    orient = np.full(n, np.nan)
+    nivel_orient = np.full(n, -1, dtype=np.int64)
+    n_ref = np.zeros(n, dtype=np.int64)
+
+    X[inicio], Y[inicio] = xy
+    nivel[inicio] = 0
+    orient[inicio] = np.radians(orientacao_deg)
+    if ponto_re is not None:
+        re = valida & (est_i == inicio) & (pv_nome == str(ponto_re))
+        if not re.any():
+            raise ValueError(f"O ponto {ponto_re} não foi visado da estação {estacao}.")
+        orient[inicio] -= hz[re][0]
+        n_ref[inicio] = 1
+    nivel_orient[inicio] = 0
+
+    # Determinações: série irradiada, coordenadas e nível
+    feitas = np.zeros(k, dtype=bool)
+    partes_sel, partes_x, partes_y, partes_nivel = [], [], [], []
+    passo = 0
+    while True:
+        sel = np.flatnonzero(valida & ~feitas & ~np.isnan(orient[est_i]))
+        if len(sel) == 0:
+            break
+        passo += 1
+        feitas[sel] = True
+        e, p = est_i[sel], pv_i[sel]
+        az = orient[e] + hz[sel]
+        xs = X[e] + dh[sel] * np.sin(az)
+        ys = Y[e] + dh[sel] * np.cos(az)
+        partes_sel.append(sel)
+        partes_x.append(xs)
+        partes_y.append(ys)
+        partes_nivel.append(np.full(len(sel), passo))
+
+        # Pontos novos: média das determinações deste nível
+        novo = nivel[p] < 0
+        if novo.any():
+            cont = np.bincount(p[novo], minlength=n)
+            alvo = np.flatnonzero(cont)
+            X[alvo] = np.bincount(p[novo], xs[novo], minlength=n)[alvo] / cont[alvo]
+            Y[alvo] = np.bincount(p[novo], ys[novo], minlength=n)[alvo] / cont[alvo]
+            nivel[alvo] = passo
+
+        # Estações recém-posicionadas: orientação pelas visadas a pontos conhecidos
+        ref = np.flatnonzero(
+            valida & np.isnan(orient[est_i]) & (nivel[est_i] >= 0) & (nivel[pv_i] >= 0)
+        )
+        if len(ref):
+            e, p = est_i[ref], pv_i[ref]
+            az = np.arctan2(X[p] - X[e], Y[p] - Y[e]) - hz[ref]
+            cont = np.bincount(e, minlength=n)
+            alvo = np.flatnonzero(cont)
+            orient[alvo] = _media_circular(e, az, n)[alvo]
+            nivel_orient[alvo] = passo
+            n_ref[alvo] = cont[alvo]
+
+    sel = np.concatenate(partes_sel)
+    xs = np.concatenate(partes_x)
+    ys = np.concatenate(partes_y)
+    p = pv_i[sel]
+    dx = (xs - X[p]) * 1000.0
+    dy = (ys - Y[p]) * 1000.0
+    dpos = np.hypot(dx, dy)
+    visadas = pd.DataFrame(
+        {
+            "EST": est_nome[sel],
+            "PV": pv_nome[sel],
+            "nivel": np.concatenate(partes_nivel),
+            "Az_deg": np.degrees(np.mod(orient[est_i[sel]] + hz[sel], 2 * np.pi)),
+            "DH_m": dh[sel],
+            "X_m": xs,
+            "Y_m": ys,
+            "dX_mm": dx,
+            "dY_mm": dy,
+            "dpos_mm": dpos,
+        }
+    )
+
+    conhecido = np.flatnonzero(nivel >= 0)
+    n_visadas = np.bincount(p, minlength=n)
+    discrep = np.zeros(n)
+    np.maximum.at(discrep, p, dpos)
+    discrep[n_visadas == 0] = np.nan
+    coordenadas = pd.DataFrame(
+        {
+            "Ponto": pontos[conhecido],
+            "X_m": X[conhecido],
+            "Y_m": Y[conhecido],
+            "nivel": nivel[conhecido],
+            "n_visadas": n_visadas[conhecido],
+            "discrepancia_max_mm": discrep[conhecido],
+        }
+    ).sort_values(["nivel", "Ponto"], kind="stable", ignore_index=True)
+
+    orientada = np.flatnonzero(nivel_orient >= 0)
+    orientacoes = pd.DataFrame(
+        {
+            "EST": pontos[orientada],
+            "orientacao_deg": np.degrees(np.mod(orient[orientada], 2 * np.pi)),
+            "nivel": nivel_orient[orientada],
+            "n_referencias": n_ref[orientada],
+        }
+    ).sort_values(["nivel", "EST"], kind="stable", ignore_index=True)
+
+    return Irradiacao(coordenadas=coordenadas, visadas=visadas, orientacoes=orientacoes)
@@ -3,15 +3,44 @@
 
 import io
 import math
-from typing import Dict
+from typing import Dict, Union
 
-import matplotlib.pyplot as plt
 import pandas as pd
+from matplotlib.figure import Figure
 
+from cache import CacheLRU
+from diagnostico import cronometrado
 from processing import decimal_to_dms
 
+# Formato/resolução da imagem exportada no XLSX e da pré-visualização na tela
+# (a pré-visualização pode ser mais leve que a exportação).
+FORMATO_EXPORTACAO = "jpg"
+DPI_EXPORTACAO = 200
+FORMATO_PREVIA = "png"
+DPI_PREVIA = 100
+
+# Imagens já codificadas, por geometria + rótulos + formato + dpi
+FIGURAS_CACHE_MAX_BYTES = 64 * 1024 * 1024
+FIGURAS_CACHE_MAX_ENTRADAS = 128
+_cache_figuras = CacheLRU(
+    max_bytes=FIGURAS_CACHE_MAX_BYTES, max_entradas=FIGURAS_CACHE_MAX_ENTRADAS
+)
+
+
+def _chave_figura(info: Dict, formato: str, dpi: int):
+    return (
+        info["EST"],
+        info["PV1"],
+        info["PV2"],
+        float(info["AB"]),
+        float(info["AC"]),
+        float(info["BC"]),
+        formato,
+        int(dpi),
+    )
+
 
-def plotar_triangulo_info(info: Dict, estacao_op: str, conjunto_op: str):
+def _desenhar_triangulo(info: Dict) -> Figure:
     """
     Desenha o triângulo em planta.
 
@@ -41,7 +70,9 @@ def plotar_triangulo_info(info: Dict, estacao_op: str, conjunto_op: str):
     xs = [x_E, x_V1, x_V2, x_E]
     ys = [y_E, y_V1, y_V2, y_E]
 
-    fig, ax = plt.subplots()
+    # Figure sem pyplot: não passa pelo gerenciador global de figuras
+    fig = Figure()
+    ax = fig.subplots()
     ax.plot(xs, ys, "-o", color="#7f0000")
     ax.set_facecolor("#ffffff")
     fig.patch.set_facecolor("#ffffff")
@@ -81,18 +112,42 @@ def plotar_triangulo_info(info: Dict, estacao_op: str, conjunto_op: str):
         "Representação do triângulo em planta (ponto de vista na estação)",
         color="#111827",
     )
+    return fig
+
 
-    buf = io.BytesIO()
-    fig.savefig(buf, format="jpg", dpi=200, bbox_inches="tight")
-    buf.seek(0)
-    plt.close(fig)
-    return buf, fig
+@cronometrado
+def imagem_triangulo(
+    info: Dict, formato: str = FORMATO_EXPORTACAO, dpi: int = DPI_EXPORTACAO
+) -> bytes:
+    """
+    Imagem do triângulo já codificada ('jpg', 'png', 'svg', ...).
+    Usa o cache LRU de figuras: a mesma geometria/rótulos/formato/dpi só é
+    rasterizada uma vez.
+    """
+    chave = _chave_figura(info, formato, dpi)
+    dados = _cache_figuras.get(chave)
+    if dados is None:
+        buf = io.BytesIO()
+        _desenhar_triangulo(info).savefig(
+            buf, format=formato, dpi=dpi, bbox_inches="tight"
+        )
+        dados = buf.getvalue()
+        _cache_figuras.put(chave, dados, tamanho=len(dados))
+    return dados
 
 
-def gerar_xlsx_com_figura(info_triangulo: Dict, figura_buf: io.BytesIO) -> bytes:
+@cronometrado
+def gerar_xlsx_com_figura(
+    info_triangulo: Dict,
+    figura: Union[bytes, io.BytesIO, None],
+    formato: str = FORMATO_EXPORTACAO,
+) -> bytes:
     """
-    Gera um XLSX com resumo numérico e a figura do triângulo.
+    Gera um XLSX com resumo numérico e a figura do triângulo
+    (bytes ou buffer já codificados em 'formato').
     """
+    if isinstance(figura, (bytes, bytearray)):
+        figura = io.BytesIO(figura)
     output = io.BytesIO()
     with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
         wb = writer.book
@@ -123,8 +178,10 @@ def gerar_xlsx_com_figura(info_triangulo: Dict, figura_buf: io.BytesIO) -> bytes
 
         ws_fig = wb.add_worksheet("FiguraTriangulo")
         writer.sheets["FiguraTriangulo"] = ws_fig
-        if figura_buf is not None:
-            ws_fig.insert_image("B2", "triangulo.jpg", {"image_data": figura_buf})
+        if figura is not None:
+            ws_fig.insert_image(
+                "B2", f"triangulo.{formato}", {"image_data": figura}
+            )
 
     output.seek(0)
     return output.getvalue()
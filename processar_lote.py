@@ -0,0 +1,206 @@
+# processar_lote.py
+# Processamento em lote (sem Streamlit) de uma pasta de planilhas de campo
+
+import argparse
+import glob
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+
+import pandas as pd
+
+from processing import (
+    construir_observacoes,
+    validar_observacoes,
+    ResultadoProcessamento,
+    decimal_to_dms_array,
+)
+from utils import ler_planilha_bytes
+
+
+def listar_planilhas(entradas: List[str]) -> List[str]:
+    """Expande pastas (todas as .xlsx) e padrões glob numa lista ordenada de arquivos."""
+    arquivos = []
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            arquivos.extend(glob.glob(os.path.join(entrada, "*.xlsx")))
+        else:
+            arquivos.extend(glob.glob(entrada))
+    # Ignora arquivos temporários do Excel (~$...)
+    arquivos = [a for a in arquivos if not os.path.basename(a).startswith("~$")]
+    return sorted(set(arquivos))
+
+
+# Tabelas consolidadas: chave, aba do .xlsx e sufixo do arquivo (.csv/.parquet)
+TABELAS_LOTE = [
+    ("resumo", "Resumo", ""),
+    ("series_hz", "Series_Hz", "series_hz"),
+    ("series_z", "Series_Z", "series_z"),
+    ("triangulos", "Triangulos", "triangulos"),
+]
+FORMATOS_SAIDA = (".xlsx", ".csv", ".parquet")
+
+
+def processar_arquivo(caminho: str) -> Dict:
+    """
+    Processa uma planilha: leitura, validação, cálculo linha a linha, tabela
+    resumo, tabelas das séries (Hz e Z) e triângulos de todas as combinações
+    estação/conjunto.
+
+    Nunca levanta exceção: problemas vão para a chave 'erros'.
+    """
+    nome = os.path.basename(caminho)
+    saida = {"arquivo": nome, "erros": [], **{chave: None for chave, _, _ in TABELAS_LOTE}}
+    try:
+        with open(caminho, "rb") as f:
+            info_id, raw_df, _ = ler_planilha_bytes(f.read())
+        obs = construir_observacoes(raw_df)
+        erros = validar_observacoes(obs)
+        if erros:
+            saida["erros"] = erros
+            return saida
+
+        resultado = ResultadoProcessamento(obs, manter_originais=False)
+        resumo = resultado.resumo.copy()
+        resumo.insert(0, "Arquivo", nome)
+        resumo.insert(1, "Professor(a)", info_id.get("Professor(a)", ""))
+        resumo.insert(2, "Data", info_id.get("Dados", ""))
+        saida["resumo"] = resumo
+
+        for chave, tabela in [("series_hz", resultado.tabela_hz), ("series_z", resultado.tabela_z)]:
+            tabela = tabela.copy()
+            tabela.insert(0, "Arquivo", nome)
+            saida[chave] = tabela
+
+        tri = resultado.triangulos.copy()
+        for col in ["ang_A_deg", "ang_B_deg", "ang_C_deg"]:
+            tri[col.replace("_deg", "_DMS")] = decimal_to_dms_array(tri[col])
+        tri.insert(0, "Arquivo", nome)
+        saida["triangulos"] = tri
+    except Exception as e:
+        saida["erros"] = [f"Erro ao processar: {e}"]
+    return saida
+
+
+def _caminho_com_sufixo(saida: str, sufixo: str, ext: str) -> str:
+    if not sufixo:
+        return saida
+    base, _ = os.path.splitext(saida)
+    return f"{base}_{sufixo}{ext}"
+
+
+def gravar_resultados(
+    saida: str, tabelas: Dict[str, pd.DataFrame], erros: pd.DataFrame
+) -> List[str]:
+    """
+    Grava o resultado consolidado conforme a extensão de 'saida':
+      .xlsx -> um arquivo com as abas Resumo, Series_Hz, Series_Z, Triangulos e Erros;
+      .csv / .parquet -> um arquivo por tabela (<saida>, <saida>_series_hz, ...).
+    Retorna a lista de arquivos gravados.
+    """
+    ext = os.path.splitext(saida)[1].lower()
+    if ext not in FORMATOS_SAIDA:
+        raise ValueError(f"Formato de saída não suportado: '{ext}' (use .csv, .parquet ou .xlsx)")
+
+    if ext == ".xlsx":
+        with pd.ExcelWriter(saida, engine="xlsxwriter") as writer:
+            for chave, aba, _ in TABELAS_LOTE:
+                tabelas[chave].to_excel(writer, sheet_name=aba, index=False)
+            erros.to_excel(writer, sheet_name="Erros", index=False)
+        return [saida]
+
+    gravados = []
+    for chave, _, sufixo in TABELAS_LOTE:
+        arquivo = _caminho_com_sufixo(saida, sufixo, ext)
+        if ext == ".csv":
+            tabelas[chave].to_csv(arquivo, index=False)
+        else:
+            tabelas[chave].to_parquet(arquivo, index=False)
+        gravados.append(arquivo)
+    arq_erros = _caminho_com_sufixo(saida, "erros", ".csv")
+    erros.to_csv(arq_erros, index=False)
+    return gravados + [arq_erros]
+
+
+def processar_lote(arquivos: List[str], workers: int = None):
+    """
+    Processa 'arquivos' num pool de processos; retorna (tabelas, erros), com
+    'tabelas' indexado pelas chaves de TABELAS_LOTE.
+    """
+    if workers == 1:
+        resultados = [processar_arquivo(a) for a in arquivos]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            resultados = list(pool.map(processar_arquivo, arquivos, chunksize=4))
+
+    tabelas = {}
+    for chave, _, _ in TABELAS_LOTE:
+        partes = [r[chave] for r in resultados if r[chave] is not None]
+        tabelas[chave] = pd.concat(partes, ignore_index=True) if partes else pd.DataFrame()
+    erros = [
+        {"Arquivo": r["arquivo"], "Erro": e} for r in resultados for e in r["erros"]
+    ]
+    return tabelas, pd.DataFrame(erros, columns=["Arquivo", "Erro"])
+
+
+def _inteiro_positivo(valor: str) -> int:
+    try:
+        n = int(valor)
+    except ValueError:
+        n = 0
+    if n < 1:
+        raise argparse.ArgumentTypeError(f"deve ser um inteiro >= 1 (recebido: {valor})")
+    return n
+
+
+def _arquivo_saida(valor: str) -> str:
+    """Valida a extensão antes de processar (um erro só no fim perderia o lote)."""
+    if os.path.splitext(valor)[1].lower() not in FORMATOS_SAIDA:
+        raise argparse.ArgumentTypeError(
+            f"extensão não suportada em '{valor}' (use {', '.join(FORMATOS_SAIDA)})"
+        )
+    return valor
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Processa em lote planilhas de campo (abas Identificação e Dados)."
+    )
+    parser.add_argument(
+        "entradas", nargs="+", help="Pastas (usa todas as .xlsx) ou padrões glob."
+    )
+    parser.add_argument(
+        "-o",
+        "--saida",
+        type=_arquivo_saida,
+        default="resultado_lote.xlsx",
+        help="Arquivo consolidado (.xlsx, .csv ou .parquet).",
+    )
+    parser.add_argument(
+        "-j",
+        "--workers",
+        type=_inteiro_positivo,
+        default=None,
+        help="Número de processos (padrão: todos os núcleos).",
+    )
+    args = parser.parse_args(argv)
+
+    arquivos = listar_planilhas(args.entradas)
+    if not arquivos:
+        print("Nenhuma planilha encontrada.", file=sys.stderr)
+        return 1
+
+    tabelas, erros = processar_lote(arquivos, workers=args.workers)
+    gravados = gravar_resultados(args.saida, tabelas, erros)
+
+    n_erro = erros["Arquivo"].nunique()
+    print(
+        f"{len(arquivos)} planilha(s) processada(s), {n_erro} com erro. "
+        f"Saída: {', '.join(gravados)}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,20 @@
 # processing.py
 # Funções de processamento numérico/geométrico para o app UFPE
 
+import hashlib
 import io
 import math
+from dataclasses import dataclass, field
+from functools import cached_property
 from typing import List, Optional, Tuple, Dict
 
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from cache import CacheLRU, estimar_tamanho
+from diagnostico import cronometrado
 
 REQUIRED_COLS_BASE = ["EST", "PV", "Hz_PD", "Hz_PI", "Z_PD", "Z_PI", "DI_PD", "DI_PI"]
 OPTIONAL_COLS = ["SEQ"]
@@ -52,6 +60,91 @@ def parse_angle_to_decimal(value: str) -> float:
     return sinal * (deg + minutos / 60.0 + segundos / 3600.0)
 
 
+_NUM_RE = r"[+-]?(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][+-]?\d+)?"
+_SEP_DMS_RE = r"[\s°º'´′\"″]"
+_DMS_RE = (
+    rf"^{_SEP_DMS_RE}*(?P<d>{_NUM_RE})"
+    rf"(?:{_SEP_DMS_RE}+(?P<m>{_NUM_RE}))?"
+    rf"(?:{_SEP_DMS_RE}+(?P<s>{_NUM_RE}))?{_SEP_DMS_RE}*$"
+)
+_DIST_RE = rf"^\s*(?P<v>{_NUM_RE})\s*$"
+
+
+def _texto_arrow(serie: pd.Series) -> pa.Array:
+    """Converte a coluna para texto Arrow, já com vírgula decimal trocada por ponto."""
+    texto = serie.astype(str).fillna("")
+    try:
+        arr = pa.array(texto.array, type=pa.string())
+    except (pa.ArrowException, TypeError):
+        arr = pa.array(texto.to_numpy(dtype=object), type=pa.string())
+    return pc.replace_substring(arr, ",", ".")
+
+
+def _campo_float(partes: pa.Array, campo: str, padrao: float) -> np.ndarray:
+    """Converte um grupo de extract_regex para float64 (vazios -> padrao)."""
+    grupo = partes.field(campo)
+    grupo = pc.if_else(pc.equal(grupo, ""), pa.scalar(None, pa.string()), grupo)
+    valores = pc.fill_null(pc.cast(grupo, pa.float64()), padrao)
+    return np.array(valores.to_numpy(zero_copy_only=False), dtype=np.float64)
+
+
+def parse_angulos_serie(serie: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Versão vetorizada de parse_angle_to_decimal para uma coluna inteira.
+
+    Aceita DMS (10°20'30"), decimal com ponto ou com vírgula. Retorna
+    (valores_graus, mascara_invalidos), ambos como arrays NumPy.
+
+    As células que não casam com o padrão estrito (formatos exóticos)
+    são convertidas pela função escalar, garantindo resultados idênticos.
+    """
+    texto = _texto_arrow(serie)
+    partes = pc.extract_regex(texto, _DMS_RE)
+    casou = partes.is_valid().to_numpy(zero_copy_only=False)
+
+    deg = _campo_float(partes, "d", np.nan)
+    minutos = _campo_float(partes, "m", 0.0)
+    segundos = _campo_float(partes, "s", 0.0)
+    sinal = np.where(deg < 0, -1.0, 1.0)
+    valores = sinal * (np.abs(deg) + minutos / 60.0 + segundos / 3600.0)
+    valores[~casou] = np.nan
+
+    # Fallback escalar apenas para células não vazias fora do padrão
+    resto = ~casou & pc.not_equal(pc.utf8_trim_whitespace(texto), "").to_numpy(
+        zero_copy_only=False
+    )
+    if resto.any():
+        valores[resto] = [
+            parse_angle_to_decimal(v) for v in serie.to_numpy(dtype=object)[resto]
+        ]
+
+    return valores, np.isnan(valores)
+
+
+def _parse_float(value) -> float:
+    try:
+        return float(str(value).replace(",", "."))
+    except Exception:
+        return float("nan")
+
+
+def parse_distancias_serie(serie: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Converte uma coluna de distâncias (ponto ou vírgula decimal) para float.
+    Retorna (valores_m, mascara_invalidos).
+    """
+    texto = _texto_arrow(serie)
+    partes = pc.extract_regex(texto, _DIST_RE)
+    casou = partes.is_valid().to_numpy(zero_copy_only=False)
+
+    valores = _campo_float(partes, "v", np.nan)
+    resto = ~casou
+    if resto.any():
+        valores[resto] = [_parse_float(v) for v in serie.to_numpy(dtype=object)[resto]]
+
+    return valores, np.isnan(valores)
+
+
 def decimal_to_dms(angle_deg: float) -> str:
     if angle_deg is None or math.isnan(angle_deg):
         return ""
@@ -70,6 +163,39 @@ def decimal_to_dms(angle_deg: float) -> str:
     return f"{d:02d}°{m:02d}'{s:02d}\""
 
 
+# Tabelas de formatação (graus vão até 360 por causa do "vai um")
+_DMS_GRAUS = np.array([f"{i:02d}°" for i in range(361)], dtype=object)
+_DMS_MINUTOS = np.array([f"{i:02d}'" for i in range(60)], dtype=object)
+_DMS_SEGUNDOS = np.array([f"{i:02d}\"" for i in range(60)], dtype=object)
+
+
+def decimal_to_dms_array(angles_deg) -> np.ndarray:
+    """
+    Versão vetorizada de decimal_to_dms: formata um array inteiro de ângulos,
+    com o mesmo arredondamento dos segundos e o mesmo "vai um" 60 -> 0.
+    Valores NaN viram string vazia.
+    """
+    a = np.asarray(angles_deg, dtype=np.float64)
+    validos = np.isfinite(a)
+    a = np.mod(np.where(validos, a, 0.0), 360.0)
+
+    d, frac = np.divmod(a, 1.0)
+    m, frac = np.divmod(frac * 60, 1.0)
+    s = np.round(frac * 60)
+
+    vai_um = s == 60
+    s = np.where(vai_um, 0.0, s)
+    m = m + vai_um
+    vai_um = m == 60
+    m = np.where(vai_um, 0.0, m)
+    d = d + vai_um
+
+    d_txt = _DMS_GRAUS[d.astype(np.intp)]
+    m_txt = _DMS_MINUTOS[m.astype(np.intp)]
+    s_txt = _DMS_SEGUNDOS[s.astype(np.intp)]
+    return np.where(validos, d_txt + m_txt + s_txt, "")
+
+
 def mean_direction_circular(angles_deg: List[float]) -> float:
     vals = [a for a in angles_deg if not math.isnan(a)]
     if len(vals) == 0:
@@ -87,74 +213,204 @@ def mean_direction_circular(angles_deg: List[float]) -> float:
 # ---------------------------------------------------------------------
 # Normalização/validação
 # ---------------------------------------------------------------------
+def nome_coluna_normalizado(nome: str) -> str:
+    """Nome padrão (EST, PV, SEQ, Hz_PD, ...) para um cabeçalho da planilha."""
+    low = nome.strip().lower()
+    if low in ["est", "estacao", "estação"]:
+        return "EST"
+    elif low in ["pv", "ponto visado", "ponto_visado", "ponto"]:
+        return "PV"
+    elif low in ["seq", "sequencia", "sequência", "serie", "série"]:
+        return "SEQ"
+    elif ("horizontal" in low and "pd" in low) or ("hz" in low and "pd" in low):
+        return "Hz_PD"
+    elif ("horizontal" in low and "pi" in low) or ("hz" in low and "pi" in low):
+        return "Hz_PI"
+    elif ("zenital" in low and "pd" in low) or ("z" in low and "pd" in low):
+        return "Z_PD"
+    elif ("zenital" in low and "pi" in low) or ("z" in low and "pi" in low):
+        return "Z_PI"
+    elif "dist" in low and "pd" in low:
+        return "DI_PD"
+    elif "dist" in low and "pi" in low:
+        return "DI_PI"
+    return nome
+
+
 def normalizar_colunas(df_original: pd.DataFrame) -> pd.DataFrame:
     df = df_original.copy()
-    colmap: Dict[str, str] = {}
-    for c in df.columns:
-        low = c.strip().lower()
-        if low in ["est", "estacao", "estação"]:
-            colmap[c] = "EST"
-        elif low in ["pv", "ponto visado", "ponto_visado", "ponto"]:
-            colmap[c] = "PV"
-        elif low in ["seq", "sequencia", "sequência", "serie", "série"]:
-            colmap[c] = "SEQ"
-        elif ("horizontal" in low and "pd" in low) or ("hz" in low and "pd" in low):
-            colmap[c] = "Hz_PD"
-        elif ("horizontal" in low and "pi" in low) or ("hz" in low and "pi" in low):
-            colmap[c] = "Hz_PI"
-        elif ("zenital" in low and "pd" in low) or ("z" in low and "pd" in low):
-            colmap[c] = "Z_PD"
-        elif ("zenital" in low and "pi" in low) or ("z" in low and "pi" in low):
-            colmap[c] = "Z_PI"
-        elif "dist" in low and "pd" in low:
-            colmap[c] = "DI_PD"
-        elif "dist" in low and "pi" in low:
-            colmap[c] = "DI_PI"
-        else:
-            colmap[c] = c
+    colmap: Dict[str, str] = {c: nome_coluna_normalizado(c) for c in df.columns}
     return df.rename(columns=colmap)
 
 
-def validar_dataframe(df_original: pd.DataFrame):
-    erros = []
+def _parse_seq(x) -> float:
+    sx = str(x).strip()
+    if sx == "":
+        return np.nan
+    try:
+        return int(sx)
+    except Exception:
+        return np.nan
+
+
+def parse_seq_serie(serie: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Converte a coluna SEQ para números inteiros (como float, NaN = vazio).
+    Retorna (valores, mascara_invalidos); células vazias não são inválidas.
+    """
+    ausente = serie.isna().to_numpy()
+    texto = _texto_arrow(serie)
+    partes = pc.extract_regex(texto, r"^\s*(?P<v>[+-]?\d{1,15})\s*$")
+    casou = partes.is_valid().to_numpy(zero_copy_only=False)
+
+    valores = _campo_float(partes, "v", np.nan)
+    vazio = pc.equal(pc.utf8_trim_whitespace(texto), "").to_numpy(zero_copy_only=False)
+    resto = ~casou & ~vazio & ~ausente
+    if resto.any():
+        valores[resto] = [_parse_seq(v) for v in serie.to_numpy(dtype=object)[resto]]
+
+    invalidos = ausente | (~vazio & np.isnan(valores))
+    return valores, invalidos
+
+
+COLS_ANGULOS = ["Hz_PD", "Hz_PI", "Z_PD", "Z_PI"]
+COLS_DISTANCIAS = ["DI_PD", "DI_PI"]
+
+
+@dataclass
+class TabelaObservacoes:
+    """
+    Leituras de campo convertidas uma única vez (no upload).
+
+    - df: colunas normalizadas com as strings originais e SEQ já numérico;
+    - valores: arrays float por coluna ("Hz_PD_deg", ..., "DI_PD_m", ...);
+    - invalidos: máscaras de células inválidas por coluna original;
+    - colunas_ausentes: colunas obrigatórias que não vieram na planilha.
+    """
+
+    df: pd.DataFrame
+    valores: Dict[str, np.ndarray]
+    invalidos: Dict[str, np.ndarray]
+    colunas_ausentes: List[str] = field(default_factory=list)
+    _assinatura: Optional[str] = field(default=None, repr=False, compare=False)
+    _hash_linhas: Optional[np.ndarray] = field(default=None, repr=False, compare=False)
+
+    def __len__(self) -> int:
+        return len(self.df)
+
+    def hash_linhas(self, linhas=None) -> np.ndarray:
+        """Hash de 64 bits de cada linha usada no processamento (ou só de 'linhas')."""
+        if linhas is not None:
+            return pd.util.hash_pandas_object(self.df_uso().iloc[linhas], index=True).to_numpy()
+        if self._hash_linhas is None:
+            self._hash_linhas = pd.util.hash_pandas_object(self.df_uso(), index=True).to_numpy()
+        return self._hash_linhas
+
+    def assinatura(self) -> str:
+        """Hash do conteúdo usado no processamento (chave de cache)."""
+        if self._assinatura is None:
+            h = hashlib.sha1()
+            h.update("|".join(map(str, self.df_uso().columns)).encode("utf-8"))
+            h.update(self.hash_linhas().tobytes())
+            self._assinatura = h.hexdigest()
+        return self._assinatura
+
+    def linhas_invalidas(self, *cols: str) -> List[int]:
+        """Números de linha (1-based, como no Excel sem cabeçalho) inválidos em 'cols'."""
+        mask = np.zeros(len(self.df), dtype=bool)
+        for c in cols:
+            mask |= self.invalidos[c]
+        return (self.df.index.to_numpy()[mask] + 1).tolist()
+
+    def df_uso(self) -> pd.DataFrame:
+        """Apenas as colunas usadas no processamento."""
+        cols_use = [c for c in REQUIRED_COLS_ALL if c in self.df.columns]
+        return self.df[cols_use]
+
+
+def _converter_colunas(df: pd.DataFrame):
+    valores: Dict[str, np.ndarray] = {}
+    invalidos: Dict[str, np.ndarray] = {}
+    for col in COLS_ANGULOS:
+        valores[col + "_deg"], invalidos[col] = parse_angulos_serie(df[col])
+    for col in COLS_DISTANCIAS:
+        valores[col + "_m"], invalidos[col] = parse_distancias_serie(df[col])
+    return valores, invalidos
+
+
+@cronometrado
+def construir_observacoes(df_original: pd.DataFrame) -> TabelaObservacoes:
+    """Normaliza as colunas e converte Hz/Z/DI/SEQ de uma só vez."""
     df = normalizar_colunas(df_original)
 
     missing = [c for c in REQUIRED_COLS_BASE if c not in df.columns]
-    if missing:
-        erros.append("Colunas obrigatórias ausentes: " + ", ".join(missing))
-
     for c in REQUIRED_COLS_ALL:
         if c not in df.columns:
             df[c] = ""
 
-    invalid_rows_hz = []
-    invalid_rows_z = []
-    invalid_rows_di = []
-    invalid_rows_seq = []
-
-    for idx, row in df.iterrows():
-        hz_pd = parse_angle_to_decimal(row.get("Hz_PD", ""))
-        hz_pi = parse_angle_to_decimal(row.get("Hz_PI", ""))
-        z_pd = parse_angle_to_decimal(row.get("Z_PD", ""))
-        z_pi = parse_angle_to_decimal(row.get("Z_PI", ""))
-        if np.isnan(hz_pd) or np.isnan(hz_pi):
-            invalid_rows_hz.append(idx + 1)
-        if np.isnan(z_pd) or np.isnan(z_pi):
-            invalid_rows_z.append(idx + 1)
-        try:
-            di_pd = float(str(row.get("DI_PD", "")).replace(",", "."))
-            di_pi = float(str(row.get("DI_PI", "")).replace(",", "."))
-            if np.isnan(di_pd) or np.isnan(di_pi):
-                invalid_rows_di.append(idx + 1)
-        except Exception:
-            invalid_rows_di.append(idx + 1)
-
-        seq_val = str(row.get("SEQ", "")).strip()
-        if seq_val != "":
-            try:
-                int(seq_val)
-            except Exception:
-                invalid_rows_seq.append(idx + 1)
+    valores, invalidos = _converter_colunas(df)
+
+    seq, invalidos["SEQ"] = parse_seq_serie(df["SEQ"])
+    df["SEQ"] = seq if np.isnan(seq).any() else seq.astype(np.int64)
+
+    return TabelaObservacoes(
+        df=df, valores=valores, invalidos=invalidos, colunas_ausentes=missing
+    )
+
+
+@cronometrado
+def concatenar_observacoes(
+    partes: List[TabelaObservacoes], origens: Optional[List[str]] = None
+) -> TabelaObservacoes:
+    """
+    Junta observações já convertidas, na ordem de 'partes', sem reconverter
+    as strings. Com 'origens' (um nome por parte), acrescenta ao df as
+    colunas ARQUIVO e LINHA (linha na planilha de origem).
+    """
+    dfs = []
+    for i, parte in enumerate(partes):
+        df = parte.df
+        if origens is not None:
+            df = df.assign(ARQUIVO=origens[i], LINHA=df.index.to_numpy() + 1)
+        dfs.append(df)
+    df = pd.concat(dfs, ignore_index=True)
+
+    ausentes = []
+    for parte in partes:
+        ausentes += [c for c in parte.colunas_ausentes if c not in ausentes]
+    return TabelaObservacoes(
+        df=df,
+        valores={
+            c: np.concatenate([p.valores[c] for p in partes]) for c in partes[0].valores
+        },
+        invalidos={
+            c: np.concatenate([p.invalidos[c] for p in partes])
+            for c in partes[0].invalidos
+        },
+        colunas_ausentes=ausentes,
+    )
+
+
+def filtrar_observacoes(obs: TabelaObservacoes, manter: np.ndarray) -> TabelaObservacoes:
+    """Observações só com as linhas em que 'manter' (máscara booleana) é verdadeira."""
+    return TabelaObservacoes(
+        df=obs.df[manter].reset_index(drop=True),
+        valores={c: v[manter] for c, v in obs.valores.items()},
+        invalidos={c: v[manter] for c, v in obs.invalidos.items()},
+        colunas_ausentes=list(obs.colunas_ausentes),
+    )
+
+
+@cronometrado
+def validar_observacoes(obs: TabelaObservacoes) -> List[str]:
+    erros = []
+    if obs.colunas_ausentes:
+        erros.append("Colunas obrigatórias ausentes: " + ", ".join(obs.colunas_ausentes))
+
+    invalid_rows_hz = obs.linhas_invalidas("Hz_PD", "Hz_PI")
+    invalid_rows_z = obs.linhas_invalidas("Z_PD", "Z_PI")
+    invalid_rows_di = obs.linhas_invalidas("DI_PD", "DI_PI")
+    invalid_rows_seq = obs.linhas_invalidas("SEQ")
 
     if invalid_rows_hz:
         erros.append(
@@ -176,169 +432,512 @@ def validar_dataframe(df_original: pd.DataFrame):
             "Valores inválidos em SEQ (devem ser inteiros) nas linhas: "
             + ", ".join(map(str, invalid_rows_seq))
         )
+    return erros
 
-    if "SEQ" in df.columns:
-        def _parse_seq(x):
-            sx = str(x).strip()
-            if sx == "":
-                return np.nan
-            try:
-                return int(sx)
-            except Exception:
-                return np.nan
-
-        df["SEQ"] = df["SEQ"].apply(_parse_seq)
 
-    return df, erros
+@cronometrado
+def validar_dataframe(df_original: pd.DataFrame):
+    obs = construir_observacoes(df_original)
+    return obs.df, validar_observacoes(obs)
 
 
 # ---------------------------------------------------------------------
 # Cálculo linha a linha
 # ---------------------------------------------------------------------
-def calcular_linha_a_linha(df_uso: pd.DataFrame) -> pd.DataFrame:
-    res = df_uso.copy()
+def hz_medio_array(pd_deg, pi_deg) -> np.ndarray:
+    """
+    Média PD/PI das direções horizontais, com a correção de ±90° conforme
+    PD > PI, reduzida a [0, 360). NaN em qualquer leitura propaga.
+    """
+    pd_deg = np.asarray(pd_deg, dtype=np.float64)
+    pi_deg = np.asarray(pi_deg, dtype=np.float64)
+    m = (pd_deg + pi_deg) / 2.0
+    hz = np.where(pd_deg > pi_deg, m + 90.0, m - 90.0)
+    return np.mod(hz, 360.0)
+
+
+def z_corrigido_array(z_pd_deg, z_pi_deg) -> np.ndarray:
+    """Ângulo zenital corrigido: (Z_PD - Z_PI) / 2 + 180. NaN propaga."""
+    z_pd_deg = np.asarray(z_pd_deg, dtype=np.float64)
+    z_pi_deg = np.asarray(z_pi_deg, dtype=np.float64)
+    return (z_pd_deg - z_pi_deg) / 2.0 + 180.0
+
+
+@cronometrado
+def calcular_linha_a_linha(
+    df_uso,
+    compacto: bool = False,
+    float32: bool = False,
+    manter_originais: bool = False,
+) -> pd.DataFrame:
+    """
+    Aceita a TabelaObservacoes do upload (sem reconverter as strings) ou,
+    por compatibilidade, um DataFrame já validado.
 
-    for col in ["Hz_PD", "Hz_PI", "Z_PD", "Z_PI"]:
-        res[col + "_deg"] = res[col].apply(parse_angle_to_decimal)
+    Com compacto=True o resultado é o de compactar_resultado, sem gerar as
+    colunas _DMS (criadas só na exibição, por coluna_dms).
+    """
+    if isinstance(df_uso, TabelaObservacoes):
+        res = df_uso.df_uso()
+        valores = df_uso.valores
+    else:
+        res = df_uso
+        valores, _ = _converter_colunas(res)
+    if compacto and not manter_originais:
+        res = res[[c for c in res.columns if c in ("EST", "PV", "SEQ")]]
+    # Cópia rasa: só são acrescentadas colunas, e as strings originais
+    # continuam compartilhadas com as observações (sem duplicar memória)
+    res = res.copy(deep=False)
+
+    for col, vals in _colunas_linha(valores).items():
+        if compacto and col in _COLUNAS_DMS:
+            continue
+        res[col] = vals
 
-    res["DI_PD_m"] = res["DI_PD"].apply(lambda x: float(str(x).replace(",", ".")))
-    res["DI_PI_m"] = res["DI_PI"].apply(lambda x: float(str(x).replace(",", ".")))
+    if compacto:
+        res = compactar_resultado(res, float32=float32, manter_originais=manter_originais)
+    return res
 
-    def calc_hz_medio(pd_deg, pi_deg):
-        if math.isnan(pd_deg) or math.isnan(pi_deg):
-            return float("nan")
-        m = (pd_deg + pi_deg) / 2.0
-        if pd_deg > pi_deg:
-            hz = m + 90.0
-        else:
-            hz = m - 90.0
-        return hz % 360.0
 
-    res["Hz_med_deg"] = res.apply(
-        lambda r: calc_hz_medio(r["Hz_PD_deg"], r["Hz_PI_deg"]), axis=1
+# Colunas de texto geradas a partir das colunas em graus
+_COLUNAS_DMS = {"Hz_med_DMS": "Hz_med_deg", "Z_corr_DMS": "Z_corr_deg"}
+
+
+def _colunas_linha(valores: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    Colunas calculadas de 'res', na ordem final, a partir dos valores
+    convertidos (todas as linhas ou só as editadas).
+    """
+    col = {}
+    for c in COLS_ANGULOS:
+        col[c + "_deg"] = valores[c + "_deg"]
+    for c in COLS_DISTANCIAS:
+        col[c + "_m"] = valores[c + "_m"]
+
+    col["Hz_med_deg"] = hz_medio_array(col["Hz_PD_deg"], col["Hz_PI_deg"])
+    col["Hz_med_DMS"] = decimal_to_dms_array(col["Hz_med_deg"])
+    col["Z_corr_deg"] = z_corrigido_array(col["Z_PD_deg"], col["Z_PI_deg"])
+    col["Z_corr_DMS"] = decimal_to_dms_array(col["Z_corr_deg"])
+
+    z_rad = col["Z_corr_deg"] * np.pi / 180.0
+    col["DH_PD_m"] = np.round(np.abs(col["DI_PD_m"] * np.sin(z_rad)), 3)
+    col["DN_PD_m"] = np.round(np.abs(col["DI_PD_m"] * np.cos(z_rad)), 3)
+    col["DH_PI_m"] = np.round(np.abs(col["DI_PI_m"] * np.sin(z_rad)), 3)
+    col["DN_PI_m"] = np.round(np.abs(col["DI_PI_m"] * np.cos(z_rad)), 3)
+
+    col["DH_med_m"] = np.round(np.abs((col["DH_PD_m"] + col["DH_PI_m"]) / 2.0), 3)
+    col["DN_med_m"] = np.round(np.abs((col["DN_PD_m"] + col["DN_PI_m"]) / 2.0), 3)
+    return col
+
+
+def compactar_resultado(
+    res: pd.DataFrame, float32: bool = False, manter_originais: bool = False
+) -> pd.DataFrame:
+    """
+    Representação compacta do resultado (uma por sessão ativa):
+
+    - EST e PV categóricos;
+    - sem as colunas _DMS (coluna_dms as gera na exibição);
+    - sem as strings originais de ângulos/distâncias, exceto com
+      manter_originais=True;
+    - com float32=True, colunas float em float32 (ângulos com resolução
+      de ~0,1"; as funções de tabela voltam a float64 para calcular).
+    """
+    descartar = list(_COLUNAS_DMS)
+    if not manter_originais:
+        descartar += COLS_ANGULOS + COLS_DISTANCIAS
+    out = res.drop(columns=[c for c in descartar if c in res.columns])
+    for c in ["EST", "PV"]:
+        if c in out.columns and not isinstance(out[c].dtype, pd.CategoricalDtype):
+            out[c] = out[c].astype("category")
+    if float32:
+        cols = [c for c in out.columns if c != "SEQ" and out[c].dtype == np.float64]
+        out[cols] = out[cols].astype(np.float32)
+    return out
+
+
+def _linhas_de(res: pd.DataFrame, coluna: str, linhas=None) -> np.ndarray:
+    """Valores de 'coluna', fatiando antes de converter (só 'linhas', se informadas)."""
+    serie = res[coluna] if linhas is None else res[coluna].iloc[linhas]
+    return serie.to_numpy()
+
+
+def coluna_dms(res: pd.DataFrame, coluna: str, linhas=None) -> np.ndarray:
+    """
+    Textos DMS de 'coluna' ("Hz_med_DMS", "Z_corr_DMS") ou de uma leitura
+    original ("Hz_PD", ...). Se o resultado for compacto, gera a partir da
+    coluna em graus, só para 'linhas' (posições), quando informadas.
+    """
+    if coluna in res.columns:
+        return _linhas_de(res, coluna, linhas)
+    graus = _linhas_de(res, _COLUNAS_DMS.get(coluna, coluna + "_deg"), linhas)
+    return decimal_to_dms_array(graus.astype(np.float64))
+
+
+@cronometrado
+def tabela_linha_a_linha(res: pd.DataFrame, linhas=None) -> pd.DataFrame:
+    """
+    Tabela de exibição da seção 3 (DMS e distâncias formatadas). Com
+    'linhas' (posições), monta só essas linhas, para atualizar a tabela
+    após uma edição.
+    """
+    tab = pd.DataFrame(
+        {
+            "EST": _linhas_de(res, "EST", linhas),
+            "PV": _linhas_de(res, "PV", linhas),
+            "SEQ": _linhas_de(res, "SEQ", linhas),
+        }
     )
-    res["Hz_med_DMS"] = res["Hz_med_deg"].apply(decimal_to_dms)
+    for c in ["Hz_PD", "Hz_PI", "Hz_med_DMS", "Z_PD", "Z_PI", "Z_corr_DMS"]:
+        tab[c] = coluna_dms(res, c, linhas)
+    for c in ["DH_PD_m", "DH_PI_m", "DH_med_m"]:
+        tab[c] = [
+            f"{x:.3f}" if not math.isnan(x) else ""
+            for x in _linhas_de(res, c, linhas).tolist()
+        ]
+    return tab[
+        [
+            "EST",
+            "PV",
+            "SEQ",
+            "Hz_PD",
+            "Hz_PI",
+            "Hz_med_DMS",
+            "Z_PD",
+            "Z_PI",
+            "Z_corr_DMS",
+            "DH_PD_m",
+            "DH_PI_m",
+            "DH_med_m",
+        ]
+    ]
 
-    def calc_z_corr(z_pd_deg, z_pi_deg):
-        if math.isnan(z_pd_deg) or math.isnan(z_pi_deg):
-            return float("nan")
-        return (z_pd_deg - z_pi_deg) / 2.0 + 180.0
 
-    res["Z_corr_deg"] = res.apply(
-        lambda r: calc_z_corr(r["Z_PD_deg"], r["Z_PI_deg"]), axis=1
+# ---------------------------------------------------------------------
+# Estatísticas por série (EST, PV)
+# ---------------------------------------------------------------------
+@dataclass
+class EstatisticasSeries:
+    """
+    Resultado de uma única passagem agrupada por (EST, PV):
+
+    - codigo: grupo de cada linha de 'res' (-1 = linha sem EST/PV);
+    - hz_reduzido_deg: Hz médio reduzido à menor direção da estação;
+    - grupos: uma linha por (EST, PV), na ordem do groupby, com médias,
+      contagens e dispersão (desvio padrão e desvio máximo, em segundos);
+    - referencia_est: menor Hz médio de cada estação (origem da redução).
+    """
+
+    codigo: np.ndarray
+    hz_reduzido_deg: np.ndarray
+    grupos: pd.DataFrame
+    referencia_est: Dict[str, float] = field(default_factory=dict)
+
+    def por_linha(self, coluna: str, linhas=None) -> np.ndarray:
+        """Espalha uma coluna de 'grupos' para as linhas de 'res' (ou só 'linhas')."""
+        vals = self.grupos[coluna].to_numpy()
+        codigo = self.codigo if linhas is None else self.codigo[linhas]
+        out = np.full(len(codigo), np.nan, dtype=np.float64)
+        ok = codigo >= 0
+        out[ok] = vals[codigo[ok]]
+        return out
+
+
+def _dispersao_seg(
+    codigo: np.ndarray, desvios_deg: np.ndarray, n: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Desvio padrão amostral e desvio máximo absoluto por grupo, em segundos."""
+    k = len(n)
+    d = desvios_deg * 3600.0
+    with np.errstate(invalid="ignore", divide="ignore"):
+        media = np.bincount(codigo, d, minlength=k) / n
+        soma_q = np.bincount(codigo, (d - media[codigo]) ** 2, minlength=k)
+        dp = np.sqrt(soma_q / (n - 1))
+    dp[n < 2] = np.nan
+
+    dmax = np.zeros(k, dtype=np.float64)
+    np.maximum.at(dmax, codigo, np.abs(d))
+    dmax[n == 0] = np.nan
+    return dp, dmax
+
+
+def _estatisticas_grupos(
+    codigo: np.ndarray, hz_red: np.ndarray, z: np.ndarray, k: int
+) -> Dict[str, np.ndarray]:
+    """
+    Médias, contagens e dispersão dos k grupos de 'codigo' (-1 = sem grupo).
+    As somas seguem a ordem das linhas, de modo que recalcular um subconjunto
+    de grupos dá exatamente o mesmo resultado do cálculo completo.
+    """
+    com_grupo = codigo >= 0
+
+    # Hz: média circular
+    ok_hz = com_grupo & ~np.isnan(hz_red)
+    c_hz = codigo[ok_hz]
+    rad = np.radians(hz_red[ok_hz])
+    n_hz = np.bincount(c_hz, minlength=k).astype(np.float64)
+    x = np.bincount(c_hz, np.cos(rad), minlength=k)
+    y = np.bincount(c_hz, np.sin(rad), minlength=k)
+    # atan2 só roda uma vez por grupo; math.atan2 mantém o arredondamento
+    # idêntico ao de mean_direction_circular
+    hz_med = np.degrees([math.atan2(yi, xi) for xi, yi in zip(x, y)])
+    hz_med = np.where(hz_med < 0, hz_med + 360.0, hz_med)
+    hz_med[(n_hz == 0) | ((x == 0) & (y == 0))] = np.nan
+    desv_hz = np.mod(hz_red[ok_hz] - hz_med[c_hz] + 180.0, 360.0) - 180.0
+    hz_dp, hz_max = _dispersao_seg(c_hz, desv_hz, n_hz)
+
+    # Z: média aritmética
+    ok_z = com_grupo & ~np.isnan(z)
+    c_z = codigo[ok_z]
+    n_z = np.bincount(c_z, minlength=k).astype(np.float64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        z_med = np.bincount(c_z, z[ok_z], minlength=k) / n_z
+    z_dp, z_max = _dispersao_seg(c_z, z[ok_z] - z_med[c_z], n_z)
+
+    return {
+        "n_Hz": n_hz.astype(np.int64),
+        "Hz_med_series_deg": hz_med,
+        "Hz_dp_seg": hz_dp,
+        "Hz_desvio_max_seg": hz_max,
+        "n_Z": n_z.astype(np.int64),
+        "Z_med_series_deg": z_med,
+        "Z_dp_seg": z_dp,
+        "Z_desvio_max_seg": z_max,
+    }
+
+
+@cronometrado
+def estatisticas_series(res: pd.DataFrame) -> EstatisticasSeries:
+    """
+    Calcula, numa única passagem agrupada por (EST, PV):
+    a redução das direções (referência = menor Hz médio da estação), a média
+    circular de Hz (somas de cos/sen), a média aritmética de Z, as contagens
+    e a dispersão das séries.
+    """
+    g = res.groupby(["EST", "PV"], sort=True, observed=True)
+    chaves = g.size().index
+    k = len(chaves)
+    codigo = g.ngroup().fillna(-1).to_numpy(dtype=np.int64)
+    pos = np.arange(len(res))
+    com_grupo = codigo >= 0
+
+    g_est = res.groupby("EST", observed=True)["Hz_med_deg"]
+    ref = g_est.transform("min")
+    hz_red = np.mod(
+        res["Hz_med_deg"].to_numpy(dtype=np.float64) - ref.to_numpy(dtype=np.float64),
+        360.0,
     )
-    res["Z_corr_DMS"] = res["Z_corr_deg"].apply(decimal_to_dms)
+    z = res["Z_corr_deg"].to_numpy(dtype=np.float64)
 
-    z_rad = res["Z_corr_deg"] * np.pi / 180.0
-    res["DH_PD_m"] = np.abs(res["DI_PD_m"] * np.sin(z_rad)).round(3)
-    res["DN_PD_m"] = np.abs(res["DI_PD_m"] * np.cos(z_rad)).round(3)
-    res["DH_PI_m"] = np.abs(res["DI_PI_m"] * np.sin(z_rad)).round(3)
-    res["DN_PI_m"] = np.abs(res["DI_PI_m"] * np.cos(z_rad)).round(3)
+    primeira = np.full(k, len(res), dtype=np.int64)
+    np.minimum.at(primeira, codigo[com_grupo], pos[com_grupo])
+
+    grupos = pd.DataFrame(
+        {
+            "EST": chaves.get_level_values(0),
+            "PV": chaves.get_level_values(1),
+            "primeira_linha": primeira,
+        }
+    )
+    for coluna, vals in _estatisticas_grupos(codigo, hz_red, z, k).items():
+        grupos[coluna] = vals
+    referencia = {str(e): float(v) for e, v in g_est.min().items()}
+    return EstatisticasSeries(
+        codigo=codigo, hz_reduzido_deg=hz_red, grupos=grupos, referencia_est=referencia
+    )
 
-    res["DH_med_m"] = np.abs((res["DH_PD_m"] + res["DH_PI_m"]) / 2.0).round(3)
-    res["DN_med_m"] = np.abs((res["DN_PD_m"] + res["DN_PI_m"]) / 2.0).round(3)
 
-    return res
+@cronometrado
+def tabela_qualidade_series(
+    res: pd.DataFrame, stats: Optional[EstatisticasSeries] = None
+) -> pd.DataFrame:
+    """Contagens e dispersão das séries por (EST, PV), em segundos de arco."""
+    if stats is None:
+        stats = estatisticas_series(res)
+    g = stats.grupos
+    return pd.DataFrame(
+        {
+            "Estação": g["EST"],
+            "Ponto Visado": g["PV"],
+            "Nº séries Hz": g["n_Hz"],
+            "Desvio padrão Hz (\")": g["Hz_dp_seg"].round(1),
+            "Desvio máx. Hz (\")": g["Hz_desvio_max_seg"].round(1),
+            "Nº séries Z": g["n_Z"],
+            "Desvio padrão Z (\")": g["Z_dp_seg"].round(1),
+            "Desvio máx. Z (\")": g["Z_desvio_max_seg"].round(1),
+        }
+    )
 
 
 # ---------------------------------------------------------------------
 # Tabelas Hz / Z
 # ---------------------------------------------------------------------
-def tabela_hz_por_serie(res: pd.DataFrame) -> pd.DataFrame:
-    df = res.copy().reset_index(drop=False)
-    df.rename(columns={"index": "_ordem_original"}, inplace=True)
-
-    df["Hz_reduzido_deg"] = np.nan
-    for est in df["EST"].unique():
-        sub = df[df["EST"] == est]
-        if sub.empty:
-            continue
-        ref = float(sub["Hz_med_deg"].min())
-        mask = df["EST"] == est
-        df.loc[mask, "Hz_reduzido_deg"] = (df.loc[mask, "Hz_med_deg"] - ref) % 360.0
-
-    df["Hz_reduzido_DMS"] = df["Hz_reduzido_deg"].apply(decimal_to_dms)
-
-    medias_series = []
-    for (est, pv), sub in df.groupby(["EST", "PV"]):
-        hz_list = [v for v in sub["Hz_reduzido_deg"].tolist() if not math.isnan(v)]
-        hz_med_series = mean_direction_circular(hz_list)
-        medias_series.append(
-            {"EST": est, "PV": pv, "Hz_med_series_deg": hz_med_series}
-        )
-    df_med = pd.DataFrame(medias_series)
-    df_med["Hz_med_series_DMS"] = df_med["Hz_med_series_deg"].apply(decimal_to_dms)
-
-    df = df.merge(df_med, on=["EST", "PV"], how="left")
-    df.sort_values(by="_ordem_original", inplace=True)
+@cronometrado
+def tabela_hz_por_serie(
+    res: pd.DataFrame, stats: Optional[EstatisticasSeries] = None, linhas=None
+) -> pd.DataFrame:
+    if stats is None:
+        stats = estatisticas_series(res)
+    hz_red = stats.hz_reduzido_deg if linhas is None else stats.hz_reduzido_deg[linhas]
 
     tab = pd.DataFrame(
         {
-            "Estação": df["EST"],
-            "Ponto Visado": df["PV"],
-            "Hz PD": df["Hz_PD"],
-            "Hz PI": df["Hz_PI"],
-            "Hz Médio": df["Hz_med_DMS"],
-            "Hz Reduzido": df["Hz_reduzido_DMS"],
-            "Média das séries": df["Hz_med_series_DMS"],
+            "Estação": _linhas_de(res, "EST", linhas),
+            "Ponto Visado": _linhas_de(res, "PV", linhas),
+            "Hz PD": coluna_dms(res, "Hz_PD", linhas),
+            "Hz PI": coluna_dms(res, "Hz_PI", linhas),
+            "Hz Médio": coluna_dms(res, "Hz_med_DMS", linhas),
+            "Hz Reduzido": decimal_to_dms_array(hz_red),
+            "Média das séries": decimal_to_dms_array(
+                stats.por_linha("Hz_med_series_deg", linhas)
+            ),
         }
     )
     return tab
 
 
-def tabela_z_por_serie(res: pd.DataFrame) -> pd.DataFrame:
-    df = res.copy().reset_index(drop=False)
-    df.rename(columns={"index": "_ordem_original"}, inplace=True)
-
-    medias_series = []
-    for (est, pv), sub in df.groupby(["EST", "PV"]):
-        z_vals = [v for v in sub["Z_corr_deg"].tolist() if not math.isnan(v)]
-        if len(z_vals) == 0:
-            z_med = float("nan")
-        else:
-            z_med = sum(z_vals) / len(z_vals)
-        medias_series.append(
-            {"EST": est, "PV": pv, "Z_med_series_deg": z_med}
-        )
-    df_med = pd.DataFrame(medias_series)
-    df_med["Z_med_series_DMS"] = df_med["Z_med_series_deg"].apply(decimal_to_dms)
-
-    df = df.merge(df_med, on=["EST", "PV"], how="left")
-    df.sort_values(by="_ordem_original", inplace=True)
+@cronometrado
+def tabela_z_por_serie(
+    res: pd.DataFrame, stats: Optional[EstatisticasSeries] = None, linhas=None
+) -> pd.DataFrame:
+    if stats is None:
+        stats = estatisticas_series(res)
 
     tab = pd.DataFrame(
         {
-            "Estação": df["EST"],
-            "Ponto Visado": df["PV"],
-            "Z PD": df["Z_PD"],
-            "Z PI": df["Z_PI"],
-            "Z Corrigido": df["Z_corr_DMS"],
-            "Média das séries": df["Z_med_series_DMS"],
+            "Estação": _linhas_de(res, "EST", linhas),
+            "Ponto Visado": _linhas_de(res, "PV", linhas),
+            "Z PD": coluna_dms(res, "Z_PD", linhas),
+            "Z PI": coluna_dms(res, "Z_PI", linhas),
+            "Z Corrigido": coluna_dms(res, "Z_corr_DMS", linhas),
+            "Média das séries": decimal_to_dms_array(
+                stats.por_linha("Z_med_series_deg", linhas)
+            ),
         }
     )
     return tab
 
 
 # ---------------------------------------------------------------------
-# Distâncias e tabela resumo
+# Índice de pares (distâncias simétricas e direções)
 # ---------------------------------------------------------------------
-def tabela_distancias_medias_simetricas(res: pd.DataFrame) -> pd.DataFrame:
-    aux = res[["EST", "PV", "DH_med_m"]].copy()
-    registros: Dict[Tuple[str, str], List[float]] = {}
-
-    for _, row in aux.iterrows():
-        a = str(row["EST"])
-        b = str(row["PV"])
-        if a == b:
+@dataclass
+class IndicePares:
+    """
+    Índice construído uma vez por conjunto processado:
+
+    - dh: par não ordenado (menor, maior) -> array de DH_med_m observados
+      (EST–PV e PV–EST);
+    - hz: par ordenado (EST, PV) -> array de Hz_med_deg observados;
+    - dh_media / hz_media: médias já calculadas para consulta O(1);
+    - linhas_dh / linhas_hz: posições em 'res' das linhas de cada par, na
+      mesma ordem dos arrays (para atualizar só os pares editados).
+    """
+
+    dh: Dict[Tuple[str, str], np.ndarray]
+    hz: Dict[Tuple[str, str], np.ndarray]
+    dh_media: Dict[Tuple[str, str], float]
+    hz_media: Dict[Tuple[str, str], float]
+    linhas_dh: Dict[Tuple[str, str], np.ndarray] = field(default_factory=dict)
+    linhas_hz: Dict[Tuple[str, str], np.ndarray] = field(default_factory=dict)
+
+    def media_dh(self, pa: str, pb: str) -> float:
+        """DH média simétrica entre dois pontos (NaN se não houver visada)."""
+        return self.dh_media.get(_par_canonico(pa, pb), float("nan"))
+
+    def direcao_media(self, est: str, pv: str) -> float:
+        """Direção média Hz (em graus) de 'est' para 'pv'."""
+        return self.hz_media.get((est, pv), float("nan"))
+
+
+def _par_canonico(a: str, b: str) -> Tuple[str, str]:
+    return (a, b) if a <= b else (b, a)
+
+
+def _agrupar_por_chave(
+    k1: np.ndarray, k2: np.ndarray, valores: np.ndarray
+) -> Tuple[List[Tuple[str, str]], np.ndarray, np.ndarray, np.ndarray]:
+    """Agrupa (k1, k2) na ordem de primeira aparição; retorna chaves, códigos, somas e contagens."""
+    codigo, chaves = pd.MultiIndex.from_arrays([k1, k2]).factorize()
+    k = len(chaves)
+    somas = np.bincount(codigo, valores, minlength=k)
+    n = np.bincount(codigo, minlength=k)
+    return list(chaves), codigo, somas, n
+
+
+def _medias_direcoes(
+    chaves: List[Tuple[str, str]], codigo: np.ndarray, hz: np.ndarray
+) -> Dict[Tuple[str, str], float]:
+    """Média circular de Hz por chave (NaN se a resultante for nula)."""
+    rad = np.radians(hz)
+    x = np.bincount(codigo, np.cos(rad), minlength=len(chaves))
+    y = np.bincount(codigo, np.sin(rad), minlength=len(chaves))
+    medias = {}
+    for chave, xi, yi in zip(chaves, x.tolist(), y.tolist()):
+        if xi == 0 and yi == 0:
+            medias[chave] = float("nan")
             continue
-        par = tuple(sorted([a, b]))
-        dh = float(row["DH_med_m"])
-        registros.setdefault(par, []).append(dh)
+        ang = math.degrees(math.atan2(yi, xi))
+        medias[chave] = ang + 360.0 if ang < 0 else ang
+    return medias
+
+
+def _fatiar_por_grupo(
+    chaves: List[Tuple[str, str]], codigo: np.ndarray, valores: np.ndarray
+) -> Dict[Tuple[str, str], np.ndarray]:
+    ordem = np.argsort(codigo, kind="stable")
+    cortes = np.cumsum(np.bincount(codigo, minlength=len(chaves)))[:-1]
+    return dict(zip(chaves, np.split(valores[ordem], cortes)))
+
+
+@cronometrado
+def indice_pares(res: pd.DataFrame) -> IndicePares:
+    """Constrói o IndicePares de 'res' numa única passagem agrupada."""
+    est = np.asarray(res["EST"], dtype=object).astype(str)
+    pv = np.asarray(res["PV"], dtype=object).astype(str)
+    dh = res["DH_med_m"].to_numpy(dtype=np.float64)
+    hz = res["Hz_med_deg"].to_numpy(dtype=np.float64)
+
+    if len(res) == 0:
+        return IndicePares(dh={}, hz={}, dh_media={}, hz_media={})
+
+    # Distâncias: chave canônica (menor, maior)
+    troca = est > pv
+    lo = np.where(troca, pv, est)
+    hi = np.where(troca, est, pv)
+    chaves_dh, cod_dh, soma_dh, n_dh = _agrupar_por_chave(lo, hi, dh)
+    dh_media = dict(zip(chaves_dh, (soma_dh / n_dh).tolist()))
+
+    # Direções: chave ordenada (EST, PV), média circular por grupo
+    chaves_hz, cod_hz, _, _ = _agrupar_por_chave(est, pv, hz)
+    hz_media = _medias_direcoes(chaves_hz, cod_hz, hz)
+
+    pos = np.arange(len(res))
+    return IndicePares(
+        dh=_fatiar_por_grupo(chaves_dh, cod_dh, dh),
+        hz=_fatiar_por_grupo(chaves_hz, cod_hz, hz),
+        dh_media=dh_media,
+        hz_media=hz_media,
+        linhas_dh=_fatiar_por_grupo(chaves_dh, cod_dh, pos),
+        linhas_hz=_fatiar_por_grupo(chaves_hz, cod_hz, pos),
+    )
+
 
-    linhas = []
-    for (a, b), valores in registros.items():
-        dh_med = float(np.mean(valores))
-        linhas.append({"PontoA": a, "PontoB": b, "DH_media": dh_med})
+# ---------------------------------------------------------------------
+# Distâncias e tabela resumo
+# ---------------------------------------------------------------------
+@cronometrado
+def tabela_distancias_medias_simetricas(
+    res: pd.DataFrame, indice: Optional[IndicePares] = None
+) -> pd.DataFrame:
+    if indice is None:
+        indice = indice_pares(res)
+
+    linhas = [
+        {"PontoA": a, "PontoB": b, "DH_media": dh_med}
+        for (a, b), dh_med in indice.dh_media.items()
+        if a != b
+    ]
 
     df_dist = pd.DataFrame(linhas)
     if not df_dist.empty:
@@ -346,50 +945,32 @@ def tabela_distancias_medias_simetricas(res: pd.DataFrame) -> pd.DataFrame:
     return df_dist
 
 
-def tabela_resumo_final(res: pd.DataFrame, renomear_para_letras: bool = True) -> pd.DataFrame:
-    tab_hz_full = tabela_hz_por_serie(res)
-    tab_hz = (
-        tab_hz_full
-        .groupby(["Estação", "Ponto Visado"], as_index=False)
-        .agg(
-            **{
-                "Hz Médio": ("Hz Médio", "first"),
-                "Hz Reduzido": ("Hz Reduzido", "first"),
-                "Média das séries": ("Média das séries", "first"),
-            }
-        )
-    )
-
-    tab_z_full = tabela_z_por_serie(res)
-    tab_z = (
-        tab_z_full
-        .groupby(["Estação", "Ponto Visado"], as_index=False)
-        .agg(
-            **{
-                "Z Corrigido": ("Z Corrigido", "first"),
-                "Média Z das séries": ("Média das séries", "first"),
-            }
-        )
-    )
-
-    resumo = pd.merge(
-        tab_hz,
-        tab_z,
-        on=["Estação", "Ponto Visado"],
-        how="outer",
-    )
-
-    df_dh = res[["EST", "PV", "DH_med_m"]].copy()
-    df_dh["DH_med_str"] = df_dh["DH_med_m"].apply(
-        lambda x: f"{x:.3f}" if pd.notna(x) else ""
-    )
-    df_dh_grp = df_dh.groupby(["EST", "PV"], as_index=False)["DH_med_str"].first()
-
-    resumo = resumo.merge(
-        df_dh_grp,
-        left_on=["Estação", "Ponto Visado"],
-        right_on=["EST", "PV"],
-        how="left",
+@cronometrado
+def tabela_resumo_final(
+    res: pd.DataFrame,
+    renomear_para_letras: bool = True,
+    stats: Optional[EstatisticasSeries] = None,
+) -> pd.DataFrame:
+    if stats is None:
+        stats = estatisticas_series(res)
+    g = stats.grupos
+
+    # Valores da primeira leitura de cada (EST, PV)
+    primeira = g["primeira_linha"].to_numpy()
+    hz_red_primeira = stats.hz_reduzido_deg[primeira]
+    dh_primeira = res["DH_med_m"].to_numpy(dtype=np.float64)[primeira]
+
+    resumo = pd.DataFrame(
+        {
+            "Estação": g["EST"],
+            "Ponto Visado": g["PV"],
+            "Hz Médio": coluna_dms(res, "Hz_med_DMS", primeira),
+            "Hz Reduzido": decimal_to_dms_array(hz_red_primeira),
+            "Média das séries": decimal_to_dms_array(g["Hz_med_series_deg"]),
+            "Z Corrigido": coluna_dms(res, "Z_corr_DMS", primeira),
+            "Média Z das séries": decimal_to_dms_array(g["Z_med_series_deg"]),
+            "DH_med_str": [f"{x:.3f}" if not math.isnan(x) else "" for x in dh_primeira],
+        }
     )
 
     resumo = resumo[
@@ -459,42 +1040,14 @@ def _angulo_interno(a: float, b: float, c: float) -> float:
         return float("nan")
 
 
-def _media_dh_entre_pontos(res: pd.DataFrame, pa: str, pb: str) -> float:
-    """Retorna DH média simétrica entre dois pontos (usa EST–PV e PV–EST)."""
-    vals = []
-    for _, r in res.iterrows():
-        e, v = str(r["EST"]), str(r["PV"])
-        if {e, v} == {pa, pb}:
-            vals.append(float(r["DH_med_m"]))
-    if not vals:
-        return float("nan")
-    return float(sum(vals) / len(vals))
-
-
-def _direcao_media(res: pd.DataFrame, est: str, pv: str) -> float:
-    """Direção média Hz (em graus) de 'est' para 'pv'."""
-    vals = []
-    for _, r in res.iterrows():
-        if str(r["EST"]) == est and str(r["PV"]) == pv:
-            vals.append(float(r["Hz_med_deg"]))
-    if not vals:
-        return float("nan")
-    x = sum(math.cos(math.radians(a)) for a in vals)
-    y = sum(math.sin(math.radians(a)) for a in vals)
-    if x == 0 and y == 0:
-        return float("nan")
-    ang = math.degrees(math.atan2(y, x))
-    if ang < 0:
-        ang += 360
-    return ang
-
-
+@cronometrado
 def calcular_triangulo_duas_linhas(
     res: pd.DataFrame,
     idx1: int,
     idx2: int,
     estacao_op: str,
     conjunto_op: str,
+    indice: Optional[IndicePares] = None,
 ) -> Optional[Dict]:
     """
     Usa duas linhas de 'res' para montar o triângulo.
@@ -524,14 +1077,16 @@ def calcular_triangulo_duas_linhas(
     # ------------------------------
     if estacao_op == "A" and conjunto_op == "1ª leitura":
         est = "P1"
+        if indice is None:
+            indice = indice_pares(res)
 
-        AB = _media_dh_entre_pontos(res, "P1", "P2")  # P1–P2
-        AC = _media_dh_entre_pontos(res, "P1", "P3")  # P1–P3
+        AB = indice.media_dh("P1", "P2")  # P1–P2
+        AC = indice.media_dh("P1", "P3")  # P1–P3
         if math.isnan(AB) or math.isnan(AC):
             return None
 
-        hz12 = _direcao_media(res, "P1", "P2")
-        hz13 = _direcao_media(res, "P1", "P3")
+        hz12 = indice.direcao_media("P1", "P2")
+        hz13 = indice.direcao_media("P1", "P3")
         if math.isnan(hz12) or math.isnan(hz13):
             return None
 
@@ -645,54 +1200,723 @@ def calcular_triangulo_duas_linhas(
 # ---------------------------------------------------------------------
 # Seleção automática de linhas para formar o triângulo
 # ---------------------------------------------------------------------
+ESTACOES_LETRAS = ["A", "B", "C"]
+CONJUNTOS_LEITURA = ["1ª leitura", "2ª leitura", "3ª leitura"]
+
+# Estação (letra) -> (EST das linhas candidatas, PVs aceitos).
+# Estação A / 1ª leitura usa as linhas de P2 (caso especial didático; a
+# geometria é refeita a partir de P1 em calcular_triangulo_duas_linhas).
+_REGRA_SELECAO = {
+    "A": ("P1", ("P2", "P3")),
+    "B": ("P2", ("P3", "P1")),
+    "C": ("P3", ("P1", "P2")),
+}
+_REGRA_A_PRIMEIRA = ("P2", ("P3", "P1"))
+
+
+@dataclass
+class IndiceSelecao:
+    """
+    Índice construído uma vez por conjunto processado:
+    (estação A/B/C, conjunto 1ª/2ª/3ª) -> par de posições de linha em 'res'.
+    Combinações sem par válido não aparecem no dicionário.
+    """
+
+    pares: Dict[Tuple[str, str], Tuple[int, int]]
+
+    def par(self, estacao_letra: str, conjunto: str) -> Optional[Tuple[int, int]]:
+        return self.pares.get((estacao_letra, conjunto))
+
+    def conjuntos_validos(self, estacao_letra: str) -> List[str]:
+        """Conjuntos disponíveis para a estação, na ordem 1ª, 2ª, 3ª."""
+        return [c for c in CONJUNTOS_LEITURA if (estacao_letra, c) in self.pares]
+
+    def estacoes_validas(self) -> List[str]:
+        return [e for e in ESTACOES_LETRAS if self.conjuntos_validos(e)]
+
+
+@cronometrado
+def indice_selecao(res: pd.DataFrame) -> IndiceSelecao:
+    """
+    Constrói o IndiceSelecao de 'res': as linhas candidatas de cada regra são
+    tomadas na ordem da planilha e agrupadas de duas em duas (1º par ->
+    1ª leitura, 2º par -> 2ª leitura, ...).
+    """
+    est_col = res["EST"].to_numpy()
+    pv_col = res["PV"].to_numpy()
+    candidatas = {}
+    for est, pvs in set(_REGRA_SELECAO.values()) | {_REGRA_A_PRIMEIRA}:
+        mask = (est_col == est) & np.isin(pv_col, pvs)
+        candidatas[(est, pvs)] = np.flatnonzero(mask)
+
+    pares: Dict[Tuple[str, str], Tuple[int, int]] = {}
+    for estacao in ESTACOES_LETRAS:
+        for ordem, conjunto in enumerate(CONJUNTOS_LEITURA):
+            if estacao == "A" and ordem == 0:
+                cand = candidatas[_REGRA_A_PRIMEIRA]
+            else:
+                cand = candidatas[_REGRA_SELECAO[estacao]]
+            if 2 * ordem + 1 < len(cand):
+                pares[(estacao, conjunto)] = (
+                    int(cand[2 * ordem]),
+                    int(cand[2 * ordem + 1]),
+                )
+    return IndiceSelecao(pares)
+
+
 def selecionar_linhas_por_estacao_e_conjunto(
-    res: pd.DataFrame, estacao_letra: str, conjunto: str
+    res: pd.DataFrame,
+    estacao_letra: str,
+    conjunto: str,
+    selecao: Optional[IndiceSelecao] = None,
 ) -> Optional[Tuple[int, int]]:
     """
     Seleciona automaticamente duas linhas de 'res' para o triângulo, conforme
     estação (A,B,C) e conjunto (1ª,2ª,3ª).
     """
-    letra_to_p = {"A": "P1", "B": "P2", "C": "P3"}
-    est_ref = letra_to_p.get(estacao_letra)
-    if est_ref is None:
-        return None
+    if selecao is None:
+        selecao = indice_selecao(res)
+    return selecao.par(estacao_letra, conjunto)
 
-    ordem_map = {"1ª leitura": 1, "2ª leitura": 2, "3ª leitura": 3}
-    ordem = ordem_map.get(conjunto)
-    if ordem is None:
+
+# ---------------------------------------------------------------------
+# Triângulos em lote (todas as estações e conjuntos)
+# ---------------------------------------------------------------------
+
+def _angulo_interno_array(a: np.ndarray, b: np.ndarray, c: np.ndarray) -> np.ndarray:
+    """Versão vetorizada de _angulo_interno (ângulo oposto ao lado 'a')."""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cos_a = np.clip((b**2 + c**2 - a**2) / (2 * b * c), -1.0, 1.0)
+        ang = np.degrees(np.arccos(cos_a))
+    return np.where((a > 0) & (b > 0) & (c > 0), ang, np.nan)
+
+
+def resolver_triangulos_array(AB, AC, ang_A_deg) -> Dict[str, np.ndarray]:
+    """
+    Resolve vários triângulos de uma vez a partir de dois lados (AB, AC) e do
+    ângulo compreendido em A: lei dos cossenos para BC e para os ângulos em
+    B e C, e fórmula de Heron para a área.
+    """
+    AB = np.asarray(AB, dtype=np.float64)
+    AC = np.asarray(AC, dtype=np.float64)
+    ang_A = np.asarray(ang_A_deg, dtype=np.float64)
+
+    with np.errstate(invalid="ignore"):
+        BC = np.sqrt(AB**2 + AC**2 - 2 * AB * AC * np.cos(np.radians(ang_A)))
+        ang_B = _angulo_interno_array(AC, AB, BC)
+        ang_C = _angulo_interno_array(AB, AC, BC)
+        s = (AB + AC + BC) / 2.0
+        area = np.sqrt(np.maximum(s * (s - AB) * (s - AC) * (s - BC), 0.0))
+
+    return {
+        "AB": AB,
+        "AC": AC,
+        "BC": BC,
+        "ang_A_deg": ang_A,
+        "ang_B_deg": ang_B,
+        "ang_C_deg": ang_C,
+        "area_m2": area,
+    }
+
+
+def _angulo_entre_direcoes(hz1, hz2) -> np.ndarray:
+    ang = np.mod(np.asarray(hz2) - np.asarray(hz1), 360.0)
+    return np.where(ang > 180.0, 360.0 - ang, ang)
+
+
+@cronometrado
+def tabela_triangulos_campanha(
+    res: pd.DataFrame,
+    indice: Optional[IndicePares] = None,
+    selecao: Optional[IndiceSelecao] = None,
+) -> pd.DataFrame:
+    """
+    Resolve, numa única passagem vetorizada, todos os triângulos que o
+    conjunto de dados permite (estações A/B/C × 1ª/2ª/3ª leitura), com as
+    mesmas regras de seleção do IndiceSelecao.
+
+    Inclui o fechamento angular de cada conjunto (fechamento_seg): soma dos
+    ângulos medidos na própria estação de cada vértice (A em P1, B em P2,
+    C em P3) menos 180°, a soma teórica do triângulo plano, em segundos
+    (NaN se faltar alguma estação no conjunto). É a única medida de
+    fechamento: os ângulos de uma linha saem do mesmo triângulo resolvido
+    e somam 180° por construção.
+    """
+    if indice is None:
+        indice = indice_pares(res)
+    if selecao is None:
+        selecao = indice_selecao(res)
+
+    dh = res["DH_med_m"].to_numpy(dtype=np.float64)
+    hz = res["Hz_med_deg"].to_numpy(dtype=np.float64)
+    # Só as linhas dos pares selecionados são lidas (acesso escalar)
+    est_col = res["EST"]
+    pv_col = res["PV"]
+
+    rotulos, AB, AC, hz1, hz2 = [], [], [], [], []
+    for estacao in ESTACOES_LETRAS:
+        for conjunto in CONJUNTOS_LEITURA:
+            if estacao == "A" and conjunto == "1ª leitura":
+                # Caso especial: distâncias simétricas e direções médias de P1
+                rotulos.append((estacao, conjunto, "P1", "P2", "P3"))
+                AB.append(indice.media_dh("P1", "P2"))
+                AC.append(indice.media_dh("P1", "P3"))
+                hz1.append(indice.direcao_media("P1", "P2"))
+                hz2.append(indice.direcao_media("P1", "P3"))
+                continue
+
+            pares = selecao.par(estacao, conjunto)
+            if pares is None:
+                continue
+            i1, i2 = pares
+            est1, est2 = str(est_col.iat[i1]), str(est_col.iat[i2])
+            pv1, pv2 = str(pv_col.iat[i1]), str(pv_col.iat[i2])
+            if est1 != est2 or pv1 == pv2:
+                continue
+            rotulos.append((estacao, conjunto, est1, pv1, pv2))
+            AB.append(dh[i1])
+            AC.append(dh[i2])
+            hz1.append(hz[i1])
+            hz2.append(hz[i2])
+
+    colunas = ["Estação", "Conjunto", "EST", "PV1", "PV2"]
+    tri = pd.DataFrame(rotulos, columns=colunas)
+    sol = resolver_triangulos_array(AB, AC, _angulo_entre_direcoes(hz1, hz2))
+    for k, v in sol.items():
+        tri[k] = v
+    tri = tri.dropna(subset=["AB", "AC", "ang_A_deg"]).reset_index(drop=True)
+
+    # Fechamento: ângulo medido na própria estação de cada vértice
+    na_estacao = tri[tri["EST"] == tri["Estação"].map({"A": "P1", "B": "P2", "C": "P3"})]
+    g = na_estacao.groupby("Conjunto")["ang_A_deg"]
+    fechamento = (g.sum() - 180.0) * 3600.0
+    fechamento[g.count() < len(ESTACOES_LETRAS)] = np.nan
+    tri["fechamento_seg"] = tri["Conjunto"].map(fechamento)
+    return tri
+
+
+@cronometrado
+def tabela_discrepancias_lados(tri: pd.DataFrame) -> pd.DataFrame:
+    """
+    Compara, por conjunto, o mesmo lado obtido em triângulos de estações
+    diferentes (medido ou calculado). Uma linha por (Conjunto, lado).
+    """
+    if tri.empty:
+        return pd.DataFrame(
+            columns=["Conjunto", "PontoA", "PontoB", "n", "min_m", "max_m", "discrepancia_m"]
+        )
+
+    partes = []
+    for p_ini, p_fim, lado in [("EST", "PV1", "AB"), ("EST", "PV2", "AC"), ("PV1", "PV2", "BC")]:
+        a = tri[p_ini].to_numpy()
+        b = tri[p_fim].to_numpy()
+        troca = a > b
+        partes.append(
+            pd.DataFrame(
+                {
+                    "Conjunto": tri["Conjunto"].to_numpy(),
+                    "PontoA": np.where(troca, b, a),
+                    "PontoB": np.where(troca, a, b),
+                    "valor": tri[lado].to_numpy(),
+                }
+            )
+        )
+    lados = pd.concat(partes, ignore_index=True)
+    disc = (
+        lados.groupby(["Conjunto", "PontoA", "PontoB"], as_index=False)["valor"]
+        .agg(n="count", min_m="min", max_m="max")
+    )
+    disc["discrepancia_m"] = disc["max_m"] - disc["min_m"]
+    return disc
+
+
+# ---------------------------------------------------------------------
+# Resultado do processamento (etapas calculadas sob demanda)
+# ---------------------------------------------------------------------
+# Ajustamentos/irradiações guardados por ResultadoProcessamento (os mais recentes)
+MEMO_PARAMETROS_MAX_ENTRADAS = 4
+MEMO_PARAMETROS_MAX_BYTES = 64 * 1024 * 1024
+
+
+class ResultadoProcessamento:
+    """
+    Resultado de um conjunto de observações, com cada etapa calculada só no
+    primeiro acesso e guardada: o resultado linha a linha, as estatísticas
+    por série e os índices são compartilhados por todas as tabelas.
+
+        r = ResultadoProcessamento(obs)
+        r.resumo        # calcula res e stats; não monta as tabelas Hz/Z
+        r.tabela_hz     # reaproveita res e stats
+
+    Etapas já calculadas (ex.: 'res' de um projeto salvo) podem ser
+    passadas no construtor.
+    """
+
+    def __init__(
+        self,
+        obs: TabelaObservacoes,
+        res: Optional[pd.DataFrame] = None,
+        compacto: bool = True,
+        float32: bool = False,
+        manter_originais: bool = True,
+        **calculados,
+    ):
+        self.obs = obs
+        self.compacto = compacto
+        self.float32 = float32
+        self.manter_originais = manter_originais
+        self._feitos_com_parametros = CacheLRU(
+            max_bytes=MEMO_PARAMETROS_MAX_BYTES, max_entradas=MEMO_PARAMETROS_MAX_ENTRADAS
+        )
+        if res is not None:
+            calculados["res"] = res
+        for nome, valor in calculados.items():
+            if not isinstance(getattr(type(self), nome, None), cached_property):
+                raise TypeError(f"Etapa desconhecida: {nome}")
+            self.__dict__[nome] = valor
+
+    def assinatura(self) -> str:
+        return self.obs.assinatura()
+
+    def calculados(self) -> List[str]:
+        """Etapas já calculadas (ou recebidas), na ordem da classe."""
+        return [
+            nome
+            for nome, attr in vars(type(self)).items()
+            if isinstance(attr, cached_property) and nome in self.__dict__
+        ]
+
+    def tamanho_estimado(self) -> int:
+        """
+        Memória estimada (bytes) das etapas já calculadas e dos ajustamentos
+        guardados; as observações, compartilhadas com o cache de uploads,
+        não entram.
+        """
+        return (
+            sum(estimar_tamanho(self.__dict__[nome]) for nome in self.calculados())
+            + self._feitos_com_parametros.total_bytes
+        )
+
+    @cached_property
+    def res(self) -> pd.DataFrame:
+        return calcular_linha_a_linha(
+            self.obs,
+            compacto=self.compacto,
+            float32=self.float32,
+            manter_originais=self.manter_originais,
+        )
+
+    @cached_property
+    def stats(self) -> EstatisticasSeries:
+        return estatisticas_series(self.res)
+
+    @cached_property
+    def indice(self) -> IndicePares:
+        return indice_pares(self.res)
+
+    @cached_property
+    def selecao(self) -> IndiceSelecao:
+        return indice_selecao(self.res)
+
+    @cached_property
+    def tabela_linha(self) -> pd.DataFrame:
+        return tabela_linha_a_linha(self.res)
+
+    @cached_property
+    def tabela_hz(self) -> pd.DataFrame:
+        return tabela_hz_por_serie(self.res, stats=self.stats)
+
+    @cached_property
+    def tabela_z(self) -> pd.DataFrame:
+        return tabela_z_por_serie(self.res, stats=self.stats)
+
+    @cached_property
+    def resumo(self) -> pd.DataFrame:
+        return tabela_resumo_final(self.res, renomear_para_letras=True, stats=self.stats)
+
+    @cached_property
+    def qualidade(self) -> pd.DataFrame:
+        return tabela_qualidade_series(self.res, stats=self.stats)
+
+    @cached_property
+    def distancias(self) -> pd.DataFrame:
+        return tabela_distancias_medias_simetricas(self.res, indice=self.indice)
+
+    @cached_property
+    def triangulos(self) -> pd.DataFrame:
+        return tabela_triangulos_campanha(
+            self.res, indice=self.indice, selecao=self.selecao
+        )
+
+    @cached_property
+    def discrepancias(self) -> pd.DataFrame:
+        return tabela_discrepancias_lados(self.triangulos)
+
+    def triangulo(self, estacao_letra: str, conjunto: str) -> Optional[Dict]:
+        """Triângulo da estação/conjunto (None se não houver par de leituras)."""
+        pares = self.selecao.par(estacao_letra, conjunto)
+        if pares is None:
+            return None
+        return calcular_triangulo_duas_linhas(
+            self.res, pares[0], pares[1], estacao_letra, conjunto, indice=self.indice
+        )
+
+    def _com_parametros(self, etapa: str, calcular, parametros: Dict):
+        """
+        Resultado de 'calcular(**parametros)', guardado por etapa e parâmetros.
+        Só as combinações mais recentes ficam guardadas: o objeto é
+        compartilhado entre sessões e cada valor novo nos campos da tela é
+        uma combinação nova.
+        """
+        chave = (etapa, tuple(sorted(parametros.items())))
+        valor = self._feitos_com_parametros.get(chave)
+        if valor is None:
+            valor = calcular(**parametros)
+            self._feitos_com_parametros.put(chave, valor)
+        return valor
+
+    def ajustamento(self, **parametros):
+        """Ajustamento da rede por mínimos quadrados (ajustamento.ajustar_rede)."""
+        from ajustamento import ajustar_rede  # scipy só é importado aqui
+
+        return self._com_parametros(
+            "ajustamento",
+            lambda **p: ajustar_rede(self.res, indice=self.indice, **p),
+            parametros,
+        )
+
+    def irradiacao(self, estacao: str, **parametros):
+        """Coordenadas por irradiação a partir de 'estacao' (irradiacao.irradiar)."""
+        from irradiacao import irradiar
+
+        return self._com_parametros(
+            "irradiacao",
+            lambda **p: irradiar(self.res, stats=self.stats, **p),
+            {"estacao": estacao, **parametros},
+        )
+
+
+# ---------------------------------------------------------------------
+# Edição de observações com recálculo incremental
+# ---------------------------------------------------------------------
+COLUNAS_EDITAVEIS = COLS_ANGULOS + COLS_DISTANCIAS
+
+
+def _atribuir_texto_arrow(serie: pd.Series, linhas: np.ndarray, valores: np.ndarray):
+    """
+    Cópia de uma coluna de texto Arrow com 'valores' nas posições 'linhas',
+    no mesmo dtype. Usa replace_with_mask (uma passada em C) em vez de
+    escrever célula a célula, que reconstrói a coluna a cada atribuição.
+    Retorna None se os valores não forem texto.
+    """
+    arr = pa.array(serie.array)
+    if isinstance(arr, pa.ChunkedArray):
+        arr = arr.combine_chunks()
+    ordem = np.argsort(linhas, kind="stable")
+    try:
+        novos = pa.array(valores[ordem], type=arr.type, from_pandas=True)
+    except (pa.ArrowException, TypeError):
         return None
+    mascara = np.zeros(len(serie), dtype=bool)
+    mascara[linhas] = True
+    saida = pc.replace_with_mask(arr, pa.array(mascara), novos)
+    return pd.Series(pd.array(saida, dtype=serie.dtype), index=serie.index, name=serie.name)
+
+
+def _atribuir_linhas(serie: pd.Series, linhas: np.ndarray, valores) -> pd.Series:
+    """
+    Cópia de 'serie' com 'valores' nas posições 'linhas'. Mantém o dtype
+    (inclusive float32 e texto Arrow); se o valor não couber (texto numa
+    coluna numérica), a coluna passa a object.
+    """
+    valores = np.asarray(valores)
+    if isinstance(serie.dtype, pd.StringDtype) and serie.dtype.storage == "pyarrow":
+        nova = _atribuir_texto_arrow(serie, linhas, valores)
+        if nova is not None:
+            return nova
+        serie = serie.astype(object)
+    nova = serie.copy()
+    if nova.dtype.kind == "f" and valores.dtype.kind == "f":
+        valores = valores.astype(nova.dtype)
+    try:
+        nova.iloc[linhas] = valores
+    except (TypeError, ValueError):
+        nova = nova.astype(object)
+        nova.iloc[linhas] = valores
+    return nova
 
-    df = res.reset_index(drop=False).rename(columns={"index": "_idx_orig"})
 
-    if est_ref == "P1":  # Estação A
-        if ordem == 1:
-            mask = (df["EST"] == "P2") & (df["PV"].isin(["P3", "P1"]))
+@cronometrado
+def editar_observacoes(
+    obs: TabelaObservacoes, edicoes: Dict[int, Dict[str, object]]
+) -> Tuple[TabelaObservacoes, np.ndarray]:
+    """
+    Aplica 'edicoes' ({posição da linha: {coluna: novo valor}}) e reconverte
+    só as células editadas. Retorna as novas observações (os arrays não
+    editados continuam compartilhados) e as posições alteradas, em ordem.
+    """
+    por_coluna: Dict[str, Dict[int, object]] = {}
+    for linha, celulas in edicoes.items():
+        for col, valor in celulas.items():
+            if col not in COLUNAS_EDITAVEIS:
+                raise ValueError(f"Coluna não editável: {col}")
+            por_coluna.setdefault(col, {})[int(linha)] = valor
+
+    df = obs.df.copy(deep=False)
+    valores = dict(obs.valores)
+    invalidos = dict(obs.invalidos)
+    for col, celulas in por_coluna.items():
+        pos = np.fromiter(celulas, dtype=np.int64, count=len(celulas))
+        novos = pd.Series(list(celulas.values()), dtype=object)
+        df[col] = _atribuir_linhas(df[col], pos, novos.to_numpy())
+
+        if col in COLS_ANGULOS:
+            vals, inval = parse_angulos_serie(novos)
+            chave = col + "_deg"
         else:
-            mask = (df["EST"] == "P1") & (df["PV"].isin(["P2", "P3"]))
-    elif est_ref == "P2":  # Estação B
-        mask = (df["EST"] == "P2") & (df["PV"].isin(["P3", "P1"]))
-    else:  # P3, Estação C
-        mask = (df["EST"] == "P3") & (df["PV"].isin(["P1", "P2"]))
-
-    cand = df[mask].sort_values(by="_idx_orig")
-    if len(cand) < 2:
-        return None
+            vals, inval = parse_distancias_serie(novos)
+            chave = col + "_m"
+        valores[chave] = valores[chave].copy()
+        valores[chave][pos] = vals
+        invalidos[col] = invalidos[col].copy()
+        invalidos[col][pos] = inval
+
+    nova = TabelaObservacoes(
+        df=df,
+        valores=valores,
+        invalidos=invalidos,
+        colunas_ausentes=list(obs.colunas_ausentes),
+    )
+    linhas = np.unique(np.fromiter(edicoes, dtype=np.int64, count=len(edicoes)))
+    # Assinatura pelo conteúdo (igual à de uma planilha com os mesmos dados),
+    # rehashando só as linhas editadas; se alguma coluna mudou de dtype (texto
+    # numa coluna numérica), o hash de todas as linhas muda
+    if nova.df_uso().dtypes.equals(obs.df_uso().dtypes):
+        hashes = obs.hash_linhas().copy()
+        hashes[linhas] = nova.hash_linhas(linhas)
+        nova._hash_linhas = hashes
+    return nova, linhas
+
+
+@cronometrado
+def recalcular_linhas(
+    res: pd.DataFrame, obs: TabelaObservacoes, linhas: np.ndarray
+) -> pd.DataFrame:
+    """
+    Recalcula em 'res' apenas as posições 'linhas', com as mesmas contas de
+    calcular_linha_a_linha. Serve para o resultado completo e o compacto.
+    """
+    valores = {c: v[linhas] for c, v in obs.valores.items()}
+    novas = _colunas_linha(valores)
+    for col in COLUNAS_EDITAVEIS:
+        novas[col] = _linhas_de(obs.df, col, linhas)
+
+    res = res.copy(deep=False)
+    for col, vals in novas.items():
+        if col in res.columns:
+            res[col] = _atribuir_linhas(res[col], linhas, vals)
+    return res
 
-    cand = cand.reset_index(drop=True)
-    cand["par_id"] = cand.index // 2
 
-    par_desejado = ordem - 1
-    par = cand[cand["par_id"] == par_desejado]
-    if len(par) < 2:
-        return None
+@cronometrado
+def atualizar_estatisticas(
+    stats: EstatisticasSeries, res: pd.DataFrame, linhas: np.ndarray
+) -> Tuple[EstatisticasSeries, np.ndarray]:
+    """
+    Atualiza as estatísticas após a edição de 'linhas' (já recalculadas em
+    'res'). Recalcula só os grupos (EST, PV) dessas linhas ou, se a menor
+    direção de uma estação mudou, todos os grupos da estação. Retorna as
+    novas estatísticas e as posições das linhas cujos valores mudaram.
+    """
+    hz_med = res["Hz_med_deg"].to_numpy(dtype=np.float64)
+    est = res["EST"]
+    codigo = stats.codigo
+    hz_red = stats.hz_reduzido_deg.copy()
+    referencia = dict(stats.referencia_est)
+
+    afetadas = [linhas]
+    for e in pd.unique(est.iloc[linhas].dropna()):
+        pos_est = np.flatnonzero((est == e).to_numpy())
+        vals = hz_med[pos_est]
+        ref = float(np.min(vals[~np.isnan(vals)])) if (~np.isnan(vals)).any() else np.nan
+        chave = str(e)
+        antiga = referencia.get(chave, np.nan)
+        referencia[chave] = ref
+        if ref != antiga and not (np.isnan(ref) and np.isnan(antiga)):
+            afetadas.append(pos_est)  # muda a redução de toda a estação
+
+    grupos_afetados = np.unique(codigo[np.concatenate(afetadas)])
+    grupos_afetados = grupos_afetados[grupos_afetados >= 0]
+    linhas_afetadas = np.flatnonzero(np.isin(codigo, grupos_afetados))
+    linhas_afetadas = np.union1d(linhas_afetadas, linhas)
+
+    # Redução só das linhas afetadas, com a referência de cada estação
+    ref_linhas = est.iloc[linhas_afetadas].map(referencia).to_numpy(dtype=np.float64)
+    hz_red[linhas_afetadas] = np.mod(hz_med[linhas_afetadas] - ref_linhas, 360.0)
+
+    grupos = stats.grupos.copy()
+    if len(grupos_afetados):
+        em_grupo = linhas_afetadas[codigo[linhas_afetadas] >= 0]
+        cod_sub = np.searchsorted(grupos_afetados, codigo[em_grupo])
+        z = res["Z_corr_deg"].to_numpy(dtype=np.float64)
+        novas = _estatisticas_grupos(
+            cod_sub, hz_red[em_grupo], z[em_grupo], len(grupos_afetados)
+        )
+        for coluna, vals in novas.items():
+            j = grupos.columns.get_loc(coluna)
+            grupos.iloc[grupos_afetados, j] = vals
+
+    nova = EstatisticasSeries(
+        codigo=codigo, hz_reduzido_deg=hz_red, grupos=grupos, referencia_est=referencia
+    )
+    return nova, linhas_afetadas
+
+
+@cronometrado
+def atualizar_indice_pares(
+    indice: IndicePares, res: pd.DataFrame, linhas: np.ndarray
+) -> IndicePares:
+    """
+    Atualiza o IndicePares após a edição de 'linhas': só os pares dessas
+    linhas são relidos de 'res' e têm as médias recalculadas.
+    """
+    est = res["EST"]
+    pv = res["PV"]
+    dh_col = res["DH_med_m"].to_numpy(dtype=np.float64)
+    hz_col = res["Hz_med_deg"].to_numpy(dtype=np.float64)
+
+    chaves_hz = []
+    for i in linhas.tolist():
+        chave = (str(est.iat[i]), str(pv.iat[i]))
+        if chave in indice.linhas_hz and chave not in chaves_hz:
+            chaves_hz.append(chave)
+    chaves_dh = []
+    for a, b in chaves_hz:
+        chave = _par_canonico(a, b)
+        if chave not in chaves_dh:
+            chaves_dh.append(chave)
+
+    dh, dh_media = dict(indice.dh), dict(indice.dh_media)
+    for chave in chaves_dh:
+        pos = indice.linhas_dh[chave]
+        dh[chave] = dh_col[pos]
+        soma = np.bincount(np.zeros(len(pos), dtype=np.int64), dh_col[pos])[0]
+        dh_media[chave] = soma / len(pos)
+
+    hz, hz_media = dict(indice.hz), dict(indice.hz_media)
+    for chave in chaves_hz:
+        pos = indice.linhas_hz[chave]
+        hz[chave] = hz_col[pos]
+        hz_media.update(
+            _medias_direcoes([chave], np.zeros(len(pos), dtype=np.int64), hz_col[pos])
+        )
 
-    idxs = par["_idx_orig"].tolist()[:2]
-    return int(idxs[0]), int(idxs[1])
+    return IndicePares(
+        dh=dh,
+        hz=hz,
+        dh_media=dh_media,
+        hz_media=hz_media,
+        linhas_dh=indice.linhas_dh,
+        linhas_hz=indice.linhas_hz,
+    )
+
+
+def _substituir_linhas(
+    tab: pd.DataFrame, linhas: np.ndarray, parcial: pd.DataFrame
+) -> pd.DataFrame:
+    tab = tab.copy(deep=False)
+    for col in tab.columns:
+        tab[col] = _atribuir_linhas(tab[col], linhas, parcial[col].to_numpy())
+    return tab
+
+
+@dataclass
+class EstadoEdicao:
+    """
+    Resultado processado mantido durante a edição das observações: as
+    tabelas por linha são atualizadas nas posições afetadas; as tabelas por
+    grupo (resumo, distâncias, triângulos) saem de 'stats' e 'indice'.
+    """
+
+    obs: TabelaObservacoes
+    res: pd.DataFrame
+    stats: EstatisticasSeries
+    indice: IndicePares
+    tab_linha: pd.DataFrame
+    tab_hz: pd.DataFrame
+    tab_z: pd.DataFrame
+
+    def resultado(self, **calculados) -> ResultadoProcessamento:
+        """ResultadoProcessamento com as etapas já atualizadas pela edição."""
+        return ResultadoProcessamento(
+            self.obs,
+            res=self.res,
+            stats=self.stats,
+            indice=self.indice,
+            tabela_linha=self.tab_linha,
+            tabela_hz=self.tab_hz,
+            tabela_z=self.tab_z,
+            **calculados,
+        )
+
+
+def iniciar_edicao(resultado: ResultadoProcessamento) -> EstadoEdicao:
+    """Estado inicial da edição, reaproveitando as etapas já calculadas."""
+    return EstadoEdicao(
+        obs=resultado.obs,
+        res=resultado.res,
+        stats=resultado.stats,
+        indice=resultado.indice,
+        tab_linha=resultado.tabela_linha,
+        tab_hz=resultado.tabela_hz,
+        tab_z=resultado.tabela_z,
+    )
+
+
+@cronometrado
+def aplicar_edicoes(
+    estado: EstadoEdicao, edicoes: Dict[int, Dict[str, object]]
+) -> Tuple[EstadoEdicao, Dict[str, int]]:
+    """
+    Aplica 'edicoes' e recalcula só o que depende delas: as linhas editadas,
+    os grupos (EST, PV) dessas linhas e os pares de pontos envolvidos.
+    Retorna o novo estado e as contagens do que foi recalculado.
+    """
+    if not edicoes:
+        return estado, {"linhas": 0, "linhas_afetadas": 0, "grupos": 0}
+    obs, linhas = editar_observacoes(estado.obs, edicoes)
+    res = recalcular_linhas(estado.res, obs, linhas)
+    stats, afetadas = atualizar_estatisticas(estado.stats, res, linhas)
+    indice = atualizar_indice_pares(estado.indice, res, linhas)
+
+    novo = EstadoEdicao(
+        obs=obs,
+        res=res,
+        stats=stats,
+        indice=indice,
+        tab_linha=_substituir_linhas(
+            estado.tab_linha, linhas, tabela_linha_a_linha(res, linhas)
+        ),
+        tab_hz=_substituir_linhas(
+            estado.tab_hz, afetadas, tabela_hz_por_serie(res, stats, afetadas)
+        ),
+        tab_z=_substituir_linhas(
+            estado.tab_z, afetadas, tabela_z_por_serie(res, stats, afetadas)
+        ),
+    )
+    grupos = np.unique(stats.codigo[afetadas])
+    resumo = {
+        "linhas": len(linhas),
+        "linhas_afetadas": len(afetadas),
+        "grupos": int((grupos >= 0).sum()),
+    }
+    return novo, resumo
 
 
 # ---------------------------------------------------------------------
 # Modelo Excel (duas abas)
 # ---------------------------------------------------------------------
+@cronometrado
 def gerar_modelo_excel_bytes() -> bytes:
     buf = io.BytesIO()
     with pd.ExcelWriter(buf, engine="xlsxwriter") as writer:
@@ -0,0 +1,144 @@
+# projeto.py
+# Projeto processado em arquivo único (Parquet) para reabrir sem reimportar
+
+import io
+import json
+from dataclasses import dataclass
+from typing import Dict, Optional, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from diagnostico import cronometrado
+from processing import TabelaObservacoes, calcular_linha_a_linha
+
+FORMATO_PROJETO = "topoc-projeto"
+VERSAO_PROJETO = 1
+CHAVE_METADADOS = b"topoc_projeto"
+EXTENSAO_PROJETO = ".parquet"
+
+# Prefixos das colunas no arquivo (uma tabela, uma linha por observação)
+_PREFIXO_OBS = "obs:"
+_PREFIXO_VALOR = "val:"
+_PREFIXO_INVALIDO = "inv:"
+_PREFIXO_RES = "res:"
+
+
+@dataclass
+class Projeto:
+    """Conteúdo de um projeto salvo: identificação, observações e resultado."""
+
+    info_id: Dict[str, str]
+    obs: TabelaObservacoes
+    res: pd.DataFrame
+
+
+def _coluna_arrow(serie: pd.Series) -> pa.Array:
+    """Coluna Arrow; colunas object com tipos mistos (números e textos) viram texto."""
+    try:
+        return pa.array(serie, from_pandas=True)
+    except (pa.ArrowException, TypeError):
+        texto = serie.map(lambda v: v if v is None or v != v else str(v))
+        return pa.array(texto, type=pa.string(), from_pandas=True)
+
+
+@cronometrado
+def salvar_projeto(
+    info_id: Dict[str, str],
+    obs: TabelaObservacoes,
+    res: Optional[pd.DataFrame] = None,
+    destino: Union[str, io.BytesIO, None] = None,
+) -> Optional[bytes]:
+    """
+    Grava o projeto em Parquet: colunas normalizadas da planilha, valores
+    convertidos (graus/metros), máscaras de células inválidas e as colunas
+    calculadas por calcular_linha_a_linha. Identificação e assinatura vão
+    nos metadados do arquivo. Sem 'destino', retorna os bytes.
+    """
+    if res is None:
+        res = calcular_linha_a_linha(obs)
+    colunas_res = [c for c in res.columns if c not in obs.df_uso().columns]
+
+    dados = {}
+    for c in obs.df.columns:
+        dados[_PREFIXO_OBS + str(c)] = _coluna_arrow(obs.df[c])
+    for c, v in obs.valores.items():
+        dados[_PREFIXO_VALOR + c] = pa.array(v)
+    for c, v in obs.invalidos.items():
+        dados[_PREFIXO_INVALIDO + c] = pa.array(v)
+    for c in colunas_res:
+        dados[_PREFIXO_RES + c] = _coluna_arrow(res[c])
+    tabela = pa.table(dados)
+
+    meta = {
+        "formato": FORMATO_PROJETO,
+        "versao": VERSAO_PROJETO,
+        "info_id": info_id,
+        "colunas_ausentes": list(obs.colunas_ausentes),
+        "assinatura": obs.assinatura(),
+        "colunas_obs": [str(c) for c in obs.df.columns],
+        "colunas_res": colunas_res,
+    }
+    metadados = dict(tabela.schema.metadata or {})
+    metadados[CHAVE_METADADOS] = json.dumps(meta, ensure_ascii=False, default=str).encode(
+        "utf-8"
+    )
+    tabela = tabela.replace_schema_metadata(metadados)
+
+    buf = destino if destino is not None else io.BytesIO()
+    # lz4: descompressão mais rápida que zstd/snappy, que é o que importa ao reabrir
+    pq.write_table(tabela, buf, compression="lz4")
+    return None if destino is not None else buf.getvalue()
+
+
+@cronometrado
+def abrir_projeto(origem: Union[str, bytes, io.BytesIO]) -> Projeto:
+    """
+    Reabre um projeto salvo sem reprocessar a planilha: as observações, os
+    valores convertidos e o resultado são lidos diretamente das colunas.
+    Caminhos de arquivo são lidos com memory map.
+    """
+    if isinstance(origem, (bytes, bytearray)):
+        origem = pa.BufferReader(origem)
+    tabela = pq.read_table(origem, memory_map=isinstance(origem, str))
+
+    bruto = (tabela.schema.metadata or {}).get(CHAVE_METADADOS)
+    if bruto is None:
+        raise ValueError("O arquivo não é um projeto salvo por este aplicativo.")
+    meta = json.loads(bruto.decode("utf-8"))
+    if meta.get("formato") != FORMATO_PROJETO or meta.get("versao") != VERSAO_PROJETO:
+        raise ValueError(f"Versão de projeto não suportada: {meta.get('versao')}")
+
+    colunas = {}
+    for nome in tabela.column_names:
+        coluna = tabela.column(nome)
+        if nome.startswith(_PREFIXO_VALOR) or nome.startswith(_PREFIXO_INVALIDO):
+            colunas[nome] = np.array(coluna.to_numpy())
+        else:
+            colunas[nome] = coluna.to_pandas()
+
+    df = pd.DataFrame({c: colunas[_PREFIXO_OBS + c] for c in meta["colunas_obs"]})
+    valores = {
+        n[len(_PREFIXO_VALOR):]: v
+        for n, v in colunas.items()
+        if n.startswith(_PREFIXO_VALOR)
+    }
+    invalidos = {
+        n[len(_PREFIXO_INVALIDO):]: v
+        for n, v in colunas.items()
+        if n.startswith(_PREFIXO_INVALIDO)
+    }
+    obs = TabelaObservacoes(
+        df=df,
+        valores=valores,
+        invalidos=invalidos,
+        colunas_ausentes=meta["colunas_ausentes"],
+        _assinatura=meta["assinatura"],
+    )
+
+    res = obs.df_uso().copy()
+    for c in meta["colunas_res"]:
+        res[c] = colunas[_PREFIXO_RES + c]
+    return Projeto(info_id=meta["info_id"], obs=obs, res=res)
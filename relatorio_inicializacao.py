@@ -0,0 +1,85 @@
+# relatorio_inicializacao.py
+# Relatório do tempo de importação (partida a frio) dos módulos do app
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+DIR_PROJETO = os.path.dirname(os.path.abspath(__file__))
+
+
+def medir_importacao(modulo: str = "app") -> Dict:
+    """
+    Importa 'modulo' num processo Python novo com -X importtime e retorna o
+    tempo total (wall clock) e, por módulo importado, o tempo próprio e o
+    acumulado em milissegundos ('nivel' 0 = importado diretamente).
+    """
+    cmd = [sys.executable, "-X", "importtime", "-c", f"import {modulo}"]
+    t0 = time.perf_counter()
+    proc = subprocess.run(cmd, cwd=DIR_PROJETO, capture_output=True, text=True)
+    total_ms = (time.perf_counter() - t0) * 1000.0
+
+    modulos: List[Dict] = []
+    for linha in proc.stderr.splitlines():
+        if not linha.startswith("import time:"):
+            continue
+        partes = linha[len("import time:"):].split("|")
+        if len(partes) != 3 or not partes[0].strip().isdigit():
+            continue  # cabeçalho "self [us] | cumulative | imported package"
+        proprio, acumulado, nome = partes
+        recuo = len(nome) - len(nome.lstrip())
+        modulos.append(
+            {
+                "modulo": nome.strip(),
+                "nivel": (recuo - 1) // 2,
+                "proprio_ms": int(proprio) / 1000.0,
+                "acumulado_ms": int(acumulado) / 1000.0,
+            }
+        )
+    return {
+        "modulo": modulo,
+        "retorno": proc.returncode,
+        "total_ms": round(total_ms, 1),
+        "modulos": modulos,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Mede o tempo de importação (partida a frio) do app."
+    )
+    parser.add_argument("-m", "--modulo", default="app", help="Módulo a importar.")
+    parser.add_argument(
+        "-n", "--top", type=int, default=15, help="Quantidade de módulos listados."
+    )
+    parser.add_argument(
+        "--json", dest="arquivo_json", default=None, help="Grava o relatório em JSON."
+    )
+    args = parser.parse_args(argv)
+
+    rel = medir_importacao(args.modulo)
+    if rel["retorno"] != 0:
+        print(f"Falha ao importar '{args.modulo}'.", file=sys.stderr)
+        return 1
+
+    print(f"Importação de '{args.modulo}': {rel['total_ms']:.0f} ms (processo novo)")
+    print(f"{'acumulado (ms)':>15}  {'próprio (ms)':>13}  módulo")
+    maiores = sorted(rel["modulos"], key=lambda m: m["acumulado_ms"], reverse=True)
+    for m in maiores[: args.top]:
+        print(
+            f"{m['acumulado_ms']:>15.1f}  {m['proprio_ms']:>13.1f}  "
+            f"{'  ' * m['nivel']}{m['modulo']}"
+        )
+
+    if args.arquivo_json:
+        with open(args.arquivo_json, "w", encoding="utf-8") as f:
+            json.dump(rel, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
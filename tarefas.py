@@ -0,0 +1,117 @@
+# tarefas.py
+# Tarefas em segundo plano: etapas com progresso, resultados parciais e cancelamento
+
+import contextvars
+import threading
+from concurrent.futures import Executor, Future
+from typing import Any, Callable, Dict, Optional, Sequence
+
+NA_FILA = "na fila"
+EXECUTANDO = "executando"
+CONCLUIDA = "concluída"
+CANCELADA = "cancelada"
+FALHOU = "falhou"
+SITUACOES_FINAIS = (CONCLUIDA, CANCELADA, FALHOU)
+
+
+class TarefaCancelada(Exception):
+    """Levantada dentro da tarefa, num ponto de verificação, após cancelar()."""
+
+
+class Tarefa:
+    """
+    Estado de uma tarefa executada num pool. A função da tarefa recebe o
+    próprio objeto e informa o andamento com etapa()/progresso(); os dois
+    também são pontos de cancelamento. Resultados intermediários vão para
+    'parciais' (lidos pela interface enquanto a tarefa continua).
+    """
+
+    def __init__(self, etapas: Sequence[str]):
+        self.etapas = tuple(etapas)
+        self.situacao = NA_FILA
+        self.indice_etapa = -1
+        self.fracao = 0.0
+        self.parciais: Dict[str, Any] = {}
+        self.resultado: Any = None
+        self.erro: Optional[str] = None
+        self._cancelar = threading.Event()
+        self._futuro: Optional[Future] = None
+
+    # --- dentro da tarefa -------------------------------------------
+    def verificar(self) -> None:
+        if self._cancelar.is_set():
+            raise TarefaCancelada()
+
+    def etapa(self, nome: str) -> None:
+        """Começa a etapa 'nome' (uma das 'etapas')."""
+        self.verificar()
+        self.indice_etapa = self.etapas.index(nome)
+        self.fracao = 0.0
+
+    def progresso(self, feitos: int, total: int) -> None:
+        """Andamento dentro da etapa atual."""
+        self.verificar()
+        self.fracao = feitos / total if total else 1.0
+
+    def publicar(self, **parciais) -> None:
+        self.parciais = {**self.parciais, **parciais}
+
+    # --- fora da tarefa ----------------------------------------------
+    def cancelar(self) -> None:
+        """Pede o cancelamento; a tarefa para no próximo ponto de verificação."""
+        self._cancelar.set()
+        if self._futuro is not None and self._futuro.cancel():
+            self.situacao = CANCELADA
+
+    @property
+    def nome_etapa(self) -> str:
+        return self.etapas[self.indice_etapa] if self.indice_etapa >= 0 else ""
+
+    @property
+    def andamento(self) -> float:
+        """Fração concluída do total (cada etapa vale o mesmo)."""
+        if self.situacao == CONCLUIDA:
+            return 1.0
+        feitas = max(self.indice_etapa, 0) + (self.fracao if self.indice_etapa >= 0 else 0.0)
+        return min(feitas / len(self.etapas), 1.0)
+
+    @property
+    def finalizada(self) -> bool:
+        return self.situacao in SITUACOES_FINAIS
+
+    def aguardar(self, timeout: Optional[float] = None) -> None:
+        if self._futuro is not None and not self._futuro.cancelled():
+            self._futuro.exception(timeout)
+
+
+def iniciar_tarefa(
+    executor: Executor,
+    funcao: Callable[..., Any],
+    etapas: Sequence[str],
+    *args,
+    **kwargs,
+) -> Tarefa:
+    """
+    Agenda funcao(tarefa, *args, **kwargs) no 'executor' e retorna a tarefa.
+    A tarefa roda numa cópia das ContextVars de quem a agendou (ex.: a
+    coleta do diagnóstico), como uma chamada direta.
+    """
+    tarefa = Tarefa(etapas)
+
+    def executar():
+        if tarefa._cancelar.is_set():
+            tarefa.situacao = CANCELADA
+            return
+        tarefa.situacao = EXECUTANDO
+        try:
+            tarefa.resultado = funcao(tarefa, *args, **kwargs)
+        except TarefaCancelada:
+            tarefa.situacao = CANCELADA
+        except Exception as e:
+            tarefa.erro = f"{type(e).__name__}: {e}"
+            tarefa.situacao = FALHOU
+        else:
+            tarefa.situacao = CONCLUIDA
+
+    tarefa._futuro = executor.submit(contextvars.copy_context().run, executar)
+    return tarefa
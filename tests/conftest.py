@@ -0,0 +1,7 @@
+# conftest.py
+# Os módulos do app ficam na raiz do repositório
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
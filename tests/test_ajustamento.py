@@ -0,0 +1,31 @@
+# test_ajustamento.py
+# Diagonal da inversa por LDLᵀ contra a inversa densa
+
+import numpy as np
+from scipy import sparse
+
+from ajustamento import BLOCO_COVARIANCIA, _diagonal_inversa, _fatorar
+
+
+def _normal_esparsa(n: int, seed: int = 0) -> sparse.csc_matrix:
+    """Matriz simétrica definida positiva esparsa, como AᵀPA de uma rede."""
+    rng = np.random.default_rng(seed)
+    A = sparse.random(3 * n, n, density=4 / n, random_state=rng, format="csr")
+    return (A.T @ A + sparse.identity(n)).tocsc()
+
+
+def test_diagonal_inversa_igual_a_densa():
+    n = 3 * BLOCO_COVARIANCIA + 7  # vários blocos, o último incompleto
+    N = _normal_esparsa(n)
+    esperado = np.diag(np.linalg.inv(N.toarray()))
+    obtido = _diagonal_inversa(_fatorar(N), np.arange(n))
+    np.testing.assert_allclose(obtido, esperado, rtol=1e-10)
+
+
+def test_diagonal_inversa_subconjunto_de_colunas():
+    n = 150
+    N = _normal_esparsa(n, seed=1)
+    colunas = np.array([149, 3, 77, 0])
+    esperado = np.diag(np.linalg.inv(N.toarray()))[colunas]
+    obtido = _diagonal_inversa(_fatorar(N), colunas)
+    np.testing.assert_allclose(obtido, esperado, rtol=1e-10)
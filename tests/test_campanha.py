@@ -0,0 +1,31 @@
+# test_campanha.py
+# Leituras duplicadas entre planilhas e o pool de leitura reaproveitado
+
+import campanha
+from benchmark import gerar_observacoes_sinteticas
+from campanha import detectar_duplicadas, ingerir_planilhas
+from processing import concatenar_observacoes, construir_observacoes
+
+
+def test_duplicadas_so_entre_planilhas():
+    base = gerar_observacoes_sinteticas(40)
+    # dia1 repete a própria linha 0; dia2 repete as linhas 0 e 5 de dia1
+    dia1 = construir_observacoes(base.iloc[[0, 1, 2, 3, 4, 5, 0]].reset_index(drop=True))
+    dia2 = construir_observacoes(base.iloc[[0, 5, 6]].reset_index(drop=True))
+    obs = concatenar_observacoes([dia1, dia2], origens=["dia1", "dia2"])
+
+    manter, relatorio = detectar_duplicadas(obs)
+
+    assert manter.tolist() == [True] * 7 + [False, False, True]
+    assert relatorio["ARQUIVO"].tolist() == ["dia2", "dia2"]
+    assert relatorio["ARQUIVO_ORIGINAL"].tolist() == ["dia1", "dia1"]
+    assert relatorio["LINHA_ORIGINAL"].tolist() == [1, 6]
+
+
+def test_pool_de_leitura_reaproveitado():
+    arquivos = [("a.xlsx", b"nao e excel"), ("b.xlsx", b"tambem nao")]
+    for _ in range(2):
+        lidas = dict(ingerir_planilhas(arquivos, workers=2))
+        assert sorted(lidas) == [0, 1]
+        assert all(p.obs is None and p.erros for p in lidas.values())
+    assert list(campanha._pools) == [2]
@@ -0,0 +1,48 @@
+# test_edicao.py
+# Edição incremental (aplicar_edicoes) contra o reprocessamento completo
+
+import pandas as pd
+import pytest
+
+import processing as proc
+from benchmark import gerar_observacoes_sinteticas
+
+
+@pytest.fixture(scope="module")
+def obs():
+    return proc.construir_observacoes(gerar_observacoes_sinteticas(600, n_pontos=4))
+
+
+def _comparar(estado):
+    completo = proc.ResultadoProcessamento(estado.obs)
+    pd.testing.assert_frame_equal(estado.res, completo.res)
+    pd.testing.assert_frame_equal(estado.stats.grupos, completo.stats.grupos)
+    pd.testing.assert_frame_equal(estado.tab_linha, completo.tabela_linha)
+    pd.testing.assert_frame_equal(estado.tab_hz, completo.tabela_hz)
+    pd.testing.assert_frame_equal(estado.tab_z, completo.tabela_z)
+    # Assinatura pelo conteúdo: igual à de uma tabela montada do zero
+    do_zero = proc.TabelaObservacoes(
+        df=estado.obs.df.copy(), valores=estado.obs.valores, invalidos=estado.obs.invalidos
+    )
+    assert estado.obs.assinatura() == do_zero.assinatura()
+
+
+def test_edicoes_iguais_ao_reprocessamento(obs):
+    estado = proc.iniciar_edicao(proc.ResultadoProcessamento(obs))
+    rodadas = [
+        {5: {"DI_PD": "123.456"}, 40: {"Hz_PI": "10°20'30\""}},
+        {7: {"Z_PD": "lixo"}},                          # valor inválido
+        {0: {"Hz_PD": "0°00'00\""}, 1: {"DI_PI": ""}},  # referência e vazio
+    ]
+    for edicoes in rodadas:
+        estado, _ = proc.aplicar_edicoes(estado, edicoes)
+        _comparar(estado)
+
+
+def test_desfazer_restaura_assinatura(obs):
+    estado = proc.iniciar_edicao(proc.ResultadoProcessamento(obs))
+    original = obs.df["Hz_PD"].iloc[5]
+    estado, _ = proc.aplicar_edicoes(estado, {5: {"Hz_PD": "1°02'03\""}})
+    assert estado.obs.assinatura() != obs.assinatura()
+    estado, _ = proc.aplicar_edicoes(estado, {5: {"Hz_PD": original}})
+    assert estado.obs.assinatura() == obs.assinatura()
@@ -0,0 +1,60 @@
+# test_irradiacao.py
+# Irradiação numa figura fechada de três estações
+
+import math
+
+import pandas as pd
+import pytest
+
+from irradiacao import irradiar
+
+PONTOS = {"A": (1000.0, 2000.0), "B": (1085.0, 2040.0), "C": (1030.0, 2110.0)}
+
+
+def _azimute(de: str, para: str) -> float:
+    (xa, ya), (xb, yb) = PONTOS[de], PONTOS[para]
+    return math.atan2(xb - xa, yb - ya)
+
+
+def _triangulo_fechado() -> pd.DataFrame:
+    """Cada estação visa as outras duas em duas séries, sem erros."""
+    linhas = []
+    for est in PONTOS:
+        orientacao = math.radians(37.0 * (ord(est) - 64))  # zero do círculo arbitrário
+        for seq in (1, 2):
+            for pv in PONTOS:
+                if pv == est:
+                    continue
+                hz = math.degrees((_azimute(est, pv) - orientacao) % (2 * math.pi))
+                dh = math.dist(PONTOS[est], PONTOS[pv])
+                linhas.append((est, pv, seq, hz, dh, 90.0))
+    return pd.DataFrame(
+        linhas, columns=["EST", "PV", "SEQ", "Hz_med_deg", "DH_med_m", "Z_corr_deg"]
+    )
+
+
+def test_triangulo_fechado_recupera_coordenadas():
+    ir = irradiar(
+        _triangulo_fechado(),
+        "A",
+        xy=PONTOS["A"],
+        orientacao_deg=math.degrees(_azimute("A", "B")),
+        ponto_re="B",
+    )
+    coords = ir.coordenadas.set_index("Ponto")
+    assert sorted(coords.index) == ["A", "B", "C"]
+    for ponto, xy in PONTOS.items():
+        assert coords.loc[ponto, ["X_m", "Y_m"]].to_numpy(dtype=float) == pytest.approx(xy, abs=1e-9)
+    assert coords.loc[["B", "C"], "nivel"].tolist() == [1, 1]
+
+    # Fechamento: B e C irradiam de volta para pontos já conhecidos sem discrepância
+    assert len(ir.visadas) == 6
+    assert ir.visadas["dpos_mm"].max() < 1e-6
+    assert set(ir.orientacoes["EST"]) == {"A", "B", "C"}
+    orient = ir.orientacoes.set_index("EST")["n_referencias"]
+    assert orient.to_dict() == {"A": 1, "B": 2, "C": 2}
+
+
+def test_estacao_sem_visadas():
+    with pytest.raises(ValueError):
+        irradiar(_triangulo_fechado(), "D")
@@ -0,0 +1,22 @@
+# test_processar_lote.py
+# Validação dos argumentos da linha de comando
+
+import pytest
+
+from processar_lote import main
+
+
+@pytest.mark.parametrize("workers", ["0", "-3", "dois"])
+def test_workers_invalido(workers, capsys):
+    with pytest.raises(SystemExit) as exc:
+        main(["entregas/", "-j", workers])
+    assert exc.value.code == 2
+    assert "--workers: deve ser um inteiro >= 1" in capsys.readouterr().err
+
+
+def test_saida_com_extensao_invalida_antes_de_processar(tmp_path, capsys, monkeypatch):
+    monkeypatch.setattr("processar_lote.processar_lote", None)  # não pode ser chamado
+    with pytest.raises(SystemExit) as exc:
+        main([str(tmp_path), "-o", str(tmp_path / "saida.xls")])
+    assert exc.value.code == 2
+    assert "extensão não suportada" in capsys.readouterr().err
@@ -0,0 +1,29 @@
+# test_tarefas.py
+# Tarefas em segundo plano: contexto de quem agenda (coleta do diagnóstico)
+
+from concurrent.futures import ThreadPoolExecutor
+
+from diagnostico import cronometrado, encerrar_coleta, iniciar_coleta
+from tarefas import CONCLUIDA, iniciar_tarefa
+
+
+@cronometrado(nome="etapa_da_tarefa")
+def _etapa(linhas):
+    return list(linhas)
+
+
+def _executar(tarefa, linhas):
+    tarefa.etapa("Cálculo")
+    return _etapa(linhas)
+
+
+def test_coleta_recebe_etapas_da_tarefa():
+    registros = iniciar_coleta()
+    try:
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            tarefa = iniciar_tarefa(pool, _executar, ["Cálculo"], range(5))
+            tarefa.aguardar(timeout=10)
+    finally:
+        encerrar_coleta()
+    assert tarefa.situacao == CONCLUIDA
+    assert [(r["etapa"], r["linhas"]) for r in registros] == [("etapa_da_tarefa", 5)]
@@ -1,8 +1,14 @@
 # utils.py
 # Funções auxiliares (identificação, etc.)
 
-import pandas as pd
+import io
 from datetime import datetime
+from typing import Dict, Tuple
+
+import pandas as pd
+
+from diagnostico import cronometrado
+from processing import REQUIRED_COLS_ALL, nome_coluna_normalizado
 
 
 def _parse_data_flex(valor):
@@ -109,3 +115,118 @@ def ler_identificacao_from_df(df_id: pd.DataFrame):
             info["Patrimônio"] = str(valor).strip()
 
     return info
+
+
+def _achar_aba(nomes, candidatos):
+    for s in nomes:
+        if s.strip().lower() in candidatos:
+            return s
+    return None
+
+
+def _ler_dados_streaming(ws) -> pd.DataFrame:
+    """
+    Lê a aba de dados linha a linha (openpyxl read-only), mantendo apenas as
+    colunas reconhecidas por normalizar_colunas e convertendo as células para
+    texto, sem inferência de tipos. Células vazias viram None; linhas vazias
+    no fim da aba são descartadas, como no pd.read_excel.
+    """
+    linhas = ws.iter_rows(values_only=True)
+    cabecalho = next(linhas, None)
+    if cabecalho is None:
+        return pd.DataFrame()
+
+    indices = []
+    nomes = []
+    usados = set()
+    for i, nome in enumerate(cabecalho):
+        if nome is None:
+            continue
+        padrao = nome_coluna_normalizado(str(nome))
+        if padrao in REQUIRED_COLS_ALL and padrao not in usados:
+            usados.add(padrao)
+            indices.append(i)
+            nomes.append(str(nome))
+
+    colunas = [[] for _ in indices]
+    vazias_pendentes = 0
+    for linha in linhas:
+        if all(v is None for v in linha):
+            # só entram se houver dados depois (pd.read_excel descarta as finais)
+            vazias_pendentes += 1
+            continue
+        for col, i in zip(colunas, indices):
+            col.extend([None] * vazias_pendentes)
+            v = linha[i] if i < len(linha) else None
+            col.append(None if v is None else str(v))
+        vazias_pendentes = 0
+
+    return pd.DataFrame(
+        {nome: pd.Series(col, dtype=object) for nome, col in zip(nomes, colunas)}
+    )
+
+
+@cronometrado
+def ler_planilha_bytes(
+    conteudo: bytes, rapido: bool = True
+) -> Tuple[Dict[str, str], pd.DataFrame, str]:
+    """
+    Lê o arquivo Excel enviado (bytes) e retorna:
+      (info_id, raw_df da aba de dados, nome da aba de dados usada).
+
+    A aba de identificação é opcional; a de dados é procurada pelos nomes
+    'Dados', 'Medicoes' ou 'Medições' (senão, usa a primeira aba).
+
+    Com rapido=True (padrão) o arquivo é aberto uma única vez em modo
+    somente leitura e a aba de dados é lida em streaming, só com as colunas
+    usadas e como texto. Com rapido=False usa pd.read_excel (lento, mas
+    aceita qualquer formato suportado pelo pandas).
+    """
+    if not rapido:
+        return _ler_planilha_pandas(conteudo)
+
+    import openpyxl  # adiado: só é necessário quando há upload
+
+    wb = openpyxl.load_workbook(io.BytesIO(conteudo), read_only=True, data_only=True)
+    try:
+        sheet_id = _achar_aba(wb.sheetnames, ["identificação", "identificacao"])
+        if sheet_id is not None:
+            linhas_id = list(wb[sheet_id].iter_rows(values_only=True))
+            df_id = None
+            if linhas_id:
+                cols = [
+                    c if c is not None else f"Unnamed: {i}"
+                    for i, c in enumerate(linhas_id[0])
+                ]
+                df_id = pd.DataFrame(linhas_id[1:], columns=cols)
+                df_id = df_id.astype(object).where(df_id.notna(), float("nan"))
+            info_id = ler_identificacao_from_df(df_id)
+        else:
+            info_id = ler_identificacao_from_df(None)
+
+        sheet_dados = _achar_aba(wb.sheetnames, ["dados", "medicoes", "medições"])
+        if sheet_dados is None:
+            sheet_dados = wb.sheetnames[0]
+
+        raw_df = _ler_dados_streaming(wb[sheet_dados])
+    finally:
+        wb.close()
+    return info_id, raw_df, sheet_dados
+
+
+def _ler_planilha_pandas(conteudo: bytes) -> Tuple[Dict[str, str], pd.DataFrame, str]:
+    xls = pd.ExcelFile(io.BytesIO(conteudo))
+
+    sheet_id = _achar_aba(xls.sheet_names, ["identificação", "identificacao"])
+    if sheet_id is not None:
+        df_id = pd.read_excel(xls, sheet_name=sheet_id)
+        info_id = ler_identificacao_from_df(df_id)
+    else:
+        info_id = ler_identificacao_from_df(None)
+
+    sheet_dados = _achar_aba(xls.sheet_names, ["dados", "medicoes", "medições"])
+    if sheet_dados is None:
+        sheet_dados = xls.sheet_names[0]
+
+    raw_df = pd.read_excel(xls, sheet_name=sheet_dados)
+    return info_id, raw_df, sheet_dados